@@ -14,7 +14,9 @@ import csv
 
 # --- Local App Imports ---
 import database
-from billing import calculate_mahadiscom_bill, FIXED_CHARGE_SINGLE_PHASE, WHEELING_CHARGE_PER_KWH, ELECTRICITY_DUTY_RATE, slabs
+import async_db
+import jobs
+import statements
 from views.login_view import LoginView, RegisterView
 from views.admin_view import AdminView
 from views.client_view import ClientView
@@ -110,41 +112,10 @@ class ElectricityPortalApp(ctk.CTk):
             if hasattr(frame, 'update_charts'):
                 frame.update_charts()
     
-    def generate_bill_text(self, kwh_units, month, user_name):
-        """Shared function to create the itemized bill text."""
+    def generate_bill_text(self, user_id, month, user_name):
+        """Shared function to get the itemized bill text: the issued invoice, or an estimate. None if there's no reading."""
         try:
-            bill_data, bill_details = calculate_mahadiscom_bill(kwh_units)
-            bill_text = f"--- ESTIMATED ELECTRICITY BILL ---\n\n"
-            bill_text += f"Client: {user_name}\n"
-            bill_text += f"Billing Month: {month}\n"
-            bill_text += f"Total Consumption: {kwh_units:.2f} kWh\n"
-            bill_text += "----------------------------------\n\n"
-            bill_text += "ITEMIZED CHARGES:\n\n"
-            bill_text += f"A. Energy Charges:\n"
-            bill_text += "\n".join(bill_details) + "\n"
-            bill_text += f"   Total Energy Charge:   ₹{bill_data['A_Energy_Charge']:>10.2f}\n\n"
-            bill_text += f"B. Fixed Charge:             ₹{bill_data['B_Fixed_Charge']:>10.2f}\n"
-            bill_text += f"C. Wheeling Charge:          ₹{bill_data['C_Wheeling_Charge']:>10.2f}\n"
-            bill_text += f"D. Fuel Adjustment (FAC):    ₹{bill_data['D_FAC']:>10.2f}\n"
-            bill_text += "----------------------------------\n"
-            sub_total = (bill_data['A_Energy_Charge'] + bill_data['B_Fixed_Charge'] + 
-                         bill_data['C_Wheeling_Charge'] + bill_data['D_FAC'])
-            bill_text += f"   Sub-Total:               ₹{sub_total:>10.2f}\n"
-            bill_text += f"E. Electricity Duty (16%):   ₹{bill_data['E_Electricity_Duty']:>10.2f}\n\n"
-            bill_text += f"--- TOTAL BILL AMOUNT ---\n"
-            bill_text += f"   (A+B+C+D+E):             ₹{bill_data['F_Total_Bill']:>10.2f}\n"
-            bill_text += "----------------------------------\n"
-            bill_text += "\n\n--- APPLIED TARIFF (Residential LT-I) ---\n"
-            bill_text += f"Fixed Charge:      ₹{FIXED_CHARGE_SINGLE_PHASE:.2f}/month\n"
-            bill_text += f"Wheeling Charge:   ₹{WHEELING_CHARGE_PER_KWH:.2f}/kWh\n"
-            bill_text += f"Electricity Duty:  {ELECTRICITY_DUTY_RATE * 100:.0f}%\n"
-            bill_text += "Energy Charges (Telescopic Slabs):\n"
-            bill_text += f"  - 0-100 kWh:       ₹{slabs[0][1]:.2f}/unit\n"
-            bill_text += f"  - 101-300 kWh:     ₹{slabs[1][1]:.2f}/unit\n"
-            bill_text += f"  - 301-500 kWh:     ₹{slabs[2][1]:.2f}/unit\n"
-            bill_text += f"  - 501-1000 kWh:    ₹{slabs[3][1]:.2f}/unit\n"
-            bill_text += f"  - >1000 kWh:       ₹{slabs[4][1]:.2f}/unit\n"
-            return bill_text
+            return statements.bill_text(user_id, month, user_name)
         except Exception as e:
             return f"An error occurred during bill calculation: {e}"
 
@@ -178,4 +149,12 @@ if __name__ == "__main__":
     
     # Launch the app
     app = ElectricityPortalApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    
+    # Let a running import stop after its current chunk (it resumes next
+    # time) and stop the background query workers before checkpointing
+    jobs.shutdown()
+    async_db.shutdown()
+    
+    # Fold the WAL back into the main file so it doesn't grow between runs
+    database.checkpoint_database('TRUNCATE')
\ No newline at end of file
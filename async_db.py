@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import database
+import queries
+
+# --- Async Database Facade ---
+# The db_query* helpers block, so calling them from a Tk callback freezes the
+# window until they return. These coroutines run the same helpers on a small
+# pool of worker threads instead. Each worker gets its own connection from
+# database.get_connection(), and WAL mode lets them read side by side.
+#
+#     async def load(user_id):
+#         table, graph = await async_db.gather(
+#             async_db.fetch_df("SELECT ... WHERE user_id = ?", (user_id,)),
+#             async_db.fetch_df("SELECT month, usage_kwh ..."),
+#         )
+#         return table, graph
+#
+#     async_db.run_in_tk(widget, load(user_id), on_done=self.paint)
+#
+# Writes that must be atomic still belong in `with transaction():` on one
+# thread; the facade is meant for the read side of screen refreshes.
+MAX_WORKERS = 4
+
+# How often (ms) the Tk side checks whether a submitted coroutine has finished.
+TK_POLL_MS = 15
+
+_executor = None
+_loop = None
+_loop_thread = None
+_start_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _start_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='db-worker')
+        return _executor
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+async def fetch_df(query, params=()):
+    """Awaitable db_query_to_df()."""
+    return await _run(database.db_query_to_df, query, params)
+
+async def fetch_named_df(name, params=()):
+    """Awaitable queries.fetch_df() for a catalog query name."""
+    return await _run(queries.fetch_df, name, params)
+
+async def fetch_one(query, params=()):
+    """Awaitable db_query_one()."""
+    return await _run(database.db_query_one, query, params)
+
+async def fetch_rows(query, params=()):
+    """Awaitable db_query_rows()."""
+    return await _run(database.db_query_rows, query, params)
+
+async def fetch_scalar(query, params=(), default=None):
+    """Awaitable db_query_scalar()."""
+    return await _run(database.db_query_scalar, query, params, default)
+
+async def execute(query, params=()):
+    """Awaitable db_query(), committed on the worker's own connection."""
+    return await _run(database.db_query, query, params)
+
+async def gather(*awaitables):
+    """Runs the awaitables concurrently and returns their results in order."""
+    return await asyncio.gather(*awaitables)
+
+async def fetch_dfs(queries):
+    """Runs a list of (query, params) pairs concurrently; returns their DataFrames in order."""
+    return await gather(*(fetch_df(query, params) for query, params in queries))
+
+# --- Tk Integration ---
+# Tk widgets may only be touched from the main thread, so coroutines run on a
+# background event loop and run_in_tk() polls for the result with after().
+
+def _get_loop():
+    global _loop, _loop_thread
+    with _start_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='db-event-loop', daemon=True)
+            _loop_thread.start()
+        return _loop
+
+def submit(coro):
+    """Schedules `coro` on the background loop. Returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+def run_in_tk(widget, coro, on_done, on_error=None):
+    """
+    Runs `coro` in the background and calls on_done(result) on the Tk main
+    thread once it finishes. If it raises, on_error(exception) is called
+    instead (or the error is printed). Nothing is called if `widget` has been
+    destroyed in the meantime. Returns the Future, which can be cancel()ed.
+    """
+    future = submit(coro)
+
+    def poll():
+        if not future.done():
+            widget.after(TK_POLL_MS, poll)
+            return
+        if future.cancelled() or not widget.winfo_exists():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                print(f"Async DB Error: {error}")
+            return
+        on_done(future.result())
+
+    widget.after(TK_POLL_MS, poll)
+    return future
+
+def shutdown():
+    """Stops the background loop and worker threads. Call once on exit."""
+    global _executor, _loop, _loop_thread
+    with _start_lock:
+        if _loop is not None:
+            _loop.call_soon_threadsafe(_loop.stop)
+            _loop_thread.join(timeout=5)
+            _loop.close()
+            _loop = None
+            _loop_thread = None
+        if _executor is not None:
+            # Worker connections live in thread-local storage and are closed
+            # when their threads exit.
+            _executor.shutdown(wait=True)
+            _executor = None
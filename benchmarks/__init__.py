@@ -0,0 +1,2 @@
+# This file is intentionally left empty.
+# It tells Python that the 'benchmarks' directory is a package.
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Per-bill cost of calculate_bills() on 1,000,000 readings versus calling
+calculate_mahadiscom_bill() once per reading, and a check that both give
+the same total for every reading. Also times the exact integer path,
+calculate_bills_paise(), and counts the half-paisa ties where rounding the
+float total lands on a different paisa.
+
+Run from the project folder:
+    python -m benchmarks.bench_batch_billing
+"""
+import time
+
+import numpy as np
+
+from billing import calculate_bills, calculate_bills_paise, calculate_mahadiscom_bill
+
+def main(rows=1_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    kwh = np.round(rng.gamma(shape=2.0, scale=180.0, size=rows), 2)
+
+    start = time.perf_counter()
+    bills = calculate_bills(kwh)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals_paise = calculate_bills_paise(kwh)
+    paise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar_totals = np.array([calculate_mahadiscom_bill(units)[0]['F_Total_Bill'] for units in kwh.tolist()])
+    scalar_seconds = time.perf_counter() - start
+
+    paise_off = int(np.count_nonzero(np.round(bills['F_Total_Bill'], 2) != np.round(scalar_totals, 2)))
+    rounding_ties = int(np.count_nonzero(np.rint(np.round(bills['F_Total_Bill'], 2) * 100) != totals_paise))
+
+    print(f"\n{rows:,} bills")
+    print(f"calculate_mahadiscom_bill loop: {scalar_seconds:>8.3f} s  ({scalar_seconds / rows * 1e9:>7.1f} ns/bill)")
+    print(f"calculate_bills:                {batch_seconds:>8.3f} s  ({batch_seconds / rows * 1e9:>7.1f} ns/bill)"
+          f"  {scalar_seconds / batch_seconds:,.0f}x faster")
+    print(f"calculate_bills_paise:          {paise_seconds:>8.3f} s  ({paise_seconds / rows * 1e9:>7.1f} ns/bill)"
+          f"  {batch_seconds / paise_seconds:.2f}x faster than the float batch")
+    print(f"Totals that differ by a paisa or more: {paise_off}")
+    print(f"Float totals rounded to a different paisa than the exact path: {rounding_ties}")
+
+if __name__ == "__main__":
+    main()
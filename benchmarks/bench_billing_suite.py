@@ -0,0 +1,223 @@
+"""
+Billing speed, tracked like correctness: ops/sec for scalar billing on each
+side of the slab boundaries, batch billing, bill text rendering and the
+consumption upsert path (against a temporary database), compared with the
+baseline stored in BASELINE_FILE. Exits with status 1 if any case is slower
+than its baseline by more than the tolerance.
+
+Run from the project folder:
+    python -m benchmarks.bench_billing_suite                  # compare
+    python -m benchmarks.bench_billing_suite --update         # record a new baseline
+    python -m benchmarks.bench_billing_suite --tolerance 0.1  # stricter check
+
+BASELINE_FILE is committed as a reference; a missing baseline is an error
+unless --update is given. Baselines are only comparable on the same
+machine, so re-record them (--update) after changing hardware.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import billing
+import database
+import statements
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "billing_baseline.json")
+
+# A case may be this much slower (fraction of its baseline ops/sec) before
+# it counts as a regression. Each sample is the best of REPEATS runs of at
+# least MIN_RUN_SECONDS, and a case's rate is the median of its samples from
+# ROUNDS passes over the whole suite. On a shared machine single samples
+# swing by a third or more with CPU frequency changes and other load; taking
+# one sample per pass spreads a slow spell over different cases, and the
+# median (unlike retrying until a run passes) is as likely to err fast as slow.
+DEFAULT_TOLERANCE = 0.25
+REPEATS = 5
+ROUNDS = 5
+MIN_RUN_SECONDS = 0.05
+
+# Readings at and just past each slab boundary, plus one deep in the top slab
+SCALAR_KWH = (100, 100.01, 300, 300.01, 500, 500.01, 1000, 1000.01, 2500)
+
+BATCH_ROWS = 100_000
+TEXT_BILLS = 2000
+UPSERT_ROWS = 1000
+
+def best_rate(func, ops):
+    """
+    ops/sec of func(), which does `ops` operations. Like timeit.autorange(),
+    func() is looped until one timed run takes at least MIN_RUN_SECONDS, and
+    the best of REPEATS such runs is kept.
+    """
+    def timed(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+
+    loops = 1
+    seconds = timed(loops)
+    while seconds < MIN_RUN_SECONDS:
+        loops *= 2
+        seconds = timed(loops)
+    best = min([seconds] + [timed(loops) for _ in range(REPEATS - 1)])
+    return ops * loops / best
+
+def scalar_cases(measure):
+    for kwh in SCALAR_KWH:
+        def run(kwh=kwh):
+            for _ in range(1000):
+                billing.calculate_mahadiscom_bill(kwh)
+        measure(f"scalar_bill@{kwh:g}kWh", run, 1000)
+
+    readings = [float(kwh) for kwh in SCALAR_KWH] * 200
+    measure("scalar_bill_paise", lambda: [billing.calculate_bill_paise(kwh) for kwh in readings], len(readings))
+
+def batch_cases(measure):
+    kwh = np.round(np.random.default_rng(19).gamma(2.0, 180.0, BATCH_ROWS), 2)
+    measure("batch_bills", lambda: billing.calculate_bills(kwh), BATCH_ROWS)
+    measure("batch_bills_paise", lambda: billing.calculate_bills_paise(kwh), BATCH_ROWS)
+
+def text_cases(measure):
+    kwh = np.round(np.random.default_rng(23).gamma(2.0, 180.0, TEXT_BILLS), 2).tolist()
+    names = [f"Client {i}" for i in range(TEXT_BILLS)]
+    template = statements.template_for(billing.TARIFF)
+
+    def render_each():
+        for units, name in zip(kwh, names):
+            statements.render_bill(units, '2025-07', name, billing.TARIFF)
+
+    def render_batch():
+        for _ in template.render_batch(kwh, '2025-07', names):
+            pass
+
+    measure("render_bill", render_each, TEXT_BILLS)
+    measure("render_batch", render_batch, TEXT_BILLS)
+
+def upsert_cases(measure):
+    """cli.upsert_consumption_logic(), one autocommitted write per reading, as the CLI does it."""
+    import cli
+
+    original_db = database.DB_FILE
+    folder = tempfile.mkdtemp(prefix="bench_billing_suite_")
+    database.DB_FILE = os.path.join(folder, "bench.db")
+    try:
+        # A fresh database every round; its migration messages would only repeat
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.setup_database()
+        database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                               ((f"user{i}", "x", f"Client {i}") for i in range(UPSERT_ROWS)))
+        user_ids = [row[0] for row in database.db_query_rows("SELECT id FROM users WHERE role = 'client'")]
+        runs = itertools.count()
+
+        def insert():
+            # A fresh month per run, so every call takes the insert branch
+            run = next(runs)
+            month = f"{2000 + run // 12:04d}-{run % 12 + 1:02d}"
+            for user_id in user_ids:
+                cli.upsert_consumption_logic(user_id, month, 250.0)
+
+        def update():
+            for user_id in user_ids:
+                cli.upsert_consumption_logic(user_id, "2000-01", 420.5)
+
+        # The first insert run fills 2000-01, the month update() rewrites
+        insert()
+        measure("upsert_insert", insert, len(user_ids))
+        measure("upsert_update", update, len(user_ids))
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+        shutil.rmtree(folder, ignore_errors=True)
+
+def run_suite():
+    """ops/sec for every case: the median of its best_rate() samples over ROUNDS passes."""
+    samples = {}
+
+    def measure(name, func, ops):
+        samples.setdefault(name, []).append(best_rate(func, ops))
+
+    for _ in range(ROUNDS):
+        for group in (scalar_cases, batch_cases, text_cases, upsert_cases):
+            group(measure)
+    return {name: statistics.median(rates) for name, rates in samples.items()}
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(path, results):
+    baseline = {
+        "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "ops_per_sec": {name: round(rate, 1) for name, rate in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+def compare(results, baseline, tolerance):
+    """Prints the comparison table. Returns the names of the cases that regressed."""
+    recorded = baseline["ops_per_sec"]
+    regressions = []
+    print(f"{'Case':<24} | {'ops/s':>12} | {'baseline':>12} | {'change':>8} |")
+    print("-" * 70)
+    for name, rate in results.items():
+        base = recorded.get(name)
+        if base is None:
+            print(f"{name:<24} | {rate:>12,.0f} | {'-':>12} | {'':>8} | new")
+            continue
+        change = rate / base - 1
+        status = "ok"
+        if change < -tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24} | {rate:>12,.0f} | {base:>12,.0f} | {change:>+7.1%} | {status}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Billing benchmark suite with regression thresholds.")
+    parser.add_argument("--update", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown as a fraction (default {DEFAULT_TOLERANCE})")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.update:
+        if not os.path.exists(args.baseline):
+            print(f"Error: no baseline at {args.baseline}. Record one with --update.")
+            return 2
+        baseline = load_baseline(args.baseline)
+    results = run_suite()
+    if args.update:
+        save_baseline(args.baseline, results)
+        for name, rate in results.items():
+            print(f"{name:<24} | {rate:>12,.0f} ops/s")
+        print(f"\nBaseline recorded in {args.baseline}")
+        return 0
+
+    print(f"Baseline from {baseline['recorded_at']} (Python {baseline['python']}), "
+          f"tolerance {args.tolerance:.0%}\n")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} case(s) slower than the baseline allows: {', '.join(regressions)}")
+        return 1
+    print("\nOK: no case regressed past the tolerance.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
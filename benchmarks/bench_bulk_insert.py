@@ -0,0 +1,50 @@
+"""
+Row-at-a-time db_query inserts versus db_query_many chunked executemany.
+
+Run from the project folder:
+    python -m benchmarks.bench_bulk_insert [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import database
+
+INSERT_SQL = "INSERT INTO consumption (user_id, month, usage_kwh, total_bill, bill_status) VALUES (?, ?, ?, ?, 'Pending')"
+
+def rows(n, offset=0):
+    for i in range(offset, offset + n):
+        yield (i // 12 + 1, f"{2000 + (i % 12000) // 12:04d}-{i % 12 + 1:02d}", 123.45, 1234.5)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_bulk_"), "bench.db")
+    try:
+        database.setup_database()
+
+        # Row-at-a-time is slow, so time a slice of it and report the rate
+        single_n = min(n, 2000)
+        start = time.perf_counter()
+        for row in rows(single_n):
+            database.db_query(INSERT_SQL, row)
+        single_rate = single_n / (time.perf_counter() - start)
+        database.db_query("DELETE FROM consumption")
+
+        print(f"{'Method':<32} | {'rows':>8} | {'rows/s':>12}")
+        print("-" * 58)
+        print(f"{'db_query per row':<32} | {single_n:>8} | {single_rate:>12,.0f}")
+        for chunk_size in (500, 5000, 50000):
+            database.db_query("DELETE FROM consumption")
+            start = time.perf_counter()
+            result = database.db_query_many(INSERT_SQL, rows(n), chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            label = f"db_query_many chunk={chunk_size}"
+            print(f"{label:<32} | {result['rows']:>8} | {result['rows'] / elapsed:>12,.0f}")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
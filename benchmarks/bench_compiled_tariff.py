@@ -0,0 +1,66 @@
+"""
+Cost of one bill with the compiled tariff (bisect + one multiply-add) versus
+the old walk over every slab, which also formatted a label line per slab on
+every call.
+
+Run from the project folder:
+    python -m benchmarks.bench_compiled_tariff
+"""
+import random
+import timeit
+
+import billing
+
+def slab_walk_bill(kwh_units):
+    """calculate_mahadiscom_bill() as it was before the compiled tariff."""
+    bill = {}
+    bill_details = []
+    energy_charge = 0.0
+    remaining_units = kwh_units
+    slab_labels = ["  - 0-100 kWh:", "  - 101-300 kWh:", "  - 301-500 kWh:", "  - 501-1000 kWh:", "  - >1000 kWh:"]
+    for i, (slab_width, rate) in enumerate(billing.slabs):
+        if remaining_units <= 0:
+            break
+        units_in_this_slab = min(remaining_units, slab_width)
+        slab_cost = units_in_this_slab * rate
+        energy_charge += slab_cost
+        remaining_units -= units_in_this_slab
+        label = slab_labels[i] if i < len(slab_labels) else "  - Other:"
+        bill_details.append(f"{label} {units_in_this_slab:>6.2f} kWh @ ₹{rate:.2f}/unit = ₹{slab_cost:.2f}")
+    bill['A_Energy_Charge'] = energy_charge
+    bill['B_Fixed_Charge'] = billing.FIXED_CHARGE_SINGLE_PHASE
+    bill['C_Wheeling_Charge'] = kwh_units * billing.WHEELING_CHARGE_PER_KWH
+    bill['D_FAC'] = kwh_units * billing.FAC_PER_KWH
+    sub_total = bill['A_Energy_Charge'] + bill['B_Fixed_Charge'] + bill['C_Wheeling_Charge'] + bill['D_FAC']
+    bill['E_Electricity_Duty'] = sub_total * billing.ELECTRICITY_DUTY_RATE
+    bill['F_Total_Bill'] = sub_total + bill['E_Electricity_Duty']
+    return bill, bill_details
+
+def per_call_ns(func, readings, repeat=5):
+    best = min(timeit.repeat(lambda: [func(kwh) for kwh in readings], number=1, repeat=repeat))
+    return best / len(readings) * 1e9
+
+def main(count=100_000, seed=7):
+    rng = random.Random(seed)
+    readings = [round(rng.uniform(0, 2500), 2) for _ in range(count)]
+
+    mismatched = sum(1 for kwh in readings
+                     if round(slab_walk_bill(kwh)[0]['F_Total_Bill'], 2)
+                     != round(billing.calculate_mahadiscom_bill(kwh)[0]['F_Total_Bill'], 2))
+
+    walk = per_call_ns(slab_walk_bill, readings)
+    cases = [
+        ("old slab walk (+ labels)", walk),
+        ("calculate_mahadiscom_bill", per_call_ns(billing.calculate_mahadiscom_bill, readings)),
+        ("TARIFF.bill", per_call_ns(billing.TARIFF.bill, readings)),
+        ("TARIFF.energy_charge", per_call_ns(billing.TARIFF.energy_charge, readings)),
+        ("bill + line items read", per_call_ns(lambda kwh: list(billing.calculate_mahadiscom_bill(kwh)[1]), readings)),
+    ]
+    print(f"\n{'Per bill':<28} | {'ns':>8} | {'vs walk':>7}")
+    print("-" * 50)
+    for label, ns in cases:
+        print(f"{label:<28} | {ns:>8.0f} | {walk / ns:>6.1f}x")
+    print(f"\nTotals that differ from the slab walk (to the paisa): {mismatched} of {count:,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-call latency of the database helpers: connect-per-call (the old
+behaviour, reproduced here) versus the per-thread connection manager.
+
+Run from the project folder:
+    python -m benchmarks.bench_connections
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+import database
+
+READ_SQL = "SELECT id, month, usage_kwh, total_bill FROM consumption WHERE user_id = ? AND month = ?"
+WRITE_SQL = "INSERT INTO action_log (timestamp, actor, action) VALUES (?, ?, ?)"
+
+# --- Old helpers: open, run one statement, commit, close ---
+
+def legacy_db_query(query, params=()):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        conn.execute(query, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def legacy_db_query_to_df(query, params=()):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+def time_per_call(func, args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def seed(n_clients=200, months=12):
+    rows = [(uid, f"2025-{m:02d}", 150.0 + uid % 50, 1200.0)
+            for uid in range(1, n_clients + 1) for m in range(1, months + 1)]
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO consumption (user_id, month, usage_kwh, total_bill) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+def main(repeat=2000):
+    tmp_dir = tempfile.mkdtemp(prefix="bench_conn_")
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tmp_dir, "bench.db")
+    try:
+        database.setup_database()
+        seed()
+
+        read_args = (READ_SQL, (42, "2025-06"))
+        write_args = (WRITE_SQL, ("2025-01-01 00:00:00", "bench", "write"))
+        cases = [
+            ("db_query (INSERT)", legacy_db_query, database.db_query, write_args, repeat // 4),
+            ("db_query_to_df (point read)", legacy_db_query_to_df, database.db_query_to_df, read_args, repeat),
+            ("raw SELECT via db_query", legacy_db_query, database.db_query, read_args, repeat),
+        ]
+
+        print(f"{'Helper':<30} | {'per-call (before)':>18} | {'per-call (after)':>17} | {'speedup':>7}")
+        print("-" * 82)
+        for label, before_func, after_func, args, n in cases:
+            before = time_per_call(before_func, args, n)
+            after = time_per_call(after_func, args, n)
+            print(f"{label:<30} | {before:>15.1f} us | {after:>14.1f} us | {before / after:>6.1f}x")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
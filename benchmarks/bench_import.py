@@ -0,0 +1,70 @@
+"""
+Consumption CSV import: importer.import_consumption_csv() (chunked
+validation, one executemany upsert and one commit per chunk) on a 100,000-row
+meter file, half new readings and half corrections, against the old loop
+that called cli.upsert_consumption_logic() once per row, timed on the first
+PER_ROW_SAMPLE rows of the same file. Both run on temporary databases.
+
+Run from the project folder:
+    python -m benchmarks.bench_import
+"""
+import os
+import random
+import tempfile
+import time
+
+import database
+import importer
+
+PER_ROW_SAMPLE = 5000
+
+def _setup(path, clients, months):
+    database.reset_connections()
+    database.DB_FILE = path
+    database.setup_database()
+    database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                           ((f"user{i}", "x", f"Client {i}") for i in range(clients)))
+    # Readings already stored for the first month, so half the file updates
+    database.db_query_many("INSERT INTO consumption (user_id, month, usage_kwh) VALUES (?, ?, 100.0)",
+                           ((user_id, months[0]) for user_id in range(2, clients + 2)))
+
+def main(clients=50_000, seed=21):
+    import cli
+
+    rng = random.Random(seed)
+    months = ['2025-06', '2025-07']
+    folder = tempfile.mkdtemp(prefix="bench_import_")
+    csv_path = os.path.join(folder, "meters.csv")
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write("user_id,month,usage_kwh\n")
+        for month in months:
+            for user_id in range(2, clients + 2):
+                f.write(f"{user_id},{month},{round(rng.gammavariate(2.0, 180.0), 2)}\n")
+    rows = clients * len(months)
+
+    original_db = database.DB_FILE
+    try:
+        _setup(os.path.join(folder, "per_row.db"), clients, months)
+        with open(csv_path, encoding='utf-8') as f:
+            next(f)
+            sample = [line.rstrip("\n").split(",") for _, line in zip(range(PER_ROW_SAMPLE), f)]
+        start = time.perf_counter()
+        for user_id, month, usage_kwh in sample:
+            cli.upsert_consumption_logic(int(user_id), month, float(usage_kwh))
+        per_row_rate = len(sample) / (time.perf_counter() - start)
+
+        _setup(os.path.join(folder, "bulk.db"), clients, months)
+        summary = importer.import_consumption_csv(csv_path)
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+    print(f"\n{rows:,} CSV rows ({clients:,} clients x {len(months)} months)")
+    print(f"per-row upsert (first {PER_ROW_SAMPLE:,} rows): {per_row_rate:>10,.0f} rows/s "
+          f"(~{rows / per_row_rate:.1f} s for the file)")
+    print(f"import_consumption_csv:             {summary['rows_per_second']:>10,.0f} rows/s "
+          f"({summary['seconds']:.2f} s, {summary['rows_per_second'] / per_row_rate:.0f}x faster)")
+    print(f"Added {summary['added']:,}, updated {summary['updated']:,}, failed {summary['failed']:,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Parallel CSV parsing: importer.validated_chunks() over a 1,000,000-row meter
+file (1% malformed rows) with 1, 2, 4, ... parsing processes up to the
+machine's core count (at least 2), then the whole
+importer.import_consumption_csv() on a 200,000-row slice with one process and
+with the most, each on its own temporary database. Checks that every worker count reads the same valid and
+rejected rows and that both imports leave identical consumption tables.
+Parse throughput should grow with the number of cores; on a single-core
+machine the extra processes can only add overhead.
+
+Run from the project folder:
+    python -m benchmarks.bench_import_parallel
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import database
+import importer
+
+def _write_csv(path, rows, clients, months, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("user_id,month,usage_kwh\n")
+        for i in range(rows):
+            month = months[i % len(months)]
+            usage = "n/a" if rng.random() < 0.01 else round(rng.gammavariate(2.0, 180.0), 2)
+            f.write(f"{2 + i % clients},{month},{usage}\n")
+
+def _parse(path, workers):
+    """(seconds, valid rows, rejected rows, digest of everything read) for one parsing pass."""
+    digest = hashlib.sha256()
+    valid_rows = rejected_rows = 0
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        columns = importer._column_indexes(f.readline())
+        for valid, rejected, _, _ in importer.validated_chunks(f, columns, workers=workers):
+            valid_rows += len(valid)
+            rejected_rows += len(rejected)
+            digest.update(repr((valid, rejected)).encode())
+    return time.perf_counter() - start, valid_rows, rejected_rows, digest.hexdigest()
+
+def _import(path, db_path, clients, workers):
+    database.reset_connections()
+    database.DB_FILE = db_path
+    database.setup_database()
+    database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                           ((f"user{i}", "x", f"Client {i}") for i in range(clients)))
+    summary = importer.import_consumption_csv(path, workers=workers)
+    database.reset_connections()
+    with sqlite3.connect(db_path) as conn:
+        table = conn.execute("SELECT user_id, month, usage_kwh, total_bill FROM consumption "
+                             "ORDER BY user_id, month").fetchall()
+    return summary, table
+
+def main(rows=1_000_000, import_rows=200_000, clients=50_000, seed=22):
+    rng = random.Random(seed)
+    months = [f"2025-{m:02d}" for m in range(1, 13)]
+    folder = tempfile.mkdtemp(prefix="bench_import_parallel_")
+    csv_path = os.path.join(folder, "meters.csv")
+    _write_csv(csv_path, rows, clients, months, rng)
+    cores = os.cpu_count() or 1
+    # Always at least one pooled run, so the parallel path is checked even on one core
+    worker_counts = sorted({1, max(cores, 2)} | {n for n in (2, 4, 8, 16) if n < cores})
+
+    print(f"\n{rows:,} CSV rows, {os.path.getsize(csv_path) / 2**20:.0f} MB, {cores} core(s)")
+    baseline = None
+    for workers in worker_counts:
+        seconds, valid_rows, rejected_rows, digest = _parse(csv_path, workers)
+        if baseline is None:
+            baseline = (seconds, digest)
+        same = "same rows" if digest == baseline[1] else "DIFFERENT ROWS"
+        print(f"parse, {workers:>2} process(es): {seconds:>6.2f} s  {rows / seconds:>10,.0f} rows/s  "
+              f"{baseline[0] / seconds:>4.1f}x  ({valid_rows:,} valid, {rejected_rows:,} rejected, {same})")
+
+    slice_path = os.path.join(folder, "slice.csv")
+    with open(csv_path, 'rb') as src, open(slice_path, 'wb') as dst:
+        for _, line in zip(range(import_rows + 1), src):
+            dst.write(line)
+
+    original_db = database.DB_FILE
+    try:
+        serial, serial_table = _import(slice_path, os.path.join(folder, "serial.db"), clients, 1)
+        parallel, parallel_table = _import(slice_path, os.path.join(folder, "parallel.db"), clients, worker_counts[-1])
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+    print(f"\nimport_consumption_csv on {import_rows:,} rows:")
+    for label, summary in (("1 process", serial), (f"{worker_counts[-1]} processes", parallel)):
+        print(f"  {label:<14} {summary['seconds']:>6.2f} s  {summary['rows_per_second']:>10,.0f} rows/s  "
+              f"(added {summary['added']:,}, updated {summary['updated']:,}, failed {summary['failed']:,})")
+    same = serial_table == parallel_table and all(serial[key] == parallel[key]
+                                                  for key in ('rows', 'added', 'updated', 'failed', 'errors'))
+    print(f"Serial and parallel imports match: {same}")
+
+if __name__ == "__main__":
+    main()
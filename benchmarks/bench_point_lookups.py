@@ -0,0 +1,46 @@
+"""
+Cost of a single-row lookup through db_query_to_df versus db_query_one /
+db_query_scalar (the login, upsert and ticket-status call sites).
+
+Run from the project folder:
+    python -m benchmarks.bench_point_lookups
+"""
+import os
+import tempfile
+import time
+
+import database
+
+LOGIN_SQL = "SELECT id, password, role, full_name FROM users WHERE username = ?"
+EXISTS_SQL = "SELECT id FROM consumption WHERE user_id = ? AND month = ?"
+
+def time_per_call(func, args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main(repeat=5000):
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_lookup_"), "bench.db")
+    try:
+        database.setup_database()
+        database.db_query_many("INSERT INTO consumption (user_id, month, usage_kwh) VALUES (?, ?, ?)",
+                               ((uid, f"2025-{m:02d}", 100.0) for uid in range(1, 1001) for m in range(1, 13)))
+
+        cases = [
+            ("login row", LOGIN_SQL, ('admin',), database.db_query_one),
+            ("upsert existence check", EXISTS_SQL, (500, '2025-06'), database.db_query_scalar),
+        ]
+        print(f"{'Lookup':<24} | {'db_query_to_df':>15} | {'row helper':>12} | {'speedup':>7}")
+        print("-" * 70)
+        for label, sql, params, helper in cases:
+            df_us = time_per_call(database.db_query_to_df, (sql, params), repeat)
+            row_us = time_per_call(helper, (sql, params), repeat)
+            print(f"{label:<24} | {df_us:>12.1f} us | {row_us:>9.1f} us | {df_us / row_us:>6.1f}x")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Per-name cost of every read query in the catalog (queries.QUERIES), with
+sqlite3's per-connection statement cache switched off versus at
+database.STATEMENT_CACHE_SIZE. Uses the sample params from check_query_plans.
+
+Run from the project folder:
+    python -m benchmarks.bench_query_catalog
+"""
+import os
+import tempfile
+
+import database
+import queries
+from check_query_plans import CATALOG_PARAMS
+
+def read_queries():
+    return [name for name, sql in queries.QUERIES.items() if sql.lstrip().upper().startswith("SELECT")]
+
+def run_catalog(names, repeat):
+    """Average microseconds per call for each name."""
+    queries.reset_timings()
+    for name in names:
+        for _ in range(repeat):
+            queries.fetch_rows(name, CATALOG_PARAMS[name])
+    return {item['name']: item['avg_ms'] * 1000 for item in queries.timings()}
+
+def main(repeat=2000):
+    original_db = database.DB_FILE
+    original_cache = database.STATEMENT_CACHE_SIZE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_catalog_"), "bench.db")
+    try:
+        database.setup_database()
+        database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                               ((f"user{i}", "x", f"Client {i}") for i in range(1, 201)))
+        database.db_query_many("INSERT INTO consumption (user_id, month, usage_kwh) VALUES (?, ?, ?)",
+                               ((uid, f"2025-{m:02d}", 100.0) for uid in range(2, 202) for m in range(1, 13)))
+        names = [name for name in read_queries() if name != 'consumption_export']
+
+        database.STATEMENT_CACHE_SIZE = 0
+        database.reset_connections()
+        uncached = run_catalog(names, repeat)
+
+        database.STATEMENT_CACHE_SIZE = original_cache
+        database.reset_connections()
+        cached = run_catalog(names, repeat)
+
+        print(f"\n{'Query':<30} | {'no cache':>10} | {'cached':>10} | {'saved':>6}")
+        print("-" * 66)
+        for name in names:
+            saved = 1 - cached[name] / uncached[name]
+            print(f"{name:<30} | {uncached[name]:>7.1f} us | {cached[name]:>7.1f} us | {saved:>6.0%}")
+        print(f"\nPer-name timings from the cached run ({repeat} calls each):\n")
+        print(queries.format_timings())
+    finally:
+        database.STATEMENT_CACHE_SIZE = original_cache
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Tariff what-if simulator at scale: loads 1,000,000 readings (50,000 clients,
+20 months) once with simulator.load_consumption(), then bills them under
+three candidate tariffs with simulator.simulate(), and reports the time
+for each step.
+
+Run from the project folder:
+    python -m benchmarks.bench_simulator
+"""
+import os
+import random
+import tempfile
+import time
+
+import database
+import simulator
+
+CANDIDATES = [
+    {'name': 'Fixed +₹20', 'fixed_charge': 135.0},
+    {'name': 'Top slabs +10%', 'slabs': [[100, 3.46], [200, 7.43], [200, 11.35], [500, 12.88], [None, 12.88]]},
+    {'name': 'Flat ₹9.50', 'slabs': [[None, 9.50]], 'duty_rate': 0.15},
+]
+
+def main(clients=50_000, months=20, seed=17):
+    rng = random.Random(seed)
+    month_names = [f"{2024 + m // 12}-{m % 12 + 1:02d}" for m in range(months)]
+
+    original_db = database.DB_FILE
+    folder = tempfile.mkdtemp(prefix="bench_simulator_")
+    database.DB_FILE = os.path.join(folder, "bench.db")
+    try:
+        database.setup_database()
+        start = time.perf_counter()
+        database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                               ((f"user{i}", "x", f"Client {i}") for i in range(clients)))
+        database.db_query_many("INSERT INTO consumption (user_id, month, usage_kwh) VALUES (?, ?, ?)",
+                               ((user_id, month, round(rng.gammavariate(2.0, 180.0), 2))
+                                for month in month_names for user_id in range(2, clients + 2)))
+        print(f"Setup: {clients * months:,} readings in {time.perf_counter() - start:.1f} s\n")
+
+        data = simulator.load_consumption()
+        rows = len(data['usage_kwh'])
+        print(f"{'load_consumption':<22} {data['seconds']:>6.2f} s  ({rows / data['seconds']:>10,.0f} rows/s)")
+
+        candidates = [simulator.candidate_tariff(**definition) for definition in CANDIDATES]
+        start = time.perf_counter()
+        results = simulator.simulate(data, candidates)
+        seconds = time.perf_counter() - start
+        print(f"{'simulate, 3 scenarios':<22} {seconds:>6.2f} s  ({rows * len(candidates) / seconds:>10,.0f} bills/s)\n")
+
+        for result in results:
+            print(f"  {result['name']:<16} {result['seconds'] * 1000:>6.0f} ms  "
+                  f"revenue {result['delta_pct']:+6.2f}%  median bill {result['delta_percentiles'][50]:+8.2f}")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Startup cost of setup_database() on an up-to-date database.
+
+"before" replays what every launch used to do: run the schema steps that
+existed before versioning (PRE_VERSIONING_STEPS) again and bcrypt-hash the
+default admin password. Later steps are one-time migrations that never ran
+on every launch. "after" is the versioned fast
+path, which should issue exactly one statement (PRAGMA user_version).
+
+Run from the project folder:
+    python -m benchmarks.bench_startup
+"""
+import os
+import tempfile
+import time
+
+import bcrypt
+
+import database
+
+# Migrations 1 (base schema) and 2 (managed indexes) are what setup_database()
+# ran on every launch before the schema was versioned
+PRE_VERSIONING_STEPS = 2
+
+def time_ms(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def old_startup():
+    # Every step ran unconditionally, including the admin password hash
+    bcrypt.hashpw(b'admin123', bcrypt.gensalt())
+    conn = database.get_connection()
+    with database.transaction():
+        cursor = conn.cursor()
+        for version, _, step in database.MIGRATIONS:
+            if version <= PRE_VERSIONING_STEPS:
+                step(cursor)
+        cursor.close()
+
+def main():
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "bench.db")
+    try:
+        first_run = time_ms(database.setup_database, 1)
+
+        statements = []
+        conn = database.get_connection()
+        conn.set_trace_callback(statements.append)
+        database.setup_database()
+        conn.set_trace_callback(None)
+
+        before = time_ms(old_startup, 5)
+        after = time_ms(database.setup_database, 2000)
+
+        print(f"\nSchema version: {database.get_schema_version()}")
+        print(f"First run (fresh database):      {first_run:>10.3f} ms")
+        print(f"Every launch, before versioning: {before:>10.3f} ms")
+        print(f"Every launch, up-to-date now:    {after:>10.3f} ms  ({before / after:,.0f}x faster)")
+        print(f"Statements on the fast path:     {statements}")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-bill cost of statements.render_bill() versus the old `+=` bill text
+builder, then bills/s for statements.export_month_bills() writing one month
+of 50,000 clients to a single .txt and to a .zip of per-client files, before
+and after the month is issued (invoices.issue_month).
+
+Run from the project folder:
+    python -m benchmarks.bench_statements
+"""
+import os
+import random
+import tempfile
+import time
+import timeit
+
+import billing
+import database
+import invoices
+import statements
+
+def concat_bill_text(kwh_units, month, user_name):
+    """cli.get_bill_text() as it was before the statement template."""
+    bill_data, bill_details = billing.calculate_mahadiscom_bill(kwh_units)
+    bill_text = "--- ESTIMATED ELECTRICITY BILL ---\n\n"
+    bill_text += f"Client: {user_name}\n"
+    bill_text += f"Billing Month: {month}\n"
+    bill_text += f"Total Consumption: {kwh_units:.2f} kWh\n"
+    bill_text += "----------------------------------\n\n"
+    bill_text += "ITEMIZED CHARGES:\n\n"
+    bill_text += "A. Energy Charges:\n"
+    bill_text += "\n".join(bill_details) + "\n"
+    bill_text += f"   Total Energy Charge:   ₹{bill_data['A_Energy_Charge']:>10.2f}\n\n"
+    bill_text += f"B. Fixed Charge:             ₹{bill_data['B_Fixed_Charge']:>10.2f}\n"
+    bill_text += f"C. Wheeling Charge:          ₹{bill_data['C_Wheeling_Charge']:>10.2f}\n"
+    bill_text += f"D. Fuel Adjustment (FAC):    ₹{bill_data['D_FAC']:>10.2f}\n"
+    bill_text += "----------------------------------\n"
+    sub_total = bill_data['A_Energy_Charge'] + bill_data['B_Fixed_Charge'] + bill_data['C_Wheeling_Charge'] + bill_data['D_FAC']
+    bill_text += f"   Sub-Total:               ₹{sub_total:>10.2f}\n"
+    bill_text += f"E. Electricity Duty (16%):   ₹{bill_data['E_Electricity_Duty']:>10.2f}\n\n"
+    bill_text += "--- TOTAL BILL AMOUNT ---\n"
+    bill_text += f"   (A+B+C+D+E):             ₹{bill_data['F_Total_Bill']:>10.2f}\n"
+    bill_text += "----------------------------------\n"
+    bill_text += "\n\n--- APPLIED TARIFF (Residential LT-I) ---\n"
+    bill_text += f"Fixed Charge:      ₹{billing.FIXED_CHARGE_SINGLE_PHASE:.2f}/month\n"
+    bill_text += f"Wheeling Charge:   ₹{billing.WHEELING_CHARGE_PER_KWH:.2f}/kWh\n"
+    bill_text += f"Electricity Duty:  {billing.ELECTRICITY_DUTY_RATE * 100:.0f}%\n"
+    bill_text += "Energy Charges (Telescopic Slabs):\n"
+    bill_text += f"  - 0-100 kWh:       ₹{billing.slabs[0][1]:.2f}/unit\n"
+    bill_text += f"  - 101-300 kWh:     ₹{billing.slabs[1][1]:.2f}/unit\n"
+    bill_text += f"  - 301-500 kWh:     ₹{billing.slabs[2][1]:.2f}/unit\n"
+    bill_text += f"  - 501-1000 kWh:    ₹{billing.slabs[3][1]:.2f}/unit\n"
+    bill_text += f"  - >1000 kWh:       ₹{billing.slabs[4][1]:.2f}/unit\n"
+    return bill_text
+
+def per_call_us(func, readings, repeat=5):
+    best = min(timeit.repeat(lambda: [func(kwh, '2025-07', 'Client Name') for kwh in readings],
+                             number=1, repeat=repeat))
+    return best / len(readings) * 1e6
+
+def main(clients=50_000, seed=11):
+    rng = random.Random(seed)
+    readings = [round(rng.uniform(0, 2500), 2) for _ in range(20_000)]
+
+    def render_builtin(kwh, month, name):
+        return statements.render_bill(kwh, month, name, billing.TARIFF)
+
+    differing = sum(1 for kwh in readings
+                    if concat_bill_text(kwh, '2025-07', 'X') != render_builtin(kwh, '2025-07', 'X'))
+    old = per_call_us(concat_bill_text, readings)
+    new = per_call_us(render_builtin, readings)
+    print(f"\n{'Per bill':<24} | {'us':>7}")
+    print("-" * 34)
+    print(f"{'old += builder':<24} | {old:>7.2f}")
+    print(f"{'render_bill':<24} | {new:>7.2f}  ({old / new:.1f}x faster)")
+    print(f"Bills whose text differs: {differing} of {len(readings):,} (half-paisa ties on the total line)")
+
+    original_db = database.DB_FILE
+    folder = tempfile.mkdtemp(prefix="bench_statements_")
+    database.DB_FILE = os.path.join(folder, "bench.db")
+    try:
+        database.setup_database()
+        database.db_query_many("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, 'client', ?)",
+                               ((f"user{i}", "x", f"Client {i}") for i in range(clients)))
+        database.db_query_many("INSERT INTO consumption (user_id, month, usage_kwh) VALUES (?, '2025-07', ?)",
+                               ((user_id, round(rng.gammavariate(2.0, 180.0), 2)) for user_id in range(2, clients + 2)))
+
+        def export_all(label):
+            print(f"\nexport_month_bills, {clients:,} clients, {label}")
+            for filename in ("bills.txt", "bills.zip"):
+                path = os.path.join(folder, filename)
+                summary = statements.export_month_bills('2025-07', path)
+                size_mb = os.path.getsize(path) / 1e6
+                print(f"  {filename:<10} {summary['seconds']:>6.2f} s  {summary['bills_per_second']:>9,.0f} bills/s  {size_mb:>6.1f} MB")
+
+        export_all("estimated")
+        start = time.perf_counter()
+        issued = invoices.issue_month('2025-07')
+        seconds = time.perf_counter() - start
+        print(f"\ninvoices.issue_month: {issued:,} invoices in {seconds:.2f} s ({issued / seconds:,.0f}/s)")
+        export_all("issued")
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+if __name__ == "__main__":
+    main()
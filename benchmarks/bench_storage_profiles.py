@@ -0,0 +1,97 @@
+"""
+Concurrent read/write throughput for each storage profile in database.py.
+
+Reader threads do point lookups while one writer thread inserts action_log
+rows, the same traffic the Tk app and cli.py produce against one database.
+
+Run from the project folder:
+    python -m benchmarks.bench_storage_profiles [seconds]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import database
+
+READ_SQL = "SELECT id, usage_kwh, total_bill FROM consumption WHERE user_id = ? AND month = ?"
+WRITE_SQL = "INSERT INTO action_log (timestamp, actor, action) VALUES (?, ?, ?)"
+
+def seed(n_clients=500, months=12):
+    rows = [(uid, f"2025-{m:02d}", 150.0 + uid % 50, 1200.0)
+            for uid in range(1, n_clients + 1) for m in range(1, months + 1)]
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO consumption (user_id, month, usage_kwh, total_bill) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+def reader(stop, stats, index):
+    conn = database.get_connection()
+    ops = errors = 0
+    i = index
+    while not stop.is_set():
+        try:
+            conn.execute(READ_SQL, (i % 500 + 1, f"2025-{i % 12 + 1:02d}")).fetchall()
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        i += 7
+    database.close_connection()
+    stats.append(('read', ops, errors))
+
+def writer(stop, stats):
+    conn = database.get_connection()
+    ops = errors = 0
+    while not stop.is_set():
+        try:
+            conn.execute(WRITE_SQL, ("2025-01-01 00:00:00", "bench", "write"))
+            conn.commit()
+            ops += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors += 1
+    database.close_connection()
+    stats.append(('write', ops, errors))
+
+def run_profile(profile_name, seconds, n_readers):
+    tmp_dir = tempfile.mkdtemp(prefix=f"bench_{profile_name}_")
+    database.DB_FILE = os.path.join(tmp_dir, "bench.db")
+    database.setup_database(profile_name)
+    seed()
+
+    stop = threading.Event()
+    stats = []
+    threads = [threading.Thread(target=reader, args=(stop, stats, i)) for i in range(n_readers)]
+    threads.append(threading.Thread(target=writer, args=(stop, stats)))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    checkpoint = database.checkpoint_database('TRUNCATE')
+    database.reset_connections()
+
+    reads = sum(ops for kind, ops, _ in stats if kind == 'read')
+    writes = sum(ops for kind, ops, _ in stats if kind == 'write')
+    errors = sum(err for _, _, err in stats)
+    return reads / seconds, writes / seconds, errors, checkpoint
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    n_readers = 4
+    original_db, original_profile = database.DB_FILE, database.STORAGE_PROFILE
+    try:
+        print(f"{n_readers} readers + 1 writer, {seconds:.0f}s per profile\n")
+        print(f"{'Profile':<10} | {'reads/s':>10} | {'writes/s':>10} | {'lock errors':>11} | {'checkpoint':<16}")
+        print("-" * 70)
+        for profile_name in database.STORAGE_PROFILES:
+            reads, writes, errors, checkpoint = run_profile(profile_name, seconds, n_readers)
+            print(f"{profile_name:<10} | {reads:>10.0f} | {writes:>10.0f} | {errors:>11} | {str(checkpoint):<16}")
+    finally:
+        database.DB_FILE, database.STORAGE_PROFILE = original_db, original_profile
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+A month of bills where consumers are spread over every tariff category,
+against the same readings all in the default category: 1,000,000 readings
+over 12 months through tariffs.calculate_bills_paise_for_months(), which
+bills one vectorized pass per tariff. Also times dispatching a tariff per
+reading (tariff_for_month + bill_paise in a loop) on a slice of the rows, and
+checks that the grouped totals match it exactly.
+
+Run from the project folder:
+    python -m benchmarks.bench_tariff_categories
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import database
+import tariffs
+
+def best_of(func, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(rows=1_000_000, months=12, per_row_sample=100_000, seed=20):
+    rng = np.random.default_rng(seed)
+    kwh = np.round(rng.gamma(shape=2.0, scale=180.0, size=rows), 2)
+    month_names = np.array([f"2025-{m + 1:02d}" for m in range(months)])[rng.integers(0, months, rows)]
+    codes = list(tariffs.CATEGORIES)
+    mixed = np.array(codes)[rng.integers(0, len(codes), rows)]
+
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_tariff_categories_"), "bench.db")
+    try:
+        database.setup_database()
+        # A mid-year rate change in every category, so each month/category
+        # pair doesn't simply map to one tariff per category
+        for category in codes:
+            base = tariffs.tariff_for_month('2025-01', category)
+            slabs = [(width, round(rate * 1.05, 2)) for width, rate in base.slabs]
+            tariffs.save_tariff('2025-07', slabs, base.fixed_charge, base.wheeling_per_kwh,
+                                base.fac_per_kwh, base.duty_rate, category)
+
+        single_seconds = best_of(lambda: tariffs.calculate_bills_paise_for_months(kwh, month_names))
+        mixed_seconds = best_of(lambda: tariffs.calculate_bills_paise_for_months(kwh, month_names, mixed))
+        groups = len(tariffs.tariff_groups(month_names, mixed))
+
+        sample = slice(0, per_row_sample)
+        sample_rows = list(zip(kwh[sample].tolist(), month_names[sample].tolist(), mixed[sample].tolist()))
+        start = time.perf_counter()
+        per_row = [tariffs.tariff_for_month(month, category).bill_paise(units) for units, month, category in sample_rows]
+        per_row_seconds = (time.perf_counter() - start) * rows / per_row_sample
+
+        grouped = tariffs.calculate_bills_paise_for_months(kwh, month_names, mixed)
+        mismatches = int(np.count_nonzero(grouped[sample] != np.array(per_row)))
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+    print(f"\n{rows:,} readings, {months} months, {len(codes)} categories ({groups} tariffs in force)")
+    print(f"{'single category':<28} {single_seconds:>7.3f} s  ({single_seconds / rows * 1e9:>6.1f} ns/bill)")
+    print(f"{'mixed categories':<28} {mixed_seconds:>7.3f} s  ({mixed_seconds / rows * 1e9:>6.1f} ns/bill)"
+          f"  {mixed_seconds / single_seconds:.2f}x the single-category time")
+    print(f"{'per-reading dispatch (est.)':<28} {per_row_seconds:>7.3f} s  ({per_row_seconds / rows * 1e9:>6.1f} ns/bill)"
+          f"  {per_row_seconds / mixed_seconds:,.0f}x slower than grouped")
+    print(f"Grouped totals that differ from per-reading billing: {mismatches} of {per_row_sample:,}")
+
+if __name__ == "__main__":
+    main()
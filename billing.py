@@ -1,4 +1,11 @@
+import math
+import numpy as np
+from bisect import bisect_left
+from collections.abc import Sequence
+
 # --- Billing Constants ---
+# The built-in LT-I tariff. It seeds the `tariffs` table (see tariffs.py),
+# which is where the rates actually used for a month come from.
 FIXED_CHARGE_SINGLE_PHASE = 115.00
 WHEELING_CHARGE_PER_KWH = 1.40
 FAC_PER_KWH = 0.00
@@ -11,43 +18,293 @@ slabs = [
     (float('inf'), 11.71) # >1000 kWh (infinite width)
 ]
 
+# --- Tariff Categories ---
+# Every consumer is billed by the tariff of their category
+# (users.tariff_category); each category has its own effective-dated tariffs.
+# Codes are stored in the database, titles are printed on the bill.
+DEFAULT_TARIFF_CATEGORY = 'LT-I-1PH'
+TARIFF_CATEGORIES = {
+    'LT-I-1PH': "Residential LT-I",
+    'LT-I-3PH': "Residential LT-I, Three Phase",
+    'LT-II': "Commercial LT-II",
+}
+
+# Built-in rates for the other categories, seeded by migration 6.
+# Three-phase residential only differs in the fixed charge.
+FIXED_CHARGE_THREE_PHASE = 385.00
+FIXED_CHARGE_COMMERCIAL = 470.00
+ELECTRICITY_DUTY_RATE_COMMERCIAL = 0.21
+commercial_slabs = [
+    (200, 8.41),  # 0-200 kWh (width 200)
+    (float('inf'), 11.23) # >200 kWh (infinite width)
+]
+
+# category: (slabs, fixed charge, wheeling per kWh, FAC per kWh, duty rate)
+BUILTIN_TARIFFS = {
+    'LT-I-1PH': (slabs, FIXED_CHARGE_SINGLE_PHASE, WHEELING_CHARGE_PER_KWH, FAC_PER_KWH, ELECTRICITY_DUTY_RATE),
+    'LT-I-3PH': (slabs, FIXED_CHARGE_THREE_PHASE, WHEELING_CHARGE_PER_KWH, FAC_PER_KWH, ELECTRICITY_DUTY_RATE),
+    'LT-II': (commercial_slabs, FIXED_CHARGE_COMMERCIAL, WHEELING_CHARGE_PER_KWH, FAC_PER_KWH,
+              ELECTRICITY_DUTY_RATE_COMMERCIAL),
+}
+
+def tariff_category_title(category):
+    """The name printed on the bill for a category code (NULL means the default category)."""
+    category = category or DEFAULT_TARIFF_CATEGORY
+    return TARIFF_CATEGORIES.get(category, category)
+
+# --- Integer Paise ---
+# The exact billing path works in integers: readings in hundredths of a kWh,
+# money in paise, duty in basis points. Energy and sub-totals are then whole
+# multiples of 1/100 paisa, and the total is rounded half up to the paisa once,
+# at the very end.
+OPEN_ENDED_CENTI_KWH = 1 << 62
+
+def kwh_to_centi_kwh(kwh_units):
+    """A reading in whole hundredths of a kWh (the meter resolution)."""
+    return round(kwh_units * 100)
+
+def is_meter_reading(kwh_units):
+    """True if the reading has at most 2 decimal places, so both billing paths bill the same kWh."""
+    return math.isfinite(kwh_units) and abs(kwh_units * 100 - round(kwh_units * 100)) < 1e-6
+
+def paise_to_rupees(paise):
+    return paise / 100
+
+# --- Compiled Tariff ---
+class CompiledTariff:
+    """
+    A telescopic tariff prepared once, so a bill costs a bisect and one
+    multiply-add instead of a walk over every slab.
+
+    For slab i it stores the lower bound (kWh already billed by the slabs
+    below it) and the cost of all those lower slabs. The energy charge for
+    `kwh` that lands in slab i is then:
+        cumulative_costs[i] + (kwh - lower_bounds[i]) * rates[i]
+    """
+    def __init__(self, slabs, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate, effective_from=None,
+                 category=DEFAULT_TARIFF_CATEGORY, name=None):
+        self.effective_from = effective_from
+        # Label of a what-if tariff that is not stored (simulator scenarios)
+        self.name = name
+        self.category = category
+        self.title = tariff_category_title(category)
+        self.slabs = [(float(width), float(rate)) for width, rate in slabs]
+        self.fixed_charge = fixed_charge
+        self.wheeling_per_kwh = wheeling_per_kwh
+        self.fac_per_kwh = fac_per_kwh
+        self.duty_rate = duty_rate
+
+        self.lower_bounds = []
+        self.widths = []
+        self.rates = []
+        self.cumulative_costs = []
+        self.slab_labels = []
+        lower, cost = 0.0, 0.0
+        for width, rate in self.slabs:
+            self.lower_bounds.append(lower)
+            self.widths.append(width)
+            self.rates.append(rate)
+            self.cumulative_costs.append(cost)
+            if width == float('inf'):
+                self.slab_labels.append(f"  - >{lower:g} kWh:")
+            else:
+                self.slab_labels.append(f"  - {lower + 1 if lower else 0:g}-{lower + width:g} kWh:")
+            cost += width * rate
+            lower += width
+
+        # Same tables as arrays, for bills()
+        self._lower_bounds = np.array(self.lower_bounds)
+        self._widths = np.array(self.widths)
+        self._rates = np.array(self.rates)
+        self._cumulative_costs = np.array(self.cumulative_costs)
+
+        # Integer tables for bill_paise() / bills_paise(); cumulative costs
+        # are in 1/100 paisa (hundredths of a kWh x paise per kWh).
+        self.fixed_paise = round(fixed_charge * 100)
+        self.wheeling_paise = round(wheeling_per_kwh * 100)
+        self.fac_paise = round(fac_per_kwh * 100)
+        self.duty_basis_points = round(duty_rate * 10000)
+        self.lower_centi_kwh = []
+        self.width_centi_kwh = []
+        self.rates_paise = []
+        self.cumulative_centi_paise = []
+        lower, cost = 0, 0
+        for width, rate in self.slabs:
+            width = OPEN_ENDED_CENTI_KWH if width == float('inf') else kwh_to_centi_kwh(width)
+            rate = round(rate * 100)
+            self.lower_centi_kwh.append(lower)
+            self.width_centi_kwh.append(width)
+            self.rates_paise.append(rate)
+            self.cumulative_centi_paise.append(cost)
+            if width != OPEN_ENDED_CENTI_KWH:
+                cost += width * rate
+                lower += width
+        self._lower_centi_kwh = np.array(self.lower_centi_kwh, dtype=np.int64)
+        self._width_centi_kwh = np.array(self.width_centi_kwh, dtype=np.int64)
+        self._rates_paise = np.array(self.rates_paise, dtype=np.int64)
+        self._cumulative_centi_paise = np.array(self.cumulative_centi_paise, dtype=np.int64)
+
+    def slab_index(self, kwh_units):
+        """Index of the slab the last unit falls in (-1 for zero or negative usage)."""
+        return bisect_left(self.lower_bounds, kwh_units) - 1
+
+    def energy_charge(self, kwh_units):
+        i = self.slab_index(kwh_units)
+        if i < 0:
+            return 0.0
+        return self.cumulative_costs[i] + min(kwh_units - self.lower_bounds[i], self.widths[i]) * self.rates[i]
+
+    def bill(self, kwh_units):
+        """The bill components for one reading, keyed A_Energy_Charge ... F_Total_Bill."""
+        bill = {}
+        bill['A_Energy_Charge'] = self.energy_charge(kwh_units)
+        bill['B_Fixed_Charge'] = self.fixed_charge
+        bill['C_Wheeling_Charge'] = kwh_units * self.wheeling_per_kwh
+        bill['D_FAC'] = kwh_units * self.fac_per_kwh
+        sub_total = (bill['A_Energy_Charge'] + bill['B_Fixed_Charge'] +
+                     bill['C_Wheeling_Charge'] + bill['D_FAC'])
+        bill['E_Electricity_Duty'] = sub_total * self.duty_rate
+        bill['F_Total_Bill'] = sub_total + bill['E_Electricity_Duty']
+        return bill
+
+    def bills(self, kwh_units):
+        """bill() for an array of readings; same keys, each holding a float64 array."""
+        kwh = np.asarray(kwh_units, dtype=np.float64)
+        i = np.searchsorted(self._lower_bounds, kwh, side='left') - 1
+        billed = i >= 0
+        i = np.maximum(i, 0)
+        in_slab = np.minimum(kwh - self._lower_bounds[i], self._widths[i])
+        energy_charge = np.where(billed, self._cumulative_costs[i] + in_slab * self._rates[i], 0.0)
+
+        bills = {}
+        bills['A_Energy_Charge'] = energy_charge
+        bills['B_Fixed_Charge'] = np.full_like(kwh, self.fixed_charge)
+        bills['C_Wheeling_Charge'] = kwh * self.wheeling_per_kwh
+        bills['D_FAC'] = kwh * self.fac_per_kwh
+        sub_total = (bills['A_Energy_Charge'] + bills['B_Fixed_Charge'] +
+                     bills['C_Wheeling_Charge'] + bills['D_FAC'])
+        bills['E_Electricity_Duty'] = sub_total * self.duty_rate
+        bills['F_Total_Bill'] = sub_total + bills['E_Electricity_Duty']
+        return bills
+
+    def bill_paise(self, kwh_units):
+        """
+        The total bill for one reading in whole paise, in exact integer math.
+        The reading is taken to the nearest 0.01 kWh.
+        """
+        centi_kwh = kwh_to_centi_kwh(kwh_units)
+        i = bisect_left(self.lower_centi_kwh, centi_kwh) - 1
+        energy = 0
+        if i >= 0:
+            in_slab = min(centi_kwh - self.lower_centi_kwh[i], self.width_centi_kwh[i])
+            energy = self.cumulative_centi_paise[i] + in_slab * self.rates_paise[i]
+        sub_total = energy + self.fixed_paise * 100 + centi_kwh * (self.wheeling_paise + self.fac_paise)
+        # sub_total * (1 + duty) is in millionths of a paisa; round half up
+        return (sub_total * (10000 + self.duty_basis_points) + 500000) // 1000000
+
+    def bills_paise(self, kwh_units):
+        """bill_paise() for an array of readings; returns an int64 array."""
+        centi_kwh = np.rint(np.asarray(kwh_units, dtype=np.float64) * 100).astype(np.int64)
+        i = np.searchsorted(self._lower_centi_kwh, centi_kwh, side='left') - 1
+        billed = i >= 0
+        i = np.maximum(i, 0)
+        in_slab = np.minimum(centi_kwh - self._lower_centi_kwh[i], self._width_centi_kwh[i])
+        energy = np.where(billed, self._cumulative_centi_paise[i] + in_slab * self._rates_paise[i], 0)
+        sub_total = energy + self.fixed_paise * 100 + centi_kwh * (self.wheeling_paise + self.fac_paise)
+        return (sub_total * (10000 + self.duty_basis_points) + 500000) // 1000000
+
+    def line_items(self, kwh_units):
+        """The itemized energy-charge lines for one reading, one per slab used."""
+        lines = []
+        last = self.slab_index(kwh_units)
+        for i in range(last + 1):
+            units_in_this_slab = self.widths[i] if i < last else min(kwh_units - self.lower_bounds[i], self.widths[i])
+            slab_cost = units_in_this_slab * self.rates[i]
+            lines.append(f"{self.slab_labels[i]} {units_in_this_slab:>6.2f} kWh @ ₹{self.rates[i]:.2f}/unit = ₹{slab_cost:.2f}")
+        return lines
+
+    def rate_lines(self):
+        """The 'APPLIED TARIFF' footer lines printed under a bill."""
+        lines = [
+            f"Fixed Charge:      ₹{self.fixed_charge:.2f}/month",
+            f"Wheeling Charge:   ₹{self.wheeling_per_kwh:.2f}/kWh",
+            f"Electricity Duty:  {self.duty_rate * 100:.0f}%",
+            "Energy Charges (Telescopic Slabs):",
+        ]
+        for label, rate in zip(self.slab_labels, self.rates):
+            lines.append(f"{label:<21}₹{rate:.2f}/unit")
+        return lines
+
+class LineItems(Sequence):
+    """Itemized bill lines that are only formatted when first read."""
+    __slots__ = ('_tariff', '_kwh_units', '_lines')
+
+    def __init__(self, tariff, kwh_units):
+        self._tariff = tariff
+        self._kwh_units = kwh_units
+        self._lines = None
+
+    def _get_lines(self):
+        if self._lines is None:
+            self._lines = self._tariff.line_items(self._kwh_units)
+        return self._lines
+
+    def __getitem__(self, index):
+        return self._get_lines()[index]
+
+    def __len__(self):
+        return len(self._get_lines())
+
+    def __repr__(self):
+        return repr(self._get_lines())
+
+TARIFFS = {category: CompiledTariff(*definition, category=category)
+           for category, definition in BUILTIN_TARIFFS.items()}
+TARIFF = TARIFFS[DEFAULT_TARIFF_CATEGORY]
+
 # --- THIS IS THE MISSING FUNCTION ---
-def calculate_mahadiscom_bill(kwh_units):
+def calculate_mahadiscom_bill(kwh_units, tariff=None):
     """
     Calculates an estimated MSEDCL bill based on a telescopic tariff.
+    Returns (bill dict, itemized slab lines); the lines are only formatted if read.
+    `tariff` is a CompiledTariff (e.g. tariffs.tariff_for_month(month));
+    the built-in TARIFF is used when it is None.
+    """
+    if tariff is None:
+        tariff = TARIFF
+    return tariff.bill(kwh_units), LineItems(tariff, kwh_units)
+
+def calculate_bills(kwh_units, tariff=None):
+    """
+    Batch version of calculate_mahadiscom_bill() for a whole month of meters.
+
+    Takes a NumPy array, pandas Series or list of kWh readings and returns a
+    dict with the same keys as the single bill (A_Energy_Charge ... F_Total_Bill),
+    each holding a float64 array in the input's order. Both go through the
+    same compiled tariff with the same operations, so the results match the
+    scalar function exactly (not just to the paisa).
+    Itemized slab lines are not produced; use the scalar function for those.
+    """
+    if tariff is None:
+        tariff = TARIFF
+    return tariff.bills(kwh_units)
+
+def calculate_bill_paise(kwh_units, tariff=None):
     """
-    bill = {}
-    bill_details = []
-    energy_charge = 0.0
-    remaining_units = kwh_units
-    
-    slab_labels = [
-        "  - 0-100 kWh:",
-        "  - 101-300 kWh:",
-        "  - 301-500 kWh:",
-        "  - 501-1000 kWh:",
-        "  - >1000 kWh:"
-    ]
-    
-    for i, (slab_width, rate) in enumerate(slabs):
-        if remaining_units <= 0:
-            break
-            
-        units_in_this_slab = min(remaining_units, slab_width)
-        slab_cost = units_in_this_slab * rate
-        energy_charge += slab_cost
-        remaining_units -= units_in_this_slab
-        
-        label = slab_labels[i] if i < len(slab_labels) else "  - Other:"
-        bill_details.append(f"{label} {units_in_this_slab:>6.2f} kWh @ ₹{rate:.2f}/unit = ₹{slab_cost:.2f}")
-
-    bill['A_Energy_Charge'] = energy_charge
-    bill['B_Fixed_Charge'] = FIXED_CHARGE_SINGLE_PHASE
-    bill['C_Wheeling_Charge'] = kwh_units * WHEELING_CHARGE_PER_KWH
-    bill['D_FAC'] = kwh_units * FAC_PER_KWH
-    sub_total = (bill['A_Energy_Charge'] + bill['B_Fixed_Charge'] + 
-                 bill['C_Wheeling_Charge'] + bill['D_FAC'])
-    bill['E_Electricity_Duty'] = sub_total * ELECTRICITY_DUTY_RATE
-    bill['F_Total_Bill'] = sub_total + bill['E_Electricity_Duty']
-    
-    return bill, bill_details
\ No newline at end of file
+    The total bill for one reading as an int number of paise, computed in
+    exact integer arithmetic. This is the amount stored in
+    consumption.total_bill_paise. The reading is first taken to the nearest
+    0.01 kWh, so it only matches round(F_Total_Bill, 2) from the float path
+    for readings with at most 2 decimal places (is_meter_reading, which every
+    input path enforces), and then except where the float result sits on a
+    half-paisa tie.
+    """
+    if tariff is None:
+        tariff = TARIFF
+    return tariff.bill_paise(kwh_units)
+
+def calculate_bills_paise(kwh_units, tariff=None):
+    """Batch version of calculate_bill_paise(); returns an int64 array of paise."""
+    if tariff is None:
+        tariff = TARIFF
+    return tariff.bills_paise(kwh_units)
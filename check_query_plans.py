@@ -0,0 +1,182 @@
+"""
+Runs EXPLAIN QUERY PLAN on every query the app issues (the queries.py catalog
+plus the ones built at runtime) and fails (exit code 1) if any of them reads a
+whole table row by row.
+
+Builds a fresh temporary database with setup_database(), so it checks the
+schema and MANAGED_INDEXES exactly as the migration creates them.
+
+Usage:
+    python check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+import database
+import queries
+import rebill
+
+# Sample parameters for every query in the catalog (queries.QUERIES).
+CATALOG_PARAMS = {
+    'user_login': ('admin',),
+    'user_password': (1,),
+    'user_set_password': ('x', 1),
+    'user_insert': ('x', 'x', 'client', 'x'),
+    'user_update': ('x', 'x', 1),
+    'user_tariff_category': (1,),
+    'user_set_tariff_category': ('LT-II', 1),
+    'user_tariff_categories': (),
+    'user_delete': (1,),
+    'users_all': (),
+    'usernames': (),
+    'clients_by_name': (),
+    'consumption_id_for_month': (1, '2025-01'),
+    'consumption_usage_for_month': (1, '2025-01'),
+    'consumption_usage': (1,),
+    'consumption_months': (1,),
+    'consumption_by_month': (1,),
+    'consumption_by_month_desc': (1,),
+    'consumption_records': (1,),
+    'consumption_history': (1,),
+    'consumption_history_search': (1, '%2025%'),
+    'consumption_compare': (1,),
+    'consumption_export': (),
+    'consumption_insert': (1, '2025-01', 1.0, 100, 1.0),
+    'consumption_update': (1.0, 100, 1.0, 1),
+    'consumption_update_for_month': (1.0, 100, 1.0, 1, '2025-01'),
+    'consumption_statements_for_month': ('2025-01',),
+    'consumption_columns': (),
+    'consumption_columns_between': ('2025-01', '2025-12'),
+    'consumption_upsert': (1, '2025-01', 1.0, 100, 1.0),
+    'consumption_keys': (),
+    'import_job_running': ('x',),
+    'import_job_insert': ('x', 'x', 1, 0, 'x', 'x'),
+    'import_job_checkpoint': (1, 1, 0, 0, 0, 0, 0, 'x', 1),
+    'import_job_finish': ('Completed', 'x', 'x', 1),
+    'import_jobs_abandon': ('x', 'x'),
+    'consumption_set_total_bill': (100, 1.0, 1),
+    'consumption_pay': ('x', 1),
+    'consumption_delete': (1,),
+    'usage_total': (),
+    'usage_by_month': (),
+    'billing_totals_by_status': (),
+    'usage_by_client': (),
+    'usage_by_client_ranked': (),
+    'tariff_revision': (),
+    'tariffs_all': (),
+    'tariff_slabs_all': (),
+    'tariff_id_for_month': ('LT-II', '2025-01'),
+    'tariff_insert': ('LT-II', '2025-01', 1.0, 1.0, 1.0, 0.1),
+    'tariff_update': (1.0, 1.0, 1.0, 0.1, 1),
+    'tariff_delete': (1,),
+    'tariff_slab_insert': (1, 0, 100.0, 1.0),
+    'tariff_slabs_delete': (1,),
+    'consumption_for_month': (1, '2025-01'),
+    'consumption_uninvoiced_for_month': ('2025-01', 0, 5000),
+    'consumption_uninvoiced_statements_for_month': ('2025-01',),
+    'invoice_id_for_month': (1, '2025-01'),
+    'invoice_max_id': (),
+    'invoice_ids_after': (0,),
+    'invoice_counts_by_month': (),
+    'invoice_with_lines': (1, '2025-01'),
+    'invoice_statements_for_month': ('2025-01',),
+    'invoice_insert': (1, 1, '2025-01', 1.0, '0000-01', 1.0, 1.0, 1.0, 1.0, 4.0, 0.16, 0.64, 464, 'x', 'x', 'LT-I-1PH'),
+    'invoice_line_insert': (1, 0, 'x', 1.0, 1.0, 1.0),
+    'invoice_delete': (1,),
+    'invoice_lines_delete': (1,),
+    'tickets_for_user': (1,),
+    'tickets_all': (),
+    'tickets_by_status': ('Pending',),
+    'ticket_status': (1,),
+    'ticket_messages': (1,),
+    'ticket_insert': ('x', 1, 'x', 'x', 'x', 'x'),
+    'ticket_message_insert': (1, 1, 'x', 'x', 'x'),
+    'ticket_set_status': ('Pending', 'x', 1),
+    'action_log_recent': (),
+    'action_log_recent_by_actor': ('admin',),
+}
+
+# Catalog queries that return (or aggregate) every row of a table on purpose.
+CATALOG_FULL_SCANS_ALLOWED = {
+    'users_all',
+    'consumption_export',
+    'billing_totals_by_status',
+    # The tariff simulator reads every reading (and every user's category) once, on purpose
+    'consumption_columns',
+    'user_tariff_categories',
+    # An import loads every reading's key once to classify its rows in memory
+    'consumption_keys',
+    # The tariff cache loads every (tiny) tariff table in one go
+    'tariffs_all',
+    'tariff_slabs_all',
+    # Walks the rowid backwards and stops after 200 rows, so the SCAN is bounded
+    'action_log_recent',
+}
+
+# (query, params, full_scan_allowed) for the queries that are still put
+# together at runtime from search boxes and sort choices.
+# full_scan_allowed is only True for "list all users" and LIKE searches.
+DYNAMIC_QUERIES = [
+    ("SELECT id, username, full_name, role FROM users ORDER BY full_name", (), True),
+    ("SELECT id, username, full_name FROM users WHERE role = 'client' ORDER BY full_name", (), False),
+    ("SELECT id, username, full_name FROM users WHERE role = 'client' AND (username LIKE ? OR full_name LIKE ?) ORDER BY full_name",
+     ('%a%', '%a%'), False),
+    ("""SELECT u.id, u.username, u.full_name, u.role, COALESCE(SUM(c.usage_kwh), 0) as total_usage
+        FROM users u LEFT JOIN consumption c ON u.id = c.user_id
+        GROUP BY u.id, u.username, u.full_name, u.role ORDER BY role ASC""", (), True),
+    ("""SELECT u.id, u.username, u.full_name, u.role, COALESCE(SUM(c.usage_kwh), 0) as total_usage
+        FROM users u LEFT JOIN consumption c ON u.id = c.user_id
+        WHERE (u.username LIKE ? OR u.full_name LIKE ?)
+        GROUP BY u.id, u.username, u.full_name, u.role ORDER BY total_usage DESC""", ('%a%', '%a%'), True),
+]
+
+def rebill_queries():
+    """The rebill.py chunk read for each combination of month / user filters."""
+    checks = []
+    for month, user_id in ((None, None), ('2025-01', None), (None, 1), ('2025-01', 1)):
+        query, filter_params = rebill.chunk_query(month, user_id)
+        checks.append((query, [0, *filter_params, rebill.CHUNK_SIZE], False))
+    return checks
+
+def app_queries():
+    """Every (query, params, full_scan_allowed) to check: the catalog, DYNAMIC_QUERIES and rebill_queries()."""
+    missing = sorted(set(queries.QUERIES) - set(CATALOG_PARAMS))
+    if missing:
+        raise KeyError(f"No sample params in CATALOG_PARAMS for: {', '.join(missing)}")
+    checks = [(queries.sql(name), CATALOG_PARAMS[name], name in CATALOG_FULL_SCANS_ALLOWED)
+              for name in queries.QUERIES]
+    return checks + DYNAMIC_QUERIES + rebill_queries()
+
+def check_queries(checks):
+    """Returns a list of (query, full_scan_steps) for every query that fails."""
+    failures = []
+    for query, params, full_scan_allowed in checks:
+        plan = database.explain_query_plan(query, params)
+        scans = database.find_full_scans(plan)
+        if scans and not full_scan_allowed:
+            failures.append((query, scans))
+    return failures
+
+def main():
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="query_plans_"), "plans.db")
+    try:
+        database.setup_database()
+        checks = app_queries()
+        failures = check_queries(checks)
+    finally:
+        database.reset_connections()
+        database.DB_FILE = original_db
+
+    if failures:
+        print(f"\n{len(failures)} of {len(checks)} queries do a full table scan:\n")
+        for query, scans in failures:
+            print(" ".join(query.split()))
+            for step in scans:
+                print(f"    -> {step}")
+        sys.exit(1)
+    print(f"\nOK: none of the {len(checks)} app queries does an unexpected full table scan.")
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,16 @@ import bcrypt
 # --- Import from project files ---
 # We are reusing the same logic as the GUI!
 try:
-    from database import db_query, db_query_to_df, db_query_lastrowid, setup_database, log_action
-    from billing import calculate_mahadiscom_bill, slabs, FIXED_CHARGE_SINGLE_PHASE, WHEELING_CHARGE_PER_KWH, ELECTRICITY_DUTY_RATE
+    from database import db_query_to_df, setup_database, log_action, checkpoint_database, transaction
+    import query_stats
+    import queries
+    import tariffs
+    import rebill
+    import statements
+    import simulator
+    import invoices
+    import importer
+    from billing import calculate_bill_paise, is_meter_reading, paise_to_rupees
 except ImportError as e:
     print(f"Error: Could not import project files (database.py, billing.py).")
     print(f"Make sure this script is in the same folder as your other project files.")
@@ -21,7 +29,6 @@ except ImportError as e:
 try:
     import pandas as pd
     import openpyxl
-    import csv
     PANDAS_OK = True
 except ImportError:
     PANDAS_OK = False
@@ -62,15 +69,14 @@ def handle_login():
         wait_for_enter()
         return None
 
-    user_df = db_query_to_df("SELECT id, password, role, full_name FROM users WHERE username = ?", (username,))
+    user = queries.fetch_one('user_login', (username,))
     
-    if user_df.empty:
+    if user is None:
         log_action(username, "Failed login attempt (invalid username).")
         print("\nError: Invalid username or password.")
         wait_for_enter()
         return None
 
-    user = user_df.iloc[0]
     stored_hash = user['password']
     
     if isinstance(stored_hash, str):
@@ -125,8 +131,8 @@ def handle_register():
 
     try:
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        db_query(
-            "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
+        queries.execute(
+            'user_insert',
             (username, hashed_password, 'client', full_name)
         )
         log_action(username, "Registered new client account.")
@@ -160,13 +166,13 @@ def handle_change_password(session):
         wait_for_enter()
         return
     
-    user_df = db_query_to_df("SELECT password FROM users WHERE id = ?", (user_id,))
-    if user_df.empty:
+    user = queries.fetch_one('user_password', (user_id,))
+    if user is None:
         print("\nError: Could not find user record.")
         wait_for_enter()
         return
         
-    stored_hash = user_df.iloc[0]['password'].encode('utf-8')
+    stored_hash = user['password'].encode('utf-8')
     
     if not bcrypt.checkpw(current_pass.encode('utf-8'), stored_hash):
         print("\nError: Your 'Current Password' is incorrect.")
@@ -176,7 +182,7 @@ def handle_change_password(session):
         
     try:
         new_hashed_pass = bcrypt.hashpw(new_pass.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        db_query("UPDATE users SET password = ? WHERE id = ?", (new_hashed_pass, user_id))
+        queries.execute('user_set_password', (new_hashed_pass, user_id))
         log_action(username, "Changed their password successfully.")
         print("\nSuccess! Password changed successfully.")
     except Exception as e:
@@ -184,45 +190,13 @@ def handle_change_password(session):
         
     wait_for_enter()
 
-def get_bill_text(kwh_units, month, user_name):
-    """Uses the billing.py logic to generate bill text."""
-    bill_data, bill_details = calculate_mahadiscom_bill(kwh_units)
-    
-    bill_text = f"--- ESTIMATED ELECTRICITY BILL ---\n\n"
-    bill_text += f"Client: {user_name}\n"
-    bill_text += f"Billing Month: {month}\n"
-    bill_text += f"Total Consumption: {kwh_units:.2f} kWh\n"
-    bill_text += "----------------------------------\n\n"
-    bill_text += "ITEMIZED CHARGES:\n\n"
-    bill_text += f"A. Energy Charges:\n"
-    bill_text += "\n".join(bill_details) + "\n"
-    bill_text += f"   Total Energy Charge:   ₹{bill_data['A_Energy_Charge']:>10.2f}\n\n"
-    bill_text += f"B. Fixed Charge:             ₹{bill_data['B_Fixed_Charge']:>10.2f}\n"
-    bill_text += f"C. Wheeling Charge:          ₹{bill_data['C_Wheeling_Charge']:>10.2f}\n"
-    bill_text += f"D. Fuel Adjustment (FAC):    ₹{bill_data['D_FAC']:>10.2f}\n"
-    bill_text += "----------------------------------\n"
-    sub_total = bill_data['A_Energy_Charge'] + bill_data['B_Fixed_Charge'] + bill_data['C_Wheeling_Charge'] + bill_data['D_FAC']
-    bill_text += f"   Sub-Total:               ₹{sub_total:>10.2f}\n"
-    bill_text += f"E. Electricity Duty (16%):   ₹{bill_data['E_Electricity_Duty']:>10.2f}\n\n"
-    bill_text += f"--- TOTAL BILL AMOUNT ---\n"
-    bill_text += f"   (A+B+C+D+E):             ₹{bill_data['F_Total_Bill']:>10.2f}\n"
-    bill_text += "----------------------------------\n"
-    bill_text += "\n\n--- APPLIED TARIFF (Residential LT-I) ---\n"
-    bill_text += f"Fixed Charge:      ₹{FIXED_CHARGE_SINGLE_PHASE:.2f}/month\n"
-    bill_text += f"Wheeling Charge:   ₹{WHEELING_CHARGE_PER_KWH:.2f}/kWh\n"
-    bill_text += f"Electricity Duty:  {ELECTRICITY_DUTY_RATE * 100:.0f}%\n"
-    bill_text += "Energy Charges (Telescopic Slabs):\n"
-    bill_text += f"  - 0-100 kWh:       ₹{slabs[0][1]:.2f}/unit\n"
-    bill_text += f"  - 101-300 kWh:     ₹{slabs[1][1]:.2f}/unit\n"
-    bill_text += f"  - 301-500 kWh:     ₹{slabs[2][1]:.2f}/unit\n"
-    bill_text += f"  - 501-1000 kWh:    ₹{slabs[3][1]:.2f}/unit\n"
-    bill_text += f"  - >1000 kWh:       ₹{slabs[4][1]:.2f}/unit\n"
-    return bill_text
+def get_bill_text(user_id, month, user_name):
+    """The issued invoice for the month, or an estimate from the reading if it isn't issued yet."""
+    return statements.bill_text(user_id, month, user_name)
 
 def export_bill_to_txt(bill_text, client_name, month):
     try:
-        clean_client_name = client_name.replace(" ", "_")
-        filename = f"BILL_{clean_client_name}_{month}.txt"
+        filename = statements.bill_filename(client_name, month)
         
         with open(filename, "w", encoding="utf-8") as f:
             f.write(bill_text)
@@ -242,7 +216,7 @@ def handle_grievance_chat(session, ticket_id, subject):
         print_header(f"Chat for Ticket: {subject}", session)
         
         # 1. Load and display all messages
-        messages_df = db_query_to_df("SELECT sender_name, timestamp, message FROM grievance_messages WHERE ticket_id = ? ORDER BY timestamp ASC", (ticket_id,))
+        messages_df = queries.fetch_df('ticket_messages', (ticket_id,))
         if messages_df.empty:
             print("No messages found for this ticket.")
         else:
@@ -251,8 +225,7 @@ def handle_grievance_chat(session, ticket_id, subject):
                 print(f"{row['message']}\n")
         
         # 2. Check ticket status
-        status_df = db_query_to_df("SELECT status FROM grievance_tickets WHERE id = ?", (ticket_id,))
-        status = status_df.iloc[0]['status'] if not status_df.empty else 'Unknown'
+        status = queries.fetch_scalar('ticket_status', (ticket_id,), default='Unknown')
 
         if status == 'Resolved':
             print("--- This ticket is marked as 'Resolved'. You can no longer reply. ---")
@@ -274,14 +247,14 @@ def handle_grievance_chat(session, ticket_id, subject):
         # 4. Send the reply
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                     (ticket_id, user_id, full_name, reply, timestamp))
-            
-            # Update ticket status
             new_status = 'Answered' if role == 'admin' else 'Pending'
-            db_query("UPDATE grievance_tickets SET status = ?, updated_at = ? WHERE id = ?", (new_status, timestamp, ticket_id))
             
-            log_action(username, f"Replied to grievance ticket ID {ticket_id}.")
+            # Message, ticket status and log entry commit together
+            with transaction():
+                queries.execute('ticket_message_insert',
+                         (ticket_id, user_id, full_name, reply, timestamp))
+                queries.execute('ticket_set_status', (new_status, timestamp, ticket_id))
+                log_action(username, f"Replied to grievance ticket ID {ticket_id}.")
             print("\nReply sent successfully.")
             wait_for_enter()
         except Exception as e:
@@ -295,7 +268,7 @@ def client_bill_history(session):
     user_id, role, full_name, username = session
     print_header("My Bills / History", session)
     
-    data_df = db_query_to_df("SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ? ORDER BY month DESC", (user_id,))
+    data_df = queries.fetch_df('consumption_history', (user_id,))
     
     if data_df.empty:
         print("No consumption data found.")
@@ -346,8 +319,9 @@ def client_bill_history(session):
             confirm = input(f"Confirm payment of ₹{bill_to_pay['total_bill']:.2f} for {bill_to_pay['month']}? (y/n): ").lower()
             if confirm == 'y':
                 paid_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                db_query("UPDATE consumption SET bill_status = 'Paid', payment_timestamp = ? WHERE id = ?", (paid_timestamp, bill_id_to_pay))
-                log_action(username, f"Paid bill for {bill_to_pay['month']} (ID: {bill_id_to_pay}).")
+                with transaction():
+                    queries.execute('consumption_pay', (paid_timestamp, bill_id_to_pay))
+                    log_action(username, f"Paid bill for {bill_to_pay['month']} (ID: {bill_id_to_pay}).")
                 print("\nPayment successful!")
             else:
                 print("\nPayment cancelled.")
@@ -364,7 +338,7 @@ def client_generate_bill(session):
     user_id, role, full_name, username = session
     print_header("Generate Bill", session)
     
-    months_data = db_query_to_df("SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month DESC", (user_id,))
+    months_data = queries.fetch_df('consumption_by_month_desc', (user_id,))
     
     if months_data.empty:
         print("No consumption data found. Cannot generate a bill.")
@@ -383,10 +357,9 @@ def client_generate_bill(session):
         
         selected_row = months_data.iloc[choice - 1]
         month = selected_row['month']
-        kwh_units = selected_row['usage_kwh']
         
         clear_screen()
-        bill_text = get_bill_text(kwh_units, month, full_name)
+        bill_text = get_bill_text(user_id, month, full_name)
         print(bill_text)
         
         export_choice = input("\nDo you want to export this bill to a .txt file? (y/n): ").lower()
@@ -403,7 +376,7 @@ def client_view_stats(session):
     user_id, role, full_name, username = session
     print_header("My Usage Statistics", session)
     
-    data_df = db_query_to_df("SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month ASC", (user_id,))
+    data_df = queries.fetch_df('consumption_by_month', (user_id,))
     
     if data_df.empty:
         print("No consumption data found.")
@@ -465,18 +438,12 @@ def client_submit_grievance(session):
         token = f"T-{random.randint(100000, 999999)}"
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        ticket_id = db_query_lastrowid("INSERT INTO grievance_tickets (token, user_id, username, subject, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'Pending', ?, ?)",
-                                      (token, user_id, username, subject, timestamp, timestamp))
-        
-        if ticket_id is None:
-            print("\nError: Failed to create ticket.")
-            wait_for_enter()
-            return
-
-        db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                 (ticket_id, user_id, full_name, message, timestamp))
-                 
-        log_action(username, f"Submitted new grievance (Token: {token}).")
+        with transaction():
+            ticket_id = queries.execute_lastrowid('ticket_insert',
+                                          (token, user_id, username, subject, timestamp, timestamp))
+            queries.execute('ticket_message_insert',
+                     (ticket_id, user_id, full_name, message, timestamp))
+            log_action(username, f"Submitted new grievance (Token: {token}).")
         print(f"\nSuccess! Your ticket has been submitted.")
         print(f"Your Token ID is: {token}")
         
@@ -490,7 +457,7 @@ def client_view_tickets(session):
     user_id, role, full_name, username = session
     print_header("My Tickets", session)
     
-    tickets_df = db_query_to_df("SELECT id, token, created_at, subject, status FROM grievance_tickets WHERE user_id = ? ORDER BY updated_at DESC", (user_id,))
+    tickets_df = queries.fetch_df('tickets_for_user', (user_id,))
     
     if tickets_df.empty:
         print("You have not submitted any tickets.")
@@ -588,6 +555,22 @@ def manage_users_menu(session):
             print("Invalid choice.")
             wait_for_enter()
 
+def _input_tariff_category(current=None):
+    """Picks a tariff category by number; blank keeps `current` (default: the default category)."""
+    current = current or tariffs.DEFAULT_CATEGORY
+    codes = list(tariffs.CATEGORIES)
+    print("Tariff category:")
+    for i, code in enumerate(codes):
+        marker = " (current)" if code == current else ""
+        print(f"  {i+1}. {code:<9} {tariffs.CATEGORIES[code]}{marker}")
+    while True:
+        choice = input(f"Choose 1-{len(codes)} (leave blank to keep {current}): ").strip()
+        if not choice:
+            return current
+        if choice.isdigit() and 1 <= int(choice) <= len(codes):
+            return codes[int(choice) - 1]
+        print("Invalid choice.")
+
 def add_user(admin_name):
     print_header("Add New User")
     full_name = input("Full Name: ")
@@ -596,15 +579,19 @@ def add_user(admin_name):
     role = ""
     while role not in ['admin', 'client']:
         role = input("Enter Role (admin/client): ").lower()
+    category = _input_tariff_category() if role == 'client' else tariffs.DEFAULT_CATEGORY
         
     if not all([full_name, username, password, role]):
         print("Error: All fields are required. User not added.")
     else:
         try:
             hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            db_query("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
-                     (username, hashed_password, role, full_name))
-            log_action(admin_name, f"Added new user: '{username}' (Role: {role}).")
+            with transaction():
+                user_id = queries.execute_lastrowid('user_insert',
+                         (username, hashed_password, role, full_name))
+                if category != tariffs.DEFAULT_CATEGORY:
+                    tariffs.set_user_category(user_id, category)
+            log_action(admin_name, f"Added new user: '{username}' (Role: {role}, Tariff: {category}).")
             print(f"\nSuccess: User '{username}' created as {role}.")
         except sqlite3.IntegrityError:
             print("\nError: Username already exists.")
@@ -706,9 +693,18 @@ def update_user(admin_name):
     
     if not new_full_name: new_full_name = user_to_update['full_name']
     if not new_username: new_username = user_to_update['username']
+    old_category = new_category = tariffs.user_category(user_to_update['id'])
+    if user_to_update['role'] == 'client':
+        new_category = _input_tariff_category(old_category)
     
     try:
-        db_query("UPDATE users SET full_name = ?, username = ? WHERE id = ?", (new_full_name, new_username, user_to_update['id']))
+        with transaction():
+            queries.execute('user_update', (new_full_name, new_username, user_to_update['id']))
+            if new_category != old_category:
+                tariffs.set_user_category(user_to_update['id'], new_category)
+        if new_category != old_category:
+            log_action(admin_name, f"Moved user ID {user_to_update['id']} from tariff {old_category} to {new_category}.")
+            print(f"Tariff category changed to {new_category}. Stored bills keep their amounts until rebilled.")
         log_action(admin_name, f"Updated info for user ID {user_to_update['id']}.")
         print("User information updated successfully.")
     except sqlite3.IntegrityError:
@@ -734,7 +730,7 @@ def remove_user(admin_id, admin_name):
         
     confirm = input(f"\nAre you sure you want to remove '{username}' (ID: {user_id})? (y/n): ").lower()
     if confirm == 'y':
-        db_query("DELETE FROM users WHERE id = ?", (user_id,))
+        queries.execute('user_delete', (user_id,))
         log_action(admin_name, f"Removed user: '{username}' (ID: {user_id}).")
         print(f"\nSuccess: User '{username}' removed.")
     else:
@@ -766,7 +762,7 @@ def reset_password(admin_name):
         
     try:
         new_hashed_pass = bcrypt.hashpw(new_pass.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        db_query("UPDATE users SET password = ? WHERE id = ?", (new_hashed_pass, user_id))
+        queries.execute('user_set_password', (new_hashed_pass, user_id))
         log_action(admin_name, f"Reset password for user {username}.")
         print("Password has been reset successfully.")
     except Exception as e:
@@ -783,7 +779,7 @@ def export_users_to_excel(admin_name):
         
     print_header("Export Users to Excel")
     try:
-        df = db_query_to_df("SELECT id, username, full_name, role FROM users")
+        df = queries.fetch_df('users_all')
         filename = "user_export.xlsx"
         df.to_excel(filename, index=False, engine='openpyxl')
         log_action(admin_name, "Exported user list to Excel.")
@@ -874,15 +870,10 @@ def admin_view_consumption():
     
     search_term = input(f"\nSearch by month for {client_name} (e.g., 2025-09, or leave blank): ")
     
-    query = "SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ?"
-    params = [client_id]
-    
     if search_term:
-        query += " AND month LIKE ?"
-        params.append(f"%{search_term}%")
-    
-    query += " ORDER BY month DESC"
-    data_df = db_query_to_df(query, params=params)
+        data_df = queries.fetch_df('consumption_history_search', (client_id, f"%{search_term}%"))
+    else:
+        data_df = queries.fetch_df('consumption_history', (client_id,))
     
     print_header(f"Consumption for {client_name}")
     
@@ -924,13 +915,17 @@ def admin_edit_consumption(admin_name):
             wait_for_enter()
             return
         usage_float = float(usage_str)
+        if not is_meter_reading(usage_float):
+            print("\nError: Usage can have at most 2 decimal places.")
+            wait_for_enter()
+            return
             
         db_month = f"{year}-{month.zfill(2)}"
         
         # Use the upsert logic from the GUI
-        action = upsert_consumption_logic(client_id, db_month, usage_float)
-        
-        log_action(admin_name, f"{action} usage for '{client_name}' ({db_month}) to {usage_float} kWh.")
+        with transaction():
+            action = upsert_consumption_logic(client_id, db_month, usage_float)
+            log_action(admin_name, f"{action} usage for '{client_name}' ({db_month}) to {usage_float} kWh.")
         print(f"\nSuccess: Usage {action.lower()} for {client_name}.")
             
     except ValueError:
@@ -942,20 +937,17 @@ def admin_edit_consumption(admin_name):
 
 def upsert_consumption_logic(client_id, db_month, usage_float):
     """Shared logic for adding/updating a bill record."""
-    bill_data, _ = calculate_mahadiscom_bill(usage_float)
-    total_bill = round(bill_data['F_Total_Bill'], 2)
+    total_paise = calculate_bill_paise(usage_float, tariffs.tariff_for_user(client_id, db_month))
+    total_bill = paise_to_rupees(total_paise)
     
-    find_query = "SELECT id FROM consumption WHERE user_id = ? AND month = ?"
-    existing_record = db_query_to_df(find_query, params=(client_id, db_month))
+    record_id = queries.fetch_scalar('consumption_id_for_month', (client_id, db_month))
     
-    if not existing_record.empty:
-        record_id = existing_record.iloc[0]['id']
-        update_query = "UPDATE consumption SET usage_kwh = ?, total_bill = ?, bill_status = 'Pending', payment_timestamp = NULL WHERE id = ?"
-        db_query(update_query, params=(usage_float, total_bill, record_id))
+    if record_id is not None:
+        queries.execute('consumption_update', (usage_float, total_paise, total_bill, record_id))
+        invoices.reissue_if_issued(client_id, db_month)
         return "Updated"
     else:
-        insert_query = "INSERT INTO consumption (user_id, month, usage_kwh, total_bill, bill_status) VALUES (?, ?, ?, ?, 'Pending')"
-        db_query(insert_query, params=(client_id, db_month, usage_float, total_bill))
+        queries.execute('consumption_insert', (client_id, db_month, usage_float, total_paise, total_bill))
         return "Added"
 
 def admin_delete_consumption(admin_name):
@@ -968,7 +960,7 @@ def admin_delete_consumption(admin_name):
     client_name = client['full_name']
     
     print(f"\n--- Records for {client_name} ---")
-    data_df = db_query_to_df("SELECT id, month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month DESC", (client_id,))
+    data_df = queries.fetch_df('consumption_records', (client_id,))
     if data_df.empty:
         print("No records found for this client.")
         wait_for_enter()
@@ -995,7 +987,7 @@ def admin_delete_consumption(admin_name):
         # Use a simple text-based confirm
         confirm = input(f"Are you sure you want to delete the record for {client_name} for month {record_month}? (y/n): ").lower()
         if confirm == 'y':
-            db_query("DELETE FROM consumption WHERE id = ?", (record_id,))
+            queries.execute('consumption_delete', (record_id,))
             log_action(admin_name, f"Deleted usage record for {client_name} (Month: {record_month}, ID: {record_id}).")
             print("Usage record deleted.")
         else:
@@ -1020,32 +1012,32 @@ def import_consumption_csv(admin_name):
         wait_for_enter()
         return
         
-    added_count = 0
-    updated_count = 0
-    failed_count = 0
-    
+    workers = input(f"Parsing processes, 1-{os.cpu_count() or 1} (leave blank to decide by file size): ").strip()
+    if workers and not (workers.isdigit() and int(workers) >= 1):
+        print("Error: The number of processes must be a whole number of at least 1.")
+        wait_for_enter()
+        return
+    workers = int(workers) if workers else None
+
+    def show_progress(summary):
+        print(f"  ... {summary['rows']} rows read ({summary['bytes_read'] / max(summary['bytes_total'], 1):.0%})")
+
     try:
-        with open(filename, mode='r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            
-            for row in reader:
-                try:
-                    user_id = int(row['user_id'])
-                    month = row['month']
-                    usage_kwh = float(row['usage_kwh'])
+        summary = importer.import_consumption_csv(filename, progress=show_progress, workers=workers)
+        for row_number, reason in summary['errors'][:20]:
+            print(f"Failed to process row {row_number}: {reason}")
+        if summary['failed'] > 20:
+            print(f"... and {summary['failed'] - 20} more failed rows.")
+        if summary['error_file']:
+            print(f"Every rejected row, with the reason, is listed in {summary['error_file']}")
                     
-                    action = upsert_consumption_logic(user_id, month, usage_kwh)
-                    if action == "Added":
-                        added_count += 1
-                    else:
-                        updated_count += 1
-                except Exception as e:
-                    print(f"Failed to process row: {row}. Error: {e}")
-                    failed_count += 1
-                    
-        log_action(admin_name, f"Imported CSV: {added_count} added, {updated_count} updated, {failed_count} failed.")
+        log_action(admin_name, f"Imported CSV: {summary['added']} added, {summary['updated']} updated, {summary['failed']} failed.")
         print("\n--- Import Complete ---")
-        print(f"Added: {added_count}\nUpdated: {updated_count}\nFailed: {failed_count}")
+        if summary['resumed_at_row'] is not None:
+            print(f"Resumed an interrupted import of this file at row {summary['resumed_at_row']}.")
+        print(f"Added: {summary['added']}\nUpdated: {summary['updated']}\nFailed: {summary['failed']}")
+        print(f"Time: {summary['seconds']:.2f}s ({summary['rows_per_second']:,.0f} rows/s, "
+              f"{summary['workers']} parsing process{'es' if summary['workers'] > 1 else ''})")
         
     except Exception as e:
         print(f"An error occurred during import: {e}")
@@ -1060,12 +1052,7 @@ def export_consumption_to_excel(admin_name):
         
     print_header("Export All Consumption to Excel")
     try:
-        df = db_query_to_df("""
-            SELECT c.id, u.full_name, c.month, c.usage_kwh, c.total_bill, c.bill_status
-            FROM consumption c
-            JOIN users u ON c.user_id = u.id
-            ORDER BY u.full_name, c.month
-        """)
+        df = queries.fetch_df('consumption_export')
         filename = "consumption_export.xlsx"
         df.to_excel(filename, index=False, engine='openpyxl')
         log_action(admin_name, "Exported consumption list to Excel.")
@@ -1086,7 +1073,7 @@ def admin_generate_bill(session):
     client_id = client['id']
     client_name = client['full_name']
     
-    months_data = db_query_to_df("SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month DESC", (client_id,))
+    months_data = queries.fetch_df('consumption_by_month_desc', (client_id,))
     
     if months_data.empty:
         print("No consumption data found for this client.")
@@ -1105,10 +1092,9 @@ def admin_generate_bill(session):
         
         selected_row = months_data.iloc[choice - 1]
         month = selected_row['month']
-        kwh_units = selected_row['usage_kwh']
         
         clear_screen()
-        bill_text = get_bill_text(kwh_units, month, client_name)
+        bill_text = get_bill_text(client_id, month, client_name)
         print(bill_text)
         
         export_choice = input("\nDo you want to export this bill to a .txt file? (y/n): ").lower()
@@ -1120,16 +1106,86 @@ def admin_generate_bill(session):
     
     wait_for_enter()
     
+def admin_issue_month_bills(session):
+    """Issues (stores) the bills for every reading in a month, fixing their amounts."""
+    admin_id, role, admin_name, admin_username = session
+    print_header("Issue Bills for a Month", session)
+
+    months = queries.fetch_rows('usage_by_month')
+    if not months:
+        print("No consumption data found.")
+        wait_for_enter()
+        return
+    issued = invoices.issued_counts()
+    print("Month    | Issued bills")
+    print("-" * 22)
+    for row in months:
+        print(f"{row['month']:<8} | {issued.get(row['month'], 0)}")
+
+    month = input("\nMonth to issue (YYYY-MM): ").strip()
+    if month not in {row['month'] for row in months}:
+        print("\nError: No readings for that month.")
+        wait_for_enter()
+        return
+    print("Issued bills keep their amounts even if the tariff changes later.")
+    if input(f"Issue every un-issued bill for {month}? (y/n): ").lower() != 'y':
+        print("Cancelled.")
+        wait_for_enter()
+        return
+
+    try:
+        count = invoices.issue_month(month)
+        log_action(admin_username, f"Issued {count} bills for {month}.")
+        print(f"\nSuccess: {count} bill(s) issued for {month}.")
+    except Exception as e:
+        print(f"\nError: Could not issue bills. {e}")
+    wait_for_enter()
+
+def admin_export_month_bills(session):
+    """Writes every client's bill for one month to a .txt file or a .zip of per-client files."""
+    admin_id, role, admin_name, admin_username = session
+    print_header("Export All Bills for a Month", session)
+
+    months = queries.fetch_rows('usage_by_month')
+    if not months:
+        print("No consumption data found.")
+        wait_for_enter()
+        return
+    print("Months with readings: " + ", ".join(row['month'] for row in months))
+
+    month = input("\nMonth to export (YYYY-MM): ").strip()
+    if month not in {row['month'] for row in months}:
+        print("\nError: No readings for that month.")
+        wait_for_enter()
+        return
+
+    print("\n1. One .zip with a .txt per client")
+    print("2. One .txt with every bill")
+    fmt_choice = input("Enter choice: ")
+    if fmt_choice not in ('1', '2'):
+        print("Invalid choice.")
+        wait_for_enter()
+        return
+    default_name = f"BILLS_{month}.zip" if fmt_choice == '1' else f"BILLS_{month}.txt"
+    filename = input(f"File name (leave blank for {default_name}): ").strip() or default_name
+
+    def show_progress(bills_written):
+        print(f"  ... {bills_written} bills written")
+
+    try:
+        summary = statements.export_month_bills(month, filename, progress=show_progress)
+        log_action(admin_username, f"Exported {summary['bills']} bills for {month}.")
+        print(f"\nSuccess: {summary['bills']} bills written to {summary['path']}")
+        print(f"Time: {summary['seconds']:.2f}s ({summary['bills_per_second']:,.0f} bills/s)")
+    except Exception as e:
+        print(f"\nError: Could not export bills. {e}")
+    wait_for_enter()
+
 def admin_view_analytics():
     print_header("Site-Wide Analytics")
     
     # 1. Total by user
-    data_by_user = db_query_to_df("""
-        SELECT u.full_name, SUM(c.usage_kwh) as total_usage
-        FROM consumption c JOIN users u ON c.user_id = u.id
-        WHERE u.role = 'client'
-        GROUP BY u.full_name ORDER BY total_usage DESC
-    """)
+    data_by_user = queries.fetch_df('usage_by_client_ranked')
     print("\n--- Total Usage by Client ---")
     if data_by_user.empty:
         print("No client consumption data.")
@@ -1144,7 +1200,7 @@ def admin_view_analytics():
         print(f"{'TOTAL':<25} | {total_sum:<15.2f}")
 
     # 2. Total by month
-    data_by_month = db_query_to_df("SELECT month, SUM(usage_kwh) as total_usage FROM consumption GROUP BY month ORDER BY month")
+    data_by_month = queries.fetch_df('usage_by_month')
     print("\n--- Total Usage by Month ---")
     if data_by_month.empty:
         print("No monthly consumption data.")
@@ -1153,13 +1209,28 @@ def admin_view_analytics():
         print("-" * 28)
         for index, row in data_by_month.iterrows():
             print(f"{row['month']:<10} | {row['total_usage']:<15.2f}")
+
+    # 3. Billed amounts, summed exactly in paise
+    billing_rows = queries.fetch_rows('billing_totals_by_status')
+    print("\n--- Billed Amounts by Status ---")
+    if not billing_rows:
+        print("No bills yet.")
+    else:
+        print(f"{'Status':<10} | {'Bills':>7} | {'Amount (₹)':>15}")
+        print("-" * 38)
+        total_paise = 0
+        for row in billing_rows:
+            print(f"{row['bill_status']:<10} | {row['bills']:>7} | {paise_to_rupees(row['total_paise']):>15,.2f}")
+            total_paise += row['total_paise']
+        print("-" * 38)
+        print(f"{'TOTAL':<10} | {sum(row['bills'] for row in billing_rows):>7} | {paise_to_rupees(total_paise):>15,.2f}")
             
     wait_for_enter()
 
 def admin_compare_clients():
     print_header("Compare Clients")
     
-    clients = db_query_to_df("SELECT id, full_name FROM users WHERE role = 'client' ORDER BY full_name")
+    clients = queries.fetch_df('clients_by_name')
     if clients.empty:
         print("No clients found to compare.")
         wait_for_enter()
@@ -1187,7 +1258,7 @@ def admin_compare_clients():
     all_months = set()
 
     for cid in selected_ids:
-        client_df = db_query_to_df("SELECT month, usage_kwh, u.full_name FROM consumption c JOIN users u ON c.user_id = u.id WHERE c.user_id = ? ORDER BY month", (cid,))
+        client_df = queries.fetch_df('consumption_compare', (cid,))
         if not client_df.empty:
             all_data[client_df.iloc[0]['full_name']] = {row['month']: row['usage_kwh'] for index, row in client_df.iterrows()}
             all_months.update(client_df['month'])
@@ -1228,14 +1299,10 @@ def admin_manage_grievances(session):
         status_map = {'1': 'All', '2': 'Pending', '3': 'Answered', '4': 'Resolved'}
         filter_status = status_map.get(filter_choice, 'All')
         
-        base_query = "SELECT id, token, created_at, username, subject, status FROM grievance_tickets"
-        params = []
         if filter_status != "All":
-            base_query += " WHERE status = ?"
-            params.append(filter_status)
-        base_query += " ORDER BY updated_at DESC"
-        
-        tickets_df = db_query_to_df(base_query, params=params)
+            tickets_df = queries.fetch_df('tickets_by_status', (filter_status,))
+        else:
+            tickets_df = queries.fetch_df('tickets_all')
 
         if tickets_df.empty:
             print(f"\nNo '{filter_status}' tickets found.")
@@ -1278,13 +1345,12 @@ def admin_manage_grievances(session):
 
 def admin_resolve_grievance(session, ticket_id):
     """Quickly resolves a ticket from the admin menu."""
-    status_df = db_query_to_df("SELECT status FROM grievance_tickets WHERE id = ?", (ticket_id,))
-    if status_df.empty:
+    status = queries.fetch_scalar('ticket_status', (ticket_id,))
+    if status is None:
         print("Invalid Ticket ID.")
         wait_for_enter()
         return
 
-    status = status_df.iloc[0]['status']
     if status == "Resolved":
         print("That ticket is already resolved.")
         wait_for_enter()
@@ -1292,8 +1358,9 @@ def admin_resolve_grievance(session, ticket_id):
 
     if input(f"Are you sure you want to mark ticket ID {ticket_id} as 'Resolved'? (y/n): ").lower() == 'y':
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        db_query("UPDATE grievance_tickets SET status = 'Resolved', updated_at = ? WHERE id = ?", (timestamp, ticket_id))
-        log_action(session[3], f"Resolved grievance ticket ID {ticket_id}.")
+        with transaction():
+            queries.execute('ticket_set_status', ('Resolved', timestamp, ticket_id))
+            log_action(session[3], f"Resolved grievance ticket ID {ticket_id}.")
         print("Ticket marked as resolved.")
     else:
         print("Action cancelled.")
@@ -1303,7 +1370,7 @@ def admin_view_log(session):
     """Allows admin to filter and view the action log."""
     print_header("View Action Log", session)
     
-    users_df = db_query_to_df("SELECT username FROM users ORDER BY username")
+    users_df = queries.fetch_df('usernames')
     user_list = ["All Users"] + list(users_df['username'])
     
     print("Filter by User:")
@@ -1319,16 +1386,10 @@ def admin_view_log(session):
     except ValueError:
         selected_user = "All Users"
 
-    base_query = "SELECT timestamp, actor, action FROM action_log"
-    params = []
-    
     if selected_user != "All Users":
-        base_query += " WHERE actor = ?"
-        params.append(selected_user)
-        
-    base_query += " ORDER BY id DESC LIMIT 200"
-    
-    log_df = db_query_to_df(base_query, params=params)
+        log_df = queries.fetch_df('action_log_recent_by_actor', (selected_user,))
+    else:
+        log_df = queries.fetch_df('action_log_recent')
     
     clear_screen()
     print(f"--- Action Log (Filter: {selected_user}) ---")
@@ -1342,6 +1403,238 @@ def admin_view_log(session):
             
     wait_for_enter()
 
+def _print_tariffs():
+    tariff_list = tariffs.list_tariffs()
+    if not tariff_list:
+        print("No tariffs stored; bills use the built-in tariffs.")
+        return tariff_list
+    category = None
+    for i, tariff in enumerate(tariff_list):
+        if tariff.category != category:
+            category = tariff.category
+            print(f"--- {category}: {tariff.title} ---")
+        print(f"{i+1}. Effective from {tariff.effective_from}")
+        for line in tariff.rate_lines():
+            print(f"     {line}")
+    return tariff_list
+
+def _input_tariff_slabs():
+    """Reads slabs as 'width rate' lines (width 'inf' for the last one). Returns [(width, rate), ...]."""
+    print("\nEnter one slab per line as: <width kWh> <rate per unit>")
+    print("Use 'inf' as the width of the last (open-ended) slab. Blank line to finish.")
+    slab_list = []
+    while True:
+        line = input(f"  Slab {len(slab_list) + 1}: ").strip()
+        if not line:
+            break
+        width, rate = line.split()
+        slab_list.append((float(width), float(rate)))
+    return slab_list
+
+def _print_rebill_summary(summary):
+    verb = "would change" if summary['dry_run'] else "updated"
+    print(f"{summary['rows_scanned']} rows scanned in {summary['chunks']} chunk(s), "
+          f"{summary['rows_changed']} {verb}.")
+    print(f"Billed total: ₹{summary['old_total']:,.2f} -> ₹{summary['new_total']:,.2f} "
+          f"({summary['new_total'] - summary['old_total']:+,.2f})")
+    print(f"Time: {summary['seconds']:.2f}s ({summary['rows_per_second']:,.0f} rows/s)")
+
+def admin_rebill(admin_username):
+    """Recomputes stored bill totals after a tariff change: dry run first, then apply."""
+    print("\n--- Rebill Consumption ---")
+    print("Recomputes stored bill totals with the tariff in force for each month.")
+    print("Payment status is not changed, and issued bills keep their amounts.\n")
+
+    month = input("Month to rebill (YYYY-MM, leave blank for all months): ").strip() or None
+    if month is not None and not tariffs.MONTH_PATTERN.match(month):
+        print("\nError: Invalid month format. Please use YYYY-MM.")
+        wait_for_enter()
+        return
+
+    user_id, scope = None, "all clients"
+    if input("Limit to one client? (y/n): ").lower() == 'y':
+        client = _select_client_helper()
+        if client is None:
+            wait_for_enter()
+            return
+        user_id, scope = client['id'], client['full_name']
+    scope += f", {month}" if month else ", all months"
+
+    print(f"\nDry run ({scope})...")
+    summary = rebill.rebill(month=month, user_id=user_id, dry_run=True)
+    if summary['diff']:
+        names = {row['id']: row['full_name'] for row in queries.fetch_rows('clients_by_name')}
+        print(f"\n{'Client':<25} | {'Month':<7} | {'kWh':>8} | {'Old Bill':>10} | {'New Bill':>10}")
+        print("-" * 73)
+        for record_id, client_id, row_month, usage_kwh, old_total, new_total in summary['diff'][:20]:
+            print(f"{names.get(client_id, client_id)!s:<25.25} | {row_month:<7} | {usage_kwh:>8.2f} | "
+                  f"{old_total:>10.2f} | {new_total:>10.2f}")
+        if summary['rows_changed'] > 20:
+            print(f"... and {summary['rows_changed'] - 20} more.")
+        print()
+    _print_rebill_summary(summary)
+
+    if summary['rows_changed'] == 0:
+        print("\nAll stored bills are already up to date.")
+        wait_for_enter()
+        return
+    if input("\nApply these changes? (y/n): ").lower() != 'y':
+        print("Cancelled. Nothing was changed.")
+        wait_for_enter()
+        return
+
+    def show_progress(rows_scanned, rows_changed):
+        print(f"  ... {rows_scanned} rows scanned, {rows_changed} updated")
+
+    try:
+        summary = rebill.rebill(month=month, user_id=user_id, progress=show_progress)
+        log_action(admin_username, f"Rebilled {summary['rows_changed']} consumption records ({scope}).")
+        print()
+        _print_rebill_summary(summary)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+    wait_for_enter()
+
+def _input_candidate_tariff():
+    """Reads one what-if tariff; blank answers keep the current tariff's values."""
+    def optional_float(prompt):
+        value = input(prompt).strip()
+        return float(value) if value else None
+
+    name = input("Scenario name: ").strip() or "Candidate"
+    category = _input_tariff_category()
+    fixed_charge = optional_float("Fixed charge (₹/month, blank = current): ")
+    wheeling = optional_float("Wheeling charge (₹/kWh, blank = current): ")
+    fac = optional_float("Fuel adjustment (₹/kWh, blank = current): ")
+    duty_percent = optional_float("Electricity duty (%, blank = current): ")
+    print("Slabs (enter none to keep the current slabs):")
+    slab_list = _input_tariff_slabs() or None
+    return simulator.candidate_tariff(name, slab_list, fixed_charge, wheeling, fac,
+                                      None if duty_percent is None else duty_percent / 100, category=category)
+
+def admin_simulate_tariffs():
+    """Bills every stored reading under candidate tariffs and compares with the stored tariffs."""
+    print("\n--- Tariff What-if Simulator ---")
+    print("Nothing is saved: bills are recomputed in memory and compared with")
+    print("what the tariffs in force for each month charge.\n")
+    try:
+        path = input("JSON file of candidate tariffs (leave blank to enter one): ").strip()
+        if path:
+            candidates = simulator.load_candidates(path)
+        else:
+            candidates = [_input_candidate_tariff()]
+    except (OSError, TypeError, ValueError) as e:
+        print(f"\nError: Could not read candidate tariffs. {e}")
+        wait_for_enter()
+        return
+
+    from_month = input("\nFrom month (YYYY-MM, blank = first): ").strip() or None
+    to_month = input("To month (YYYY-MM, blank = last): ").strip() or None
+    if any(month is not None and not tariffs.MONTH_PATTERN.match(month) for month in (from_month, to_month)):
+        print("\nError: Invalid month format. Please use YYYY-MM.")
+        wait_for_enter()
+        return
+
+    print("\nLoading consumption...")
+    data = simulator.load_consumption(from_month, to_month)
+    print(f"{len(data['usage_kwh']):,} readings loaded in {data['seconds']:.2f}s.\n")
+    if not len(data['usage_kwh']):
+        print("No consumption records in that range.")
+        wait_for_enter()
+        return
+
+    results = simulator.simulate(data, candidates)
+    names = {row['id']: row['full_name'] for row in queries.fetch_rows('clients_by_name')}
+    print(simulator.format_report(results, names))
+    wait_for_enter()
+
+def admin_manage_tariffs(session):
+    """Lists the effective-dated tariffs and adds, replaces or deletes them."""
+    admin_id, role, admin_name, admin_username = session
+
+    while True:
+        print_header("Manage Tariffs", session)
+        _print_tariffs()
+        print("\n1. Add / Replace Tariff for a Month")
+        print("2. Delete Tariff")
+        print("3. Rebill Consumption (recompute stored bills)")
+        print("4. Simulate Candidate Tariffs (what-if)")
+        print("5. Back to Admin Menu")
+
+        choice = input("\nEnter choice: ")
+        if choice == '1':
+            try:
+                category = _input_tariff_category()
+                effective_from = input("Effective from month (YYYY-MM): ").strip()
+                fixed_charge = float(input("Fixed charge (₹/month): "))
+                wheeling = float(input("Wheeling charge (₹/kWh): "))
+                fac = float(input("Fuel adjustment (₹/kWh): "))
+                duty_percent = float(input("Electricity duty (%): "))
+                slab_list = _input_tariff_slabs()
+                tariffs.save_tariff(effective_from, slab_list, fixed_charge, wheeling, fac, duty_percent / 100,
+                                    category)
+                log_action(admin_username, f"Saved {category} tariff effective from {effective_from}.")
+                print(f"\nSuccess: {category} tariff effective from {effective_from} saved.")
+            except ValueError as e:
+                print(f"\nError: Invalid tariff. {e}")
+            except Exception as e:
+                print(f"\nAn error occurred: {e}")
+            wait_for_enter()
+        elif choice == '2':
+            category = _input_tariff_category()
+            effective_from = input("Effective-from month of the tariff to delete (YYYY-MM): ").strip()
+            if tariffs.delete_tariff(effective_from, category):
+                log_action(admin_username, f"Deleted {category} tariff effective from {effective_from}.")
+                print(f"\nSuccess: {category} tariff effective from {effective_from} deleted.")
+            else:
+                print(f"\nError: No {category} tariff takes effect from that month.")
+            wait_for_enter()
+        elif choice == '3':
+            admin_rebill(admin_username)
+        elif choice == '4':
+            admin_simulate_tariffs()
+        elif choice == '5':
+            break
+        else:
+            print("Invalid choice.")
+            wait_for_enter()
+
+def admin_query_report(session):
+    """Shows per-query timings (p50/p95/p99) recorded by query_stats."""
+    while True:
+        print_header("Query Performance Report", session)
+        status = "ON" if query_stats.ENABLED else "OFF"
+        print(f"Instrumentation: {status} | Slow-query log: {query_stats.SLOW_QUERY_LOG} (>= {query_stats.SLOW_QUERY_MS:g} ms)\n")
+        print(query_stats.format_summary(limit=20))
+        print("\n--- Catalog Queries (always recorded) ---")
+        print(queries.format_timings(limit=20))
+        print("\n1. Turn instrumentation " + ("OFF" if query_stats.ENABLED else "ON"))
+        print("2. Reset Recorded Stats")
+        print("3. Save Full Report to File")
+        print("4. Back to Admin Menu")
+
+        choice = input("\nEnter choice: ")
+        if choice == '1':
+            if query_stats.ENABLED:
+                query_stats.disable()
+            else:
+                query_stats.enable()
+        elif choice == '2':
+            query_stats.reset()
+            queries.reset_timings()
+        elif choice == '3':
+            filename = f"query_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            try:
+                query_stats.dump(filename)
+                with open(filename, 'a', encoding='utf-8') as f:
+                    f.write("\n" + queries.format_timings() + "\n")
+                print(f"Report saved to {os.path.abspath(filename)}")
+            except OSError as e:
+                print(f"Error saving report: {e}")
+            wait_for_enter()
+        elif choice == '4':
+            break
+
 # --- ADMIN: Main Menu ---
 
 def admin_menu(session):
@@ -1354,13 +1647,17 @@ def admin_menu(session):
         print("  2. Manage Consumption (View, Edit, Import, etc.)")
         print("--- Billing & Analytics ---")
         print("  3. Generate Client Bill")
-        print("  4. View Site-Wide Analytics")
-        print("  5. Compare Clients")
+        print("  4. Issue Bills for a Month")
+        print("  5. Export All Bills for a Month")
+        print("  6. View Site-Wide Analytics")
+        print("  7. Compare Clients")
+        print("  8. Manage Tariffs")
         print("--- System & Support ---")
-        print("  6. Manage Grievances")
-        print("  7. View Action Log")
-        print("  8. Change My Password")
-        print("  9. Logout")
+        print("  9. Manage Grievances")
+        print(" 10. View Action Log")
+        print(" 11. Query Performance Report")
+        print(" 12. Change My Password")
+        print(" 13. Logout")
         
         choice = input("\nEnter choice: ")
 
@@ -1371,16 +1668,24 @@ def admin_menu(session):
         elif choice == '3':
             admin_generate_bill(session)
         elif choice == '4':
-            admin_view_analytics()
+            admin_issue_month_bills(session)
         elif choice == '5':
-            admin_compare_clients()
+            admin_export_month_bills(session)
         elif choice == '6':
-            admin_manage_grievances(session)
+            admin_view_analytics()
         elif choice == '7':
-            admin_view_log(session)
+            admin_compare_clients()
         elif choice == '8':
-            handle_change_password(session)
+            admin_manage_tariffs(session)
         elif choice == '9':
+            admin_manage_grievances(session)
+        elif choice == '10':
+            admin_view_log(session)
+        elif choice == '11':
+            admin_query_report(session)
+        elif choice == '12':
+            handle_change_password(session)
+        elif choice == '13':
             break
         else:
             print("Invalid choice.")
@@ -1421,6 +1726,9 @@ def main():
 
         elif choice == '3':
             print("Exiting program. Goodbye.")
+            if query_stats.ENABLED:
+                print(query_stats.format_summary(limit=20))
+            checkpoint_database('TRUNCATE')
             sys.exit()
         else:
             print("Invalid choice. Please enter 1, 2, or 3.")
@@ -7,8 +7,9 @@ import bcrypt
 
 # --- Import from your own project files ---
 # This ensures we use the same logic as the app
-from database import DB_FILE, setup_database, db_query, db_query_lastrowid
-from billing import calculate_mahadiscom_bill
+from database import DB_FILE, setup_database, db_query, db_query_lastrowid, db_query_many, reset_connections
+import tariffs
+from billing import calculate_bill_paise, paise_to_rupees
 
 # Initialize Faker for generating names
 fake = Faker()
@@ -19,7 +20,8 @@ def main():
     populating it with a large, realistic dataset.
     """
     
-    # 1. Delete old DB if it exists
+    # 1. Delete old DB if it exists (closing our own handle to it first)
+    reset_connections()
     if os.path.exists(DB_FILE):
         os.remove(DB_FILE)
         print(f"Removed old '{DB_FILE}'.")
@@ -30,6 +32,7 @@ def main():
 
     admin_info = {} # To store admin user info for replying to tickets
     client_info_list = [] # To store (id, username, full_name)
+    client_categories = {} # client id -> tariff category
     total_users_added = 0
     total_consumption_records = 0
 
@@ -67,11 +70,14 @@ def main():
             password = b"pass123" # Keep password simple for testing
             hashed_password = bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
             
-            user = (username, hashed_password, 'client', full_name)
+            # Mostly single-phase homes, with some three-phase and commercial connections
+            category = random.choices(list(tariffs.CATEGORIES), weights=[70, 15, 15])[0]
+            user = (username, hashed_password, 'client', full_name, category)
             
-            client_id = db_query_lastrowid("INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)", user)
+            client_id = db_query_lastrowid("INSERT INTO users (username, password, role, full_name, tariff_category) VALUES (?, ?, ?, ?, ?)", user)
             if client_id:
                 client_info_list.append((client_id, username, full_name))
+                client_categories[client_id] = category
                 total_users_added += 1
             
     except Exception as e:
@@ -83,7 +89,7 @@ def main():
     print(f"Generating random consumption data for {len(client_info_list)} clients...")
     months = ['2025-06', '2025-07', '2025-08', '2025-09', '2025-10']
     
-    try:
+    def consumption_rows():
         for user_id, _, _ in client_info_list:
             for month in months:
                 if random.random() < 0.8:
@@ -93,8 +99,7 @@ def main():
                 usage = round(usage, 2)
                 
                 # Pre-calculate the bill
-                bill_data, _ = calculate_mahadiscom_bill(usage)
-                total_bill = round(bill_data['F_Total_Bill'], 2)
+                total_paise = calculate_bill_paise(usage, tariffs.tariff_for_month(month, client_categories[user_id]))
                 
                 # Randomly mark some as Paid
                 if random.random() < 0.3: # 30% chance of being paid
@@ -104,9 +109,13 @@ def main():
                     status = 'Pending'
                     timestamp = None
                 
-                data = (user_id, month, usage, total_bill, status, timestamp)
-                db_query("INSERT INTO consumption (user_id, month, usage_kwh, total_bill, bill_status, payment_timestamp) VALUES (?, ?, ?, ?, ?, ?)", data)
-                total_consumption_records += 1
+                yield (user_id, month, usage, total_paise, paise_to_rupees(total_paise), status, timestamp)
+
+    try:
+        # One executemany per chunk instead of one commit per row
+        result = db_query_many("INSERT INTO consumption (user_id, month, usage_kwh, total_bill_paise, total_bill, bill_status, payment_timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               consumption_rows())
+        total_consumption_records = result['rows']
         print(f"Added {total_consumption_records} sample consumption records.")
     except Exception as e:
         print(f"Error adding consumption data: {e}")
@@ -139,16 +148,12 @@ def main():
                        (token2, user[0], user[1], subject2, ts2_client, ts2_admin))
         
         body2_client = "Hi, I don't think my meter was read correctly last month. Can someone please come and check it? My usage shows 610.8 kWh which is impossible."
-        db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                       (ticket2_id, user[0], user[2], body2_client, ts2_client))
-                       
         admin_body = f"Hi {user[2]},\n\nI have checked your meter reading data. The high usage (610.8 kWh) was correct. We show a large spike in usage on 2025-10-15.\n\nBest,\n{admin_info[2]}"
-        db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                       (ticket2_id, admin_info[0], admin_info[2], admin_body, ts2_admin))
-        
         body3_client = "Oh, I see. That must have been when my family was visiting. Thank you for checking!"
-        db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                       (ticket2_id, user[0], user[2], body3_client, ts2_client_reply))
+        db_query_many("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+                      [(ticket2_id, user[0], user[2], body2_client, ts2_client),
+                       (ticket2_id, admin_info[0], admin_info[2], admin_body, ts2_admin),
+                       (ticket2_id, user[0], user[2], body3_client, ts2_client_reply)])
 
         # --- THIS LINE WAS REMOVED ---
         # conn.commit() 
@@ -1,32 +1,232 @@
+import os
 import sqlite3
+import threading
+import time
+from itertools import islice
+from contextlib import contextmanager
 import pandas as pd
 from datetime import datetime
 import bcrypt
+import billing
+import query_stats
 
 DB_FILE = 'electricity.db'
 
-def setup_database():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    def add_column_if_not_exists(table, column, definition):
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [info[1] for info in cursor.fetchall()]
-        if column not in columns:
-            print(f"Database Migration: Adding column '{column}' to table '{table}'...")
-            try:
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
-                print(f"Successfully added '{column}'.")
-            except Exception as e:
-                print(f"Error adding column {column}: {e}")
-            
-    def drop_table_if_exists(table):
+# --- Storage Profiles ---
+# journal_mode is stored in the database file and is applied by
+# setup_database(); the rest are per-connection and are applied once when
+# each thread opens its connection.
+STORAGE_PROFILES = {
+    # WAL lets the GUI and the CLI read while the other one writes.
+    # synchronous=NORMAL is crash-safe in WAL mode and skips the fsync per commit.
+    'default': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,       # ms to wait for a lock before "database is locked"
+        'cache_size': -16000,       # negative = KiB, so 16 MB of page cache
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 1000, # pages
+    },
+    # Same as default, but fsyncs the WAL on every commit.
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 1000,
+    },
+    # The old rollback-journal behaviour, kept for comparison.
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 0,
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'wal_autocheckpoint': 1000,
+    },
+}
+# Pick a profile per process with e.g. ELECTRICITY_DB_PROFILE=durable
+STORAGE_PROFILE = os.environ.get('ELECTRICITY_DB_PROFILE', 'default')
+
+CONNECTION_PRAGMAS = ('synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store', 'wal_autocheckpoint')
+
+# Prepared statements kept per connection by sqlite3, keyed on the SQL text.
+# Big enough to hold all of queries.QUERIES plus the ad-hoc queries around it.
+STATEMENT_CACHE_SIZE = 256
+
+# --- Managed Indexes ---
+# Secondary indexes for the hot queries in the views and cli.py. setup_database()
+# creates any that are missing and rebuilds any whose definition has drifted.
+# (Lookups by consumption(user_id, month) already use the UNIQUE constraint's index.)
+MANAGED_INDEXES = {
+    # action_log WHERE actor = ? ORDER BY id DESC (Action Log tab / admin_view_log)
+    'idx_action_log_actor': "CREATE INDEX idx_action_log_actor ON action_log (actor, id)",
+    # grievance_tickets WHERE user_id = ? ORDER BY updated_at DESC (client ticket lists)
+    'idx_grievance_tickets_user': "CREATE INDEX idx_grievance_tickets_user ON grievance_tickets (user_id, updated_at)",
+    # grievance_tickets [WHERE status = ?] ORDER BY updated_at DESC (admin ticket list)
+    'idx_grievance_tickets_status': "CREATE INDEX idx_grievance_tickets_status ON grievance_tickets (status, updated_at)",
+    'idx_grievance_tickets_updated': "CREATE INDEX idx_grievance_tickets_updated ON grievance_tickets (updated_at)",
+    # grievance_messages WHERE ticket_id = ? ORDER BY timestamp (chat history)
+    'idx_grievance_messages_ticket': "CREATE INDEX idx_grievance_messages_ticket ON grievance_messages (ticket_id, timestamp)",
+    # users WHERE role = 'client' ORDER BY full_name (client dropdowns and lists)
+    'idx_users_role_name': "CREATE INDEX idx_users_role_name ON users (role, full_name)",
+    # consumption GROUP BY month with SUM(usage_kwh), answered from the index alone
+    'idx_consumption_month': "CREATE INDEX idx_consumption_month ON consumption (month, usage_kwh)",
+}
+
+# --- Connection Manager ---
+# Each thread keeps one long-lived connection to DB_FILE. Tk callbacks all run
+# on the main thread, so the GUI effectively shares a single connection.
+_local = threading.local()
+_generation = 0
+_generation_lock = threading.Lock()
+
+def _open_connection(db_file):
+    profile = STORAGE_PROFILES[STORAGE_PROFILE]
+    conn = sqlite3.connect(db_file, timeout=profile['busy_timeout'] / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma} = {profile[pragma]}")
+    return conn
+
+def get_connection():
+    """Returns this thread's connection, opening it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and (_local.db_file != DB_FILE or _local.generation != _generation):
+        # DB_FILE was switched or reset_connections() was called: reopen.
+        close_connection()
+        conn = None
+    if conn is None:
+        conn = _open_connection(DB_FILE)
+        _local.conn = conn
+        _local.db_file = DB_FILE
+        _local.generation = _generation
+    return conn
+
+def close_connection():
+    """Closes the calling thread's connection, if it has one."""
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"DB Close Error: {e}")
+
+def reset_connections():
+    """
+    Closes this thread's connection and marks every other thread's connection
+    as stale, so each one is reopened (with fresh PRAGMAs) on its next query.
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    close_connection()
+
+def apply_storage_profile(profile_name=None):
+    """
+    Makes `profile_name` the active storage profile, sets its journal mode on
+    DB_FILE, and reopens connections with its PRAGMAs.
+    """
+    global STORAGE_PROFILE
+    profile_name = profile_name or STORAGE_PROFILE
+    if profile_name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{profile_name}'. Choose from: {', '.join(STORAGE_PROFILES)}")
+    STORAGE_PROFILE = profile_name
+    reset_connections()
+
+    profile = STORAGE_PROFILES[STORAGE_PROFILE]
+    conn = get_connection()
+    mode = conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}").fetchone()[0]
+    if mode.upper() != profile['journal_mode'].upper():
+        print(f"Warning: could not switch journal_mode to {profile['journal_mode']} (still '{mode}').")
+    return mode
+
+def checkpoint_database(mode='PASSIVE'):
+    """
+    Copies WAL pages back into the main database file.
+    PASSIVE never blocks; TRUNCATE (used on exit) also shrinks the -wal file to zero.
+    Returns (busy, wal_pages, checkpointed_pages), or None outside WAL mode.
+    """
+    if mode.upper() not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+        raise ValueError(f"Unknown checkpoint mode '{mode}'.")
+    conn = get_connection()
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if journal_mode.upper() != 'WAL':
+        return None
+    try:
+        return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode.upper()})").fetchone())
+    except Exception as e:
+        print(f"DB Checkpoint Error: {e}")
+        return None
+
+def ensure_indexes(cursor):
+    """
+    Creates missing MANAGED_INDEXES and rebuilds any whose SQL no longer matches.
+    Returns the list of index names that were (re)built.
+    """
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    existing = dict(cursor.fetchall())
+    built = []
+    for name, sql in MANAGED_INDEXES.items():
+        if existing.get(name) == sql:
+            continue
         try:
-            cursor.execute(f"DROP TABLE IF EXISTS {table}")
-            print(f"Migration: Dropped obsolete table '{table}' for new schema.")
+            if name in existing:
+                print(f"Database Migration: Rebuilding index '{name}' (definition changed)...")
+                cursor.execute(f"DROP INDEX {name}")
+            else:
+                print(f"Database Migration: Creating index '{name}'...")
+            cursor.execute(sql)
+            built.append(name)
         except Exception as e:
-            print(f"Error dropping table {table}: {e}")
+            print(f"Error creating index {name}: {e}")
+    if built:
+        # Refresh the planner statistics for the new indexes
+        cursor.execute("PRAGMA optimize")
+    return built
+
+def explain_query_plan(query, params=()):
+    """Returns the 'detail' column of EXPLAIN QUERY PLAN for `query`."""
+    conn = get_connection()
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+
+def find_full_scans(plan_details):
+    """
+    Picks out plan steps that read a whole table row by row, e.g. 'SCAN users'.
+    Index walks ('SCAN users USING COVERING INDEX ...') are not counted.
+    """
+    return [detail for detail in plan_details
+            if detail.startswith('SCAN ') and ' USING ' not in detail
+            and not detail.startswith('SCAN CONSTANT ROW')]
+
+# --- Schema Migrations ---
+# Each step runs once, in order, inside its own transaction, and then bumps
+# PRAGMA user_version to its number. To change the schema (or MANAGED_INDEXES),
+# append a new step; never edit a step that has already shipped.
 
+def _column_exists(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return column in [info[1] for info in cursor.fetchall()]
+
+def _add_column_if_not_exists(cursor, table, column, definition):
+    if not _column_exists(cursor, table, column):
+        print(f"Database Migration: Adding column '{column}' to table '{table}'...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"Successfully added '{column}'.")
+
+def _drop_table_if_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    if cursor.fetchone():
+        cursor.execute(f"DROP TABLE {table}")
+        print(f"Migration: Dropped obsolete table '{table}' for new schema.")
+
+def _migration_base_schema(cursor):
+    """Tables, columns and the default admin as they stood before versioning."""
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -84,68 +284,569 @@ def setup_database():
     )
     ''')
     
-    drop_table_if_exists('grievances')
+    _drop_table_if_exists(cursor, 'grievances')
 
-    try:
-        add_column_if_not_exists('consumption', 'total_bill', 'REAL DEFAULT 0.0')
-        add_column_if_not_exists('consumption', 'bill_status', "TEXT DEFAULT 'Pending'")
-        add_column_if_not_exists('consumption', 'payment_timestamp', 'TEXT')
-    except Exception as e:
-        print(f"Error during database migration: {e}")
-    
-    admin_pass = b'admin123'
-    hashed_admin_pass = bcrypt.hashpw(admin_pass, bcrypt.gensalt()).decode('utf-8')
+    _add_column_if_not_exists(cursor, 'consumption', 'total_bill', 'REAL DEFAULT 0.0')
+    _add_column_if_not_exists(cursor, 'consumption', 'bill_status', "TEXT DEFAULT 'Pending'")
+    _add_column_if_not_exists(cursor, 'consumption', 'payment_timestamp', 'TEXT')
     
-    try:
+    # Only pay for the bcrypt hash when the admin account is actually missing
+    cursor.execute("SELECT 1 FROM users WHERE username = 'admin'")
+    if cursor.fetchone() is None:
+        admin_pass = b'admin123'
+        hashed_admin_pass = bcrypt.hashpw(admin_pass, bcrypt.gensalt()).decode('utf-8')
         cursor.execute(
             "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
             ('admin', hashed_admin_pass, 'admin', 'Administrator')
         )
-    except sqlite3.IntegrityError:
-        pass 
 
-    conn.commit()
-    conn.close()
+def _migration_managed_indexes(cursor):
+    ensure_indexes(cursor)
+
+# Month (YYYY-MM) the seeded built-in tariff takes effect from: before any real month
+SEED_TARIFF_EFFECTIVE_FROM = '0000-01'
+
+def _create_tariff_revision_triggers(cursor, table):
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_revision AFTER {event} ON {table}
+        BEGIN
+            UPDATE tariff_revision SET revision = revision + 1 WHERE id = 1;
+        END
+        ''')
+
+def _migration_tariff_tables(cursor):
+    """Effective-dated tariffs, seeded with the built-in tariff from billing.py."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tariffs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        effective_from TEXT UNIQUE NOT NULL,
+        fixed_charge REAL NOT NULL,
+        wheeling_per_kwh REAL NOT NULL,
+        fac_per_kwh REAL NOT NULL,
+        duty_rate REAL NOT NULL
+    )
+    ''')
+
+    # width_kwh is NULL for the open-ended top slab
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tariff_slabs (
+        tariff_id INTEGER NOT NULL,
+        slab_order INTEGER NOT NULL,
+        width_kwh REAL,
+        rate REAL NOT NULL,
+        PRIMARY KEY (tariff_id, slab_order),
+        FOREIGN KEY (tariff_id) REFERENCES tariffs (id) ON DELETE CASCADE
+    )
+    ''')
+
+    # One-row change counter, bumped by the triggers below on every write to
+    # either table. tariffs.py polls it to know when its compiled cache is stale.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tariff_revision (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        revision INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO tariff_revision (id, revision) VALUES (1, 0)")
+    for table in ('tariffs', 'tariff_slabs'):
+        _create_tariff_revision_triggers(cursor, table)
+
+    cursor.execute("SELECT 1 FROM tariffs LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute(
+            "INSERT INTO tariffs (effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate) VALUES (?, ?, ?, ?, ?)",
+            (SEED_TARIFF_EFFECTIVE_FROM, billing.FIXED_CHARGE_SINGLE_PHASE, billing.WHEELING_CHARGE_PER_KWH,
+             billing.FAC_PER_KWH, billing.ELECTRICITY_DUTY_RATE)
+        )
+        tariff_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO tariff_slabs (tariff_id, slab_order, width_kwh, rate) VALUES (?, ?, ?, ?)",
+            [(tariff_id, order, None if width == float('inf') else width, rate)
+             for order, (width, rate) in enumerate(billing.slabs)]
+        )
+
+def _migration_total_bill_paise(cursor):
+    """
+    Exact money storage: total_bill_paise holds the bill in whole paise and is
+    what gets summed. total_bill (REAL rupees) is kept in step with it for
+    display and exports. Existing totals, some of which were stored unrounded,
+    are rounded to the paisa.
+    """
+    _add_column_if_not_exists(cursor, 'consumption', 'total_bill_paise', 'INTEGER NOT NULL DEFAULT 0')
+    cursor.execute("UPDATE consumption SET total_bill_paise = CAST(ROUND(COALESCE(total_bill, 0) * 100) AS INTEGER)")
+    cursor.execute("UPDATE consumption SET total_bill = total_bill_paise / 100.0")
+
+def _migration_invoice_tables(cursor):
+    """
+    Issued bills (see invoices.py): one `invoices` row per issued reading with
+    its charges and applied-tariff footer, and one `invoice_lines` row per
+    energy slab it used. Lines are stored WITHOUT ROWID, clustered by invoice,
+    so an invoice's lines are one range read.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS invoices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        consumption_id INTEGER UNIQUE NOT NULL,
+        user_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        usage_kwh REAL NOT NULL,
+        tariff_effective_from TEXT,
+        energy_charge REAL NOT NULL,
+        fixed_charge REAL NOT NULL,
+        wheeling_charge REAL NOT NULL,
+        fac REAL NOT NULL,
+        sub_total REAL NOT NULL,
+        duty_rate REAL NOT NULL,
+        electricity_duty REAL NOT NULL,
+        total_bill_paise INTEGER NOT NULL,
+        tariff_section TEXT NOT NULL,
+        issued_at TEXT NOT NULL,
+        FOREIGN KEY (consumption_id) REFERENCES consumption (id) ON DELETE CASCADE,
+        UNIQUE(user_id, month)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_month ON invoices (month)")
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS invoice_lines (
+        invoice_id INTEGER NOT NULL,
+        line_order INTEGER NOT NULL,
+        label TEXT NOT NULL,
+        units REAL NOT NULL,
+        rate REAL NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (invoice_id, line_order),
+        FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+
+    # Foreign keys aren't enforced on our connections, so deleting a reading
+    # takes its invoice with it here.
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS consumption_delete_invoice AFTER DELETE ON consumption
+    BEGIN
+        DELETE FROM invoice_lines WHERE invoice_id IN (SELECT id FROM invoices WHERE consumption_id = OLD.id);
+        DELETE FROM invoices WHERE consumption_id = OLD.id;
+    END
+    ''')
+
+def _rebuild_tariffs_with_category(cursor, default):
+    """Copies `tariffs` into a table with a category column (see _migration_tariff_categories)."""
+    cursor.execute(f'''
+    CREATE TABLE tariffs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT NOT NULL DEFAULT '{default}',
+        effective_from TEXT NOT NULL,
+        fixed_charge REAL NOT NULL,
+        wheeling_per_kwh REAL NOT NULL,
+        fac_per_kwh REAL NOT NULL,
+        duty_rate REAL NOT NULL,
+        UNIQUE(category, effective_from)
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO tariffs_new (id, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate)
+    SELECT id, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate FROM tariffs
+    ''')
+    # Dropping the table drops its revision triggers too
+    cursor.execute("DROP TABLE tariffs")
+    cursor.execute("ALTER TABLE tariffs_new RENAME TO tariffs")
+    _create_tariff_revision_triggers(cursor, 'tariffs')
+
+def _migration_tariff_categories(cursor):
+    """
+    Tariff categories (billing.TARIFF_CATEGORIES): users.tariff_category, a
+    category on every tariff (existing tariffs and users get the default
+    category) and on every invoice. `tariffs` is rebuilt because its
+    effective_from is now unique per category, not overall; ids are kept, so
+    tariff_slabs still lines up. The other categories are seeded with their
+    built-in rates. Safe to run again: the rebuild is skipped once `tariffs`
+    has its category column.
+    """
+    default = billing.DEFAULT_TARIFF_CATEGORY
+    _add_column_if_not_exists(cursor, 'users', 'tariff_category', f"TEXT NOT NULL DEFAULT '{default}'")
+    _add_column_if_not_exists(cursor, 'invoices', 'tariff_category', 'TEXT')
+    if not _column_exists(cursor, 'tariffs', 'category'):
+        _rebuild_tariffs_with_category(cursor, default)
+
+    for category, (slab_list, fixed_charge, wheeling, fac, duty_rate) in billing.BUILTIN_TARIFFS.items():
+        cursor.execute("SELECT 1 FROM tariffs WHERE category = ? LIMIT 1", (category,))
+        if cursor.fetchone() is not None:
+            continue
+        cursor.execute(
+            "INSERT INTO tariffs (category, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate) VALUES (?, ?, ?, ?, ?, ?)",
+            (category, SEED_TARIFF_EFFECTIVE_FROM, fixed_charge, wheeling, fac, duty_rate)
+        )
+        tariff_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO tariff_slabs (tariff_id, slab_order, width_kwh, rate) VALUES (?, ?, ?, ?)",
+            [(tariff_id, order, None if width == float('inf') else width, rate)
+             for order, (width, rate) in enumerate(slab_list)]
+        )
+    # The rebuild itself fired no trigger; make sure every tariff cache reloads
+    cursor.execute("UPDATE tariff_revision SET revision = revision + 1 WHERE id = 1")
+
+def _migration_import_jobs(cursor):
+    """
+    Consumption CSV imports (see importer.py): one `import_jobs` row per
+    import, keyed by the file's SHA-256, with the byte offset and counts
+    committed together with each chunk, so an interrupted import resumes
+    after its last committed chunk.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_name TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        file_size INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Running',
+        byte_offset INTEGER NOT NULL,
+        next_row INTEGER NOT NULL DEFAULT 1,
+        rows INTEGER NOT NULL DEFAULT 0,
+        added INTEGER NOT NULL DEFAULT 0,
+        updated INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        chunks INTEGER NOT NULL DEFAULT 0,
+        started_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        finished_at TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_hash ON import_jobs (file_hash, status)")
+
+# (version, description, step) - versions must be 1, 2, 3, ... in order
+MIGRATIONS = [
+    (1, "base schema", _migration_base_schema),
+    (2, "managed indexes", _migration_managed_indexes),
+    (3, "tariff tables", _migration_tariff_tables),
+    (4, "total_bill_paise", _migration_total_bill_paise),
+    (5, "invoice tables", _migration_invoice_tables),
+    (6, "tariff categories", _migration_tariff_categories),
+    (7, "import jobs", _migration_import_jobs),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def run_migrations():
+    """
+    Applies every step newer than the database's user_version.
+    Returns the list of versions that were applied.
+    """
+    conn = get_connection()
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if get_schema_version() >= version:
+            continue
+        with transaction():
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version() >= version:
+                continue
+            print(f"Database Migration: Applying v{version} ({description})...")
+            cursor = conn.cursor()
+            try:
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            finally:
+                cursor.close()
+        applied.append(version)
+    return applied
+
+def setup_database(profile_name=None):
+    """
+    Brings DB_FILE up to SCHEMA_VERSION. On an up-to-date database this is a
+    single PRAGMA user_version read. The storage profile's journal mode is set
+    when migrating or when `profile_name` is passed explicitly.
+    """
+    if profile_name is None and get_schema_version() == SCHEMA_VERSION:
+        return []
+    apply_storage_profile(profile_name)
+    return run_migrations()
+
+def in_transaction():
+    """True while the calling thread is inside a `with transaction():` block."""
+    return getattr(_local, 'tx_depth', 0) > 0
+
+@contextmanager
+def transaction():
+    """
+    Groups every db_query / db_query_lastrowid / log_action call made inside the
+    block into one commit. Any exception rolls all of them back and is re-raised.
+    Nested blocks join the outermost one.
+
+        with transaction():
+            db_query("INSERT ...", params)
+            db_query("UPDATE ...", params)
+            log_action(actor, "...")
+    """
+    conn = get_connection()
+    depth = getattr(_local, 'tx_depth', 0)
+    if depth == 0:
+        # IMMEDIATE takes the write lock up front, so the busy_timeout applies
+        # here instead of failing halfway through the block.
+        conn.execute("BEGIN IMMEDIATE")
+    _local.tx_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.tx_depth = depth
+        if depth == 0:
+            conn.rollback()
+        raise
+    _local.tx_depth = depth
+    if depth == 0:
+        conn.commit()
+
+# --- Query Instrumentation ---
+# See query_stats.py. _start_timer() returns None while instrumentation is off,
+# and _record() then does nothing.
+def _start_timer():
+    return time.perf_counter() if query_stats.ENABLED else None
+
+def _record(query, start, rows=None, df_seconds=None, error=None):
+    if start is not None:
+        query_stats.record(query, time.perf_counter() - start, rows, df_seconds, error)
 
 def db_query(query, params=()):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
+    start = _start_timer()
+    error = None
     try:
         cursor.execute(query, params)
-        conn.commit()
+        if not in_transaction():
+            conn.commit()
     except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        conn.rollback()
         print(f"DB Query Error: {e}")
     finally:
-        conn.close()
+        _record(query, start, rows=cursor.rowcount, error=error)
+        cursor.close()
 
 def db_query_lastrowid(query, params=()):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     last_id = None
+    start = _start_timer()
+    error = None
     try:
         cursor.execute(query, params)
         last_id = cursor.lastrowid
-        conn.commit()
+        if not in_transaction():
+            conn.commit()
     except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        conn.rollback()
         print(f"DB Query Error: {e}")
     finally:
-        conn.close()
+        _record(query, start, rows=cursor.rowcount, error=error)
+        cursor.close()
     return last_id
 
+def db_query_many(query, rows, chunk_size=5000):
+    """
+    Runs `query` once per parameter tuple in `rows` (any iterable, including a
+    generator) using executemany, committing once per `chunk_size` rows.
+
+    A chunk that fails is rolled back on its own and the load carries on with
+    the next chunk. Returns a summary dict:
+        {'rows': rows written, 'failed_rows': rows in failed chunks,
+         'chunks': [{'chunk': n, 'rows': count, 'error': None or message}, ...]}
+
+    Inside a `with transaction():` block nothing is committed here and the
+    first error is raised, so the caller's transaction decides.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    conn = get_connection()
+    outer_transaction = in_transaction()
+    summary = {'rows': 0, 'failed_rows': 0, 'chunks': []}
+    row_iter = iter(rows)
+    chunk_number = 0
+
+    while True:
+        chunk = list(islice(row_iter, chunk_size))
+        if not chunk:
+            break
+        chunk_number += 1
+        cursor = conn.cursor()
+        start = _start_timer()
+        error = None
+        try:
+            if not outer_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            cursor.executemany(query, chunk)
+            if not outer_transaction:
+                conn.commit()
+            summary['rows'] += len(chunk)
+            summary['chunks'].append({'chunk': chunk_number, 'rows': len(chunk), 'error': None})
+        except Exception as e:
+            error = e
+            if outer_transaction:
+                raise
+            conn.rollback()
+            print(f"DB Bulk Error (chunk {chunk_number}, {len(chunk)} rows): {e}")
+            summary['failed_rows'] += len(chunk)
+            summary['chunks'].append({'chunk': chunk_number, 'rows': len(chunk), 'error': str(e)})
+        finally:
+            _record(query, start, rows=len(chunk), error=error)
+            cursor.close()
+    return summary
+
+def db_query_one(query, params=()):
+    """
+    Returns the first row as a sqlite3.Row (index by name or position),
+    or None if there is no row. For point lookups, where a DataFrame is overkill.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    start = _start_timer()
+    row = None
+    error = None
+    try:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        print(f"DB Read Error: {e}")
+    finally:
+        _record(query, start, rows=0 if row is None else 1, error=error)
+        cursor.close()
+    return row
+
+def db_query_rows(query, params=()):
+    """Returns every row as a list of sqlite3.Row ([] on error)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    start = _start_timer()
+    rows = []
+    error = None
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        print(f"DB Read Error: {e}")
+    finally:
+        _record(query, start, rows=len(rows), error=error)
+        cursor.close()
+    return rows
+
+def db_query_chunks(query, params=(), chunk_size=5000, row_factory=sqlite3.Row):
+    """
+    Yields the result as lists of up to `chunk_size` sqlite3.Row (plain
+    tuples with row_factory=None), read with fetchmany(), so a large result
+    is never held in memory all at once.
+    Only the time spent in SQLite is recorded, not the time the caller
+    spends on each chunk. Don't write on this thread's connection until the
+    iteration has finished.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory
+    timed = query_stats.ENABLED
+    seconds = 0.0
+    rows = 0
+    error = None
+    try:
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            seconds += time.perf_counter() - start
+            if not chunk:
+                break
+            rows += len(chunk)
+            yield chunk
+            start = time.perf_counter()
+    except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        print(f"DB Read Error: {e}")
+    finally:
+        if timed:
+            query_stats.record(query, seconds, rows, None, error)
+        cursor.close()
+
+def db_query_scalar(query, params=(), default=None):
+    """Returns the first column of the first row, or `default` if there is none (or it is NULL)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    start = _start_timer()
+    row = None
+    error = None
+    try:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    except Exception as e:
+        error = e
+        if in_transaction():
+            raise
+        print(f"DB Read Error: {e}")
+    finally:
+        _record(query, start, rows=0 if row is None else 1, error=error)
+        cursor.close()
+    if row is None or row[0] is None:
+        return default
+    return row[0]
+
 def db_query_to_df(query, params=()):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
+    if query_stats.ENABLED:
+        return _db_query_to_df_timed(conn, query, params)
     try:
         df = pd.read_sql_query(query, conn, params=params)
     except Exception as e:
+        if in_transaction():
+            raise
         print(f"DB Read Error: {e}")
         df = pd.DataFrame() 
+    return df
+
+def _db_query_to_df_timed(conn, query, params):
+    # Same steps as pd.read_sql_query (execute, fetchall, from_records), split
+    # up so the SQL time and the DataFrame build time are recorded separately.
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        data = cursor.fetchall()
+    except Exception as e:
+        _record(query, start, error=e)
+        if in_transaction():
+            raise
+        print(f"DB Read Error: {e}")
+        return pd.DataFrame()
     finally:
-        conn.close()
+        cursor.close()
+    sql_done = time.perf_counter()
+    df = pd.DataFrame.from_records(data, columns=columns, coerce_float=True)
+    _record(query, start, rows=len(df), df_seconds=time.perf_counter() - sql_done)
     return df
 
 def log_action(actor, action):
+    """Writes an action_log row. Inside transaction() a failure re-raises, so the change isn't committed without it."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
         db_query("INSERT INTO action_log (timestamp, actor, action) VALUES (?, ?, ?)", (now, actor, action))
     except Exception as e:
+        if in_transaction():
+            raise
         print(f"Failed to log action: {e}")
\ No newline at end of file
@@ -0,0 +1,367 @@
+import csv
+import hashlib
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+import database
+import invoices
+import queries
+import tariffs
+from billing import is_meter_reading, paise_to_rupees
+
+# --- Bulk Consumption Import ---
+# Loads a meter CSV (columns user_id, month, usage_kwh, in any order, extra
+# columns ignored) into consumption. Existing (user_id, month) readings are
+# updated exactly as the usage upserts do: new total, bill_status back to
+# Pending, payment cleared, and an issued invoice re-issued.
+#
+#     summary = importer.import_consumption_csv('meters_2025-07.csv')
+#
+# The file is streamed IMPORT_CHUNK_SIZE lines at a time (one reading per
+# line). Each chunk is validated in one pass, then split into inserts,
+# updates and rejects against an in-memory ImportIndex of the user ids and
+# stored (user_id, month) readings, so a reading for an unknown user never
+# reaches SQLite (foreign keys aren't enforced, so it would be stored as an
+# orphan). What is left is billed in one batch with
+# tariffs.calculate_bills_paise_for_months() and written with one executemany
+# INSERT ... ON CONFLICT(user_id, month) DO UPDATE inside its own transaction,
+# so a failure loses at most the chunk being written. Rejected rows go to an
+# error CSV next to the input with the reason for each.
+#
+# For big files, parsing and validation move to a process pool: this process
+# only cuts the file into chunks on line boundaries and hands the raw bytes
+# to the workers, then writes their results back in file order, so the
+# database sees exactly what the serial path would write. Workers are
+# started with 'spawn', never fork: the GUI imports from a Tk process that
+# already runs other threads (background jobs, async_db), and a forked child
+# can inherit a lock some other thread was holding and deadlock.
+#
+# Every import is tracked in `import_jobs` (migration 7) by the file's
+# SHA-256. Each chunk's transaction also stores the byte offset and counts
+# reached, so if the app is closed mid-import, importing the same file
+# again picks up after the last committed chunk instead of replaying (and
+# re-Pending) the rows already written.
+IMPORT_CHUNK_SIZE = 5000
+
+# Files at least this big are parsed by a pool of os.cpu_count() workers
+# when import_consumption_csv() isn't told how many to use; below it,
+# starting the processes costs more than it saves.
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# Chunks handed out ahead of the writer, per worker
+PREFETCH_PER_WORKER = 2
+
+# Rejected rows kept in the summary for display (the count covers all of
+# them, and the error CSV lists every one)
+ERROR_LIMIT = 1000
+
+# The error CSV for meters.csv is meters.errors.csv
+ERROR_FILE_SUFFIX = '.errors.csv'
+ERROR_FILE_COLUMNS = ('row', 'user_id', 'month', 'usage_kwh', 'reason')
+
+REQUIRED_COLUMNS = ('user_id', 'month', 'usage_kwh')
+
+def _column_indexes(header_line):
+    """Positions of REQUIRED_COLUMNS in the header line (bytes, BOM allowed)."""
+    header = next(csv.reader([header_line.decode('utf-8-sig')]), [])
+    header = [name.strip() for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}.")
+    return [header.index(name) for name in REQUIRED_COLUMNS]
+
+def validate_rows(lines, columns, first_row):
+    """
+    Parses and checks one chunk of CSV lines (bytes). `columns` are the
+    user_id / month / usage_kwh positions; `first_row` numbers the first
+    line (data rows count from 1). Blank lines are skipped.
+    Returns (valid, rejected):
+        valid:    [(row_number, user_id, month, usage_kwh), ...]
+        rejected: [(row_number, reason, (user_id, month, usage_kwh) as read), ...]
+    """
+    user_col, month_col, usage_col = columns
+    valid = []
+    rejected = []
+    # Undecodable bytes become U+FFFD and then fail the checks below
+    reader = csv.reader(line.decode('utf-8', errors='replace') for line in lines)
+    for row_number, row in enumerate(reader, first_row):
+        if not row:
+            continue
+        try:
+            user_id = int(row[user_col])
+            month = row[month_col].strip()
+            usage_kwh = float(row[usage_col])
+        except IndexError:
+            fields = tuple(row[col] if col < len(row) else '' for col in columns)
+            rejected.append((row_number, "missing fields", fields))
+            continue
+        except ValueError:
+            fields = (row[user_col], row[month_col], row[usage_col])
+            rejected.append((row_number, "user_id must be a whole number and usage_kwh a number", fields))
+            continue
+        if not tariffs.MONTH_PATTERN.match(month):
+            rejected.append((row_number, f"month {month!r} is not YYYY-MM", (row[user_col], month, row[usage_col])))
+        elif not (math.isfinite(usage_kwh) and usage_kwh >= 0):
+            rejected.append((row_number, f"usage_kwh {usage_kwh:g} must be a non-negative number",
+                             (row[user_col], month, row[usage_col])))
+        elif not is_meter_reading(usage_kwh):
+            rejected.append((row_number, f"usage_kwh {row[usage_col].strip()} has more than 2 decimal places",
+                             (row[user_col], month, row[usage_col])))
+        else:
+            valid.append((row_number, user_id, month, usage_kwh))
+    return valid, rejected
+
+def _validate_block(block, columns, first_row):
+    """validate_rows() for a block of whole lines as one bytes object (pool worker entry point)."""
+    return validate_rows(block.splitlines(keepends=True), columns, first_row)
+
+def validated_chunks(f, columns, chunk_size=IMPORT_CHUNK_SIZE, workers=1, first_row=1):
+    """
+    Reads binary file `f` from its current position, chunk_size lines at a
+    time, and yields (valid, rejected, lines_read, offset) per chunk in file
+    order, where offset is the byte position just after the chunk; the
+    first line read is row `first_row`. With workers > 1 the chunks are
+    validated in a process pool, at most PREFETCH_PER_WORKER chunks per
+    worker ahead of the consumer.
+    """
+    next_row = first_row
+    if workers <= 1:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            valid, rejected = validate_rows(lines, columns, next_row)
+            next_row += len(lines)
+            yield valid, rejected, len(lines), f.tell()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * PREFETCH_PER_WORKER:
+                lines = list(islice(f, chunk_size))
+                if not lines:
+                    exhausted = True
+                    break
+                pending.append((pool.submit(_validate_block, b"".join(lines), columns, next_row),
+                                len(lines), f.tell()))
+                next_row += len(lines)
+            if not pending:
+                return
+            future, lines_read, offset = pending.popleft()
+            valid, rejected = future.result()
+            yield valid, rejected, lines_read, offset
+
+def _reading_key(user_id, month):
+    """A (user_id, 'YYYY-MM') reading as one int, computed as the consumption_keys query does."""
+    return user_id << 20 | (int(month[:4]) * 12 + int(month[5:7]) - 1)
+
+class ImportIndex:
+    """
+    The user ids and stored readings an import checks its rows against,
+    loaded once per import. Stored (user_id, month) keys are one sorted
+    int64 array (8 bytes a reading); keys the import inserts go in a set on
+    top, so a later row for the same reading counts as an update.
+    """
+
+    def __init__(self, user_ids):
+        self.user_ids = set(user_ids)
+        chunks = [np.array(chunk, dtype=np.int64).ravel()
+                  for chunk in queries.fetch_chunks('consumption_keys', chunk_size=50000, row_factory=None)]
+        self.stored = np.sort(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.int64)
+        self.added = set()
+
+    def classify(self, valid):
+        """
+        Splits validated rows (see validate_rows) into (inserts, updates,
+        rejected), each in file order; rows for unknown users are rejected.
+        """
+        known = []
+        rejected = []
+        for row in valid:
+            if row[1] in self.user_ids:
+                known.append(row)
+            else:
+                rejected.append((row[0], f"user_id {row[1]} does not exist", (str(row[1]), row[2], str(row[3]))))
+
+        keys = [_reading_key(user_id, month) for _, user_id, month, _ in known]
+        if len(self.stored) and keys:
+            keys_array = np.array(keys, dtype=np.int64)
+            i = np.minimum(np.searchsorted(self.stored, keys_array), len(self.stored) - 1)
+            stored = (self.stored[i] == keys_array).tolist()
+        else:
+            stored = [False] * len(keys)
+
+        inserts = []
+        updates = []
+        for row, key, is_stored in zip(known, keys, stored):
+            if is_stored or key in self.added:
+                updates.append(row)
+            else:
+                self.added.add(key)
+                inserts.append(row)
+        return inserts, updates, rejected
+
+def apply_rows(inserts, updates, user_categories, issued_months):
+    """
+    Writes one chunk of classified rows (see ImportIndex.classify) in one
+    transaction. `user_categories` maps user_id -> tariff category (missing:
+    default); updated readings in `issued_months` get their invoice
+    re-issued (a new reading has no invoice yet).
+    """
+    # Inserts first: a reading inserted and then updated in the same chunk
+    # ends up with its last value, as in the file
+    rows = inserts + updates
+    if not rows:
+        return
+    kwh = np.array([row[3] for row in rows], dtype=np.float64)
+    months = [row[2] for row in rows]
+    categories = [user_categories.get(row[1], tariffs.DEFAULT_CATEGORY) for row in rows]
+    totals = tariffs.calculate_bills_paise_for_months(kwh, months, categories).tolist()
+
+    with database.transaction():
+        # Upserted, not inserted, in case the reading was added since the index was loaded
+        queries.execute_many('consumption_upsert', (
+            (user_id, month, usage_kwh, total, paise_to_rupees(total))
+            for (_, user_id, month, usage_kwh), total in zip(rows, totals)
+        ), len(rows))
+        if issued_months:
+            for _, user_id, month, _ in updates:
+                if month in issued_months:
+                    invoices.reissue_if_issued(user_id, month)
+
+def file_hash(path):
+    """SHA-256 of the file's contents, as hex."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _start_job(path, digest, bytes_total, data_start, resume):
+    """(job_id, checkpoint or None) - the file's interrupted job if resuming, else a new one."""
+    with database.transaction():
+        if resume:
+            job = queries.fetch_one('import_job_running', (digest,))
+            if job is not None:
+                return job['id'], job
+        queries.execute('import_jobs_abandon', (_now(), digest))
+        job_id = queries.execute_lastrowid(
+            'import_job_insert', (os.path.basename(path), digest, bytes_total, data_start, _now(), _now()))
+    return job_id, None
+
+def error_file_path(path):
+    """Where the rejected rows of the CSV at `path` are written."""
+    return os.path.splitext(path)[0] + ERROR_FILE_SUFFIX
+
+def import_consumption_csv(path, progress=None, chunk_size=IMPORT_CHUNK_SIZE, workers=None, resume=True):
+    """
+    Imports the consumption CSV at `path` (see the module comment).
+    Rejected rows are written to error_file_path(path) with ERROR_FILE_COLUMNS.
+    `workers` is the number of parsing processes (1: parse in this process;
+    None: os.cpu_count() for files of PARALLEL_MIN_BYTES or more, else 1).
+    The result is the same whatever the number of workers.
+    If an earlier import of the same file was interrupted, it is resumed
+    from its last committed chunk; resume=False starts it over instead.
+    `progress(summary)`, if given, is called after every chunk with the
+    running summary. Raises ValueError if the header lacks a required column.
+
+    Returns a summary dict:
+        {'rows', 'added', 'updated', 'failed', 'chunks', 'bytes_read', 'bytes_total',
+         'workers', 'job_id', 'resumed_at_row', 'error_file', 'seconds', 'rows_per_second',
+         'errors': [(row_number, reason), ...]}
+    Counts cover the whole file, including chunks committed before a resume;
+    'resumed_at_row' is the first row read this time (None if not resumed),
+    and rows_per_second covers this run only. 'error_file' is the error
+    CSV's path, or None if no row was rejected. 'errors' is capped at
+    ERROR_LIMIT rows and only lists rows read this run; 'failed' counts
+    every rejected row.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    bytes_total = os.path.getsize(path)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if bytes_total >= PARALLEL_MIN_BYTES else 1
+    summary = {'rows': 0, 'added': 0, 'updated': 0, 'failed': 0, 'chunks': 0,
+               'bytes_read': 0, 'bytes_total': bytes_total, 'workers': workers,
+               'job_id': None, 'resumed_at_row': None, 'error_file': None, 'errors': []}
+    start = time.perf_counter()
+    digest = file_hash(path)
+    user_categories = dict(queries.fetch_rows('user_tariff_categories'))
+    index = ImportIndex(user_categories)
+    issued_months = set(invoices.issued_counts())
+    error_path = error_file_path(path)
+    error_file = error_writer = None
+
+    with open(path, 'rb') as f:
+        columns = _column_indexes(f.readline())
+        job_id, checkpoint = _start_job(path, digest, bytes_total, f.tell(), resume)
+        summary['job_id'] = job_id
+        next_row = 1
+        if checkpoint is not None:
+            for key in ('rows', 'added', 'updated', 'failed', 'chunks'):
+                summary[key] = checkpoint[key]
+            next_row = summary['resumed_at_row'] = checkpoint['next_row']
+            f.seek(checkpoint['byte_offset'])
+            if summary['failed']:
+                summary['error_file'] = error_path
+        elif os.path.exists(error_path):
+            # Left by an earlier import of this file
+            os.remove(error_path)
+        summary['bytes_read'] = f.tell()
+        rows_before = summary['rows']
+
+        try:
+            for valid, rejected, lines_read, offset in validated_chunks(f, columns, chunk_size, workers, next_row):
+                next_row += lines_read
+                rows_read = len(valid) + len(rejected)
+                inserts, updates, unknown = index.classify(valid)
+                if unknown:
+                    rejected = sorted(rejected + unknown)
+                with database.transaction():
+                    apply_rows(inserts, updates, user_categories, issued_months)
+                    summary['chunks'] += 1
+                    summary['rows'] += rows_read
+                    summary['added'] += len(inserts)
+                    summary['updated'] += len(updates)
+                    summary['failed'] += len(rejected)
+                    queries.execute('import_job_checkpoint', (
+                        offset, next_row, summary['rows'], summary['added'], summary['updated'],
+                        summary['failed'], summary['chunks'], _now(), job_id))
+
+                if rejected:
+                    if error_writer is None:
+                        # A resumed import appends after the rows it rejected before
+                        append = summary['error_file'] is not None and os.path.exists(error_path)
+                        error_file = open(error_path, 'a' if append else 'w', encoding='utf-8', newline='')
+                        error_writer = csv.writer(error_file)
+                        if not append:
+                            error_writer.writerow(ERROR_FILE_COLUMNS)
+                        summary['error_file'] = error_path
+                    error_writer.writerows((row_number, *fields, reason) for row_number, reason, fields in rejected)
+                    error_file.flush()
+                    summary['errors'].extend((row_number, reason) for row_number, reason, _
+                                             in rejected[:max(ERROR_LIMIT - len(summary['errors']), 0)])
+                summary['bytes_read'] = offset
+                if progress is not None:
+                    progress(summary)
+        finally:
+            if error_file is not None:
+                error_file.close()
+
+    queries.execute('import_job_finish', ('Completed', _now(), _now(), job_id))
+    summary['seconds'] = time.perf_counter() - start
+    rows_this_run = summary['rows'] - rows_before
+    summary['rows_per_second'] = rows_this_run / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
@@ -0,0 +1,171 @@
+from datetime import datetime
+
+import numpy as np
+
+import database
+import queries
+import tariffs
+from billing import paise_to_rupees
+
+# --- Issued Invoices ---
+# A bill is computed once, when it is issued, and stored as an `invoices` row
+# (every charge, the total and the applied-tariff footer) with one
+# `invoice_lines` row per energy slab used (migration 5). Previews, exports and
+# the payment screens then read that stored copy with one indexed lookup
+# instead of re-billing the reading, and an issued bill keeps its amounts when
+# tariffs change later (rebill.py skips invoiced readings).
+#
+#     issued = invoices.issue_month('2025-07')
+#     invoice = invoices.get_invoice(user_id, '2025-07')
+#
+# Correcting an issued reading (the usage upserts) re-issues its invoice with
+# the new usage; deleting the reading deletes its invoice (trigger). Each
+# invoice is billed with the tariff of the client's category when it is
+# issued, and records that category.
+#
+# issue_month() works ISSUE_CHUNK_SIZE readings at a time, one transaction
+# each (keyset paging on the consumption id, as in rebill.py), so issuing a
+# large month doesn't hold the write lock for the whole run. A month that is
+# interrupted part-way keeps the invoices already committed; issuing it
+# again picks up the rest.
+
+# Statement fields stored on the invoice row, in invoice_with_lines order
+CHARGE_FIELDS = ('energy_charge', 'fixed_charge', 'wheeling_charge', 'fac', 'sub_total', 'electricity_duty')
+
+# Readings issued per transaction by issue_month()
+ISSUE_CHUNK_SIZE = 5000
+
+def _issue(rows, month):
+    """
+    Writes invoices for `rows` of (consumption_id, user_id, usage_kwh,
+    total_bill_paise, tariff_category), all in `month`. Rows are grouped by
+    category and each group is billed in one batch with its category's
+    tariff for the month. The caller holds the transaction. Returns the
+    number issued.
+    """
+    if not rows:
+        return 0
+    issued_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows_by_category = {}
+    for row in rows:
+        rows_by_category.setdefault(row[4], []).append(row)
+
+    invoice_rows = []
+    changed = []
+    slab_groups = []
+    for category, group in rows_by_category.items():
+        tariff = tariffs.tariff_for_month(month, category)
+        tariff_section = "\n".join(tariff.rate_lines())
+        kwh = np.array([row[2] for row in group], dtype=np.float64)
+        bills = tariff.bills(kwh)
+        sub_totals = bills['A_Energy_Charge'] + bills['B_Fixed_Charge'] + bills['C_Wheeling_Charge'] + bills['D_FAC']
+        totals_paise = tariff.bills_paise(kwh).tolist()
+
+        invoice_rows.extend(
+            (row[0], row[1], month, row[2], tariff.effective_from, energy, fixed, wheeling, fac, sub_total,
+             tariff.duty_rate, duty, total, tariff_section, issued_at, category)
+            for row, energy, fixed, wheeling, fac, sub_total, duty, total in zip(
+                group, bills['A_Energy_Charge'].tolist(), bills['B_Fixed_Charge'].tolist(),
+                bills['C_Wheeling_Charge'].tolist(), bills['D_FAC'].tolist(), sub_totals.tolist(),
+                bills['E_Electricity_Duty'].tolist(), totals_paise)
+        )
+        # Keep the stored consumption total (bill history, payments, analytics)
+        # equal to the amount on the invoice
+        changed.extend((total, paise_to_rupees(total), row[0])
+                       for row, total in zip(group, totals_paise) if total != row[3])
+
+        # Units billed in each slab, the same arithmetic as the statement template
+        lower_bounds = np.array(tariff.lower_bounds)
+        slabs_used = np.searchsorted(lower_bounds, kwh, side='left').tolist()
+        units = np.minimum(kwh[:, None] - lower_bounds, np.array(tariff.widths)).tolist()
+        slab_groups.append((tariff, group, slabs_used, units))
+
+    if len(invoice_rows) == 1:
+        invoice_ids = {rows[0][0]: queries.execute_lastrowid('invoice_insert', invoice_rows[0])}
+    else:
+        # AUTOINCREMENT ids only grow and the caller holds the write lock, so
+        # the new invoices are exactly those above the old maximum
+        last_id = queries.fetch_scalar('invoice_max_id') or 0
+        queries.execute_many('invoice_insert', invoice_rows)
+        invoice_ids = dict(queries.fetch_rows('invoice_ids_after', (last_id,)))
+
+    for tariff, group, slabs_used, units in slab_groups:
+        labels, rates = tariff.slab_labels, tariff.rates
+        queries.execute_many('invoice_line_insert', (
+            (invoice_ids[row[0]], i, labels[i], units[n][i], rates[i], units[n][i] * rates[i])
+            for n, row in enumerate(group) for i in range(slabs_used[n])
+        ))
+
+    if changed:
+        queries.execute_many('consumption_set_total_bill', changed)
+    return len(rows)
+
+def issue_month(month, chunk_size=ISSUE_CHUNK_SIZE):
+    """
+    Issues an invoice for every reading in `month` that doesn't have one yet,
+    committing every `chunk_size` readings. Returns how many.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    issued, last_id = 0, 0
+    while True:
+        with database.transaction():
+            rows = queries.fetch_rows('consumption_uninvoiced_for_month', (month, last_id, chunk_size))
+            issued += _issue(rows, month)
+        if len(rows) < chunk_size:
+            return issued
+        last_id = rows[-1][0]
+
+def void_invoice(user_id, month):
+    """Deletes the client's invoice for `month`. Returns False if it wasn't issued."""
+    with database.transaction():
+        invoice_id = queries.fetch_scalar('invoice_id_for_month', (user_id, month))
+        if invoice_id is None:
+            return False
+        queries.execute('invoice_lines_delete', (invoice_id,))
+        queries.execute('invoice_delete', (invoice_id,))
+    return True
+
+def issue_invoice(user_id, month):
+    """
+    Issues (or re-issues, replacing the old one) the client's invoice for
+    `month`. Returns False if the client has no reading for that month.
+    """
+    with database.transaction():
+        row = queries.fetch_one('consumption_for_month', (user_id, month))
+        if row is None:
+            return False
+        void_invoice(user_id, month)
+        _issue([tuple(row)], month)
+    return True
+
+def reissue_if_issued(user_id, month):
+    """issue_invoice() for a corrected reading, but only if its month was already issued."""
+    if queries.fetch_scalar('invoice_id_for_month', (user_id, month)) is None:
+        return False
+    return issue_invoice(user_id, month)
+
+def issued_counts():
+    """{month: invoices issued} for every month with at least one invoice."""
+    return dict(queries.fetch_rows('invoice_counts_by_month'))
+
+def invoice_from_rows(rows):
+    """
+    One invoice as a dict, from its invoice_with_lines rows:
+        {'id', 'month', 'usage_kwh', 'duty_rate', 'total_bill_paise', 'issued_at',
+         'charges': {field: amount}, 'tariff_section': str, 'tariff_category': str,
+         'slabs': [(label, units, rate, amount), ...]}
+    """
+    first = rows[0]
+    return {
+        'id': first[0], 'month': first[1], 'usage_kwh': first[2],
+        'charges': dict(zip(CHARGE_FIELDS, (first[3], first[4], first[5], first[6], first[7], first[9]))),
+        'duty_rate': first[8], 'total_bill_paise': first[10], 'tariff_section': first[11], 'issued_at': first[12],
+        'tariff_category': first[13] or tariffs.DEFAULT_CATEGORY,
+        'slabs': [tuple(row[14:18]) for row in rows if row[14] is not None],
+    }
+
+def get_invoice(user_id, month):
+    """The client's issued invoice for `month` (see invoice_from_rows), or None."""
+    rows = queries.fetch_rows('invoice_with_lines', (user_id, month))
+    return invoice_from_rows(rows) if rows else None
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+
+# --- Background Jobs ---
+# Long admin tasks (CSV import, Excel exports) would freeze the window if
+# they ran inside a Tk callback. start() runs one on a worker thread instead;
+# the job reports progress through a queue that the Tk side drains with
+# after(), since only the main thread may touch widgets.
+#
+#     def export(job, filename):
+#         for done, chunk in enumerate(chunks, 1):
+#             job.report(done, len(chunks), f"chunk {done}")   # may raise JobCancelled
+#             ...
+#         return rows_written
+#
+#     job = jobs.start(widget, export, filename, on_progress=show, on_done=finished)
+#     job.cancel()
+#
+# Cancelling is cooperative: cancel() sets a flag and the job stops the next
+# time it calls report() or check_cancelled(). Work that is already committed
+# stays committed. Each job thread gets its own database connection from
+# database.get_connection(), like the async_db workers.
+
+# How often (ms) the Tk side checks a job's queue.
+TK_POLL_MS = 100
+
+# How long shutdown() waits for cancelled jobs to stop, in seconds.
+SHUTDOWN_TIMEOUT = 30
+
+_active = set()
+_active_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    """Raised inside a job's thread when the job has been cancelled."""
+
+class Job:
+    """A function running on its own thread; see the module comment."""
+
+    def __init__(self, func, args, kwargs):
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._events = queue.Queue()
+        self._cancel = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'job-{func.__name__}', daemon=True)
+
+    def _run(self):
+        try:
+            result = self._func(self, *self._args, **self._kwargs)
+        except JobCancelled:
+            self._events.put(('cancelled', None))
+        except Exception as e:
+            self._events.put(('error', e))
+        else:
+            self._events.put(('done', result))
+        finally:
+            with _active_lock:
+                _active.discard(self)
+
+    def report(self, done, total=None, message=""):
+        """
+        Queues a progress update (called from the job's thread): `done` out of
+        `total` (None: unknown) and a short message. Raises JobCancelled if
+        the job has been cancelled.
+        """
+        self.check_cancelled()
+        self._events.put(('progress', (done, total, message)))
+
+    def check_cancelled(self):
+        """Raises JobCancelled if cancel() has been called."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """Asks the job to stop at its next report() / check_cancelled()."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+def start(widget, func, *args, on_progress=None, on_done=None, on_error=None, on_cancel=None, **kwargs):
+    """
+    Runs func(job, *args, **kwargs) on a new thread and returns the Job.
+    On the Tk main thread, on_progress(done, total, message) is called with
+    the latest progress at most every TK_POLL_MS, and then exactly one of
+    on_done(result), on_error(exception) (default: printed) or on_cancel().
+    If `widget` is destroyed first, the job is cancelled and nothing more is
+    called.
+    """
+    job = Job(func, args, kwargs)
+
+    def poll():
+        if not widget.winfo_exists():
+            job.cancel()
+            return
+        progress = None
+        while True:
+            try:
+                kind, value = job._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                # Only the newest update is worth painting
+                progress = value
+                continue
+            if progress is not None and on_progress is not None:
+                on_progress(*progress)
+            if kind == 'done':
+                if on_done is not None:
+                    on_done(value)
+            elif kind == 'error':
+                if on_error is not None:
+                    on_error(value)
+                else:
+                    print(f"Background Job Error: {value}")
+            elif on_cancel is not None:
+                on_cancel()
+            return
+        if progress is not None and on_progress is not None:
+            on_progress(*progress)
+        widget.after(TK_POLL_MS, poll)
+
+    with _active_lock:
+        _active.add(job)
+    job.thread.start()
+    widget.after(TK_POLL_MS, poll)
+    return job
+
+def shutdown(timeout=SHUTDOWN_TIMEOUT):
+    """
+    Cancels every running job and waits (up to `timeout` seconds in all) for
+    them to stop, so none is cut off mid-write. Call once on exit.
+    """
+    with _active_lock:
+        running = list(_active)
+    for job in running:
+        job.cancel()
+    deadline = time.monotonic() + timeout
+    for job in running:
+        job.thread.join(max(deadline - time.monotonic(), 0))
@@ -0,0 +1,254 @@
+import sqlite3
+import threading
+import time
+
+import database
+from billing import DEFAULT_TARIFF_CATEGORY
+
+# --- Query Catalog ---
+# Every fixed SQL statement the GUI and the CLI run, under one name each, so a
+# hot query is tuned (and its plan checked by check_query_plans.py) in one
+# place instead of in every copy.
+#
+#     clients_df = queries.fetch_df('clients_by_name')
+#     usage = queries.fetch_scalar('consumption_usage_for_month', (user_id, month))
+#
+# Because each name always sends the exact same SQL text, sqlite3's per-
+# connection statement cache (database.STATEMENT_CACHE_SIZE) prepares it once
+# per connection and reuses the compiled statement after that.
+#
+# Queries built from user input (search boxes, sort columns) are still put
+# together where they are used.
+QUERIES = {
+    # --- Login / passwords ---
+    'user_login': "SELECT id, password, role, full_name FROM users WHERE username = ?",
+    'user_password': "SELECT password FROM users WHERE id = ?",
+    'user_set_password': "UPDATE users SET password = ? WHERE id = ?",
+
+    # --- Users ---
+    'user_insert': "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
+    'user_update': "UPDATE users SET full_name = ?, username = ? WHERE id = ?",
+    'user_tariff_category': "SELECT tariff_category FROM users WHERE id = ?",
+    'user_set_tariff_category': "UPDATE users SET tariff_category = ? WHERE id = ?",
+    'user_tariff_categories': "SELECT id, tariff_category FROM users ORDER BY id",
+    'user_delete': "DELETE FROM users WHERE id = ?",
+    'users_all': "SELECT id, username, full_name, role FROM users",
+    'usernames': "SELECT username FROM users ORDER BY username",
+    'clients_by_name': "SELECT id, full_name FROM users WHERE role = 'client' ORDER BY full_name",
+
+    # --- Consumption ---
+    'consumption_id_for_month': "SELECT id FROM consumption WHERE user_id = ? AND month = ?",
+    'consumption_usage_for_month': "SELECT usage_kwh FROM consumption WHERE user_id = ? AND month = ?",
+    'consumption_usage': "SELECT usage_kwh FROM consumption WHERE user_id = ?",
+    'consumption_months': "SELECT month FROM consumption WHERE user_id = ? ORDER BY month DESC",
+    'consumption_by_month': "SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month",
+    'consumption_by_month_desc': "SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month DESC",
+    'consumption_records': "SELECT id, month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month DESC",
+    'consumption_history': "SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ? ORDER BY month DESC",
+    'consumption_history_search': "SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ? AND month LIKE ? ORDER BY month DESC",
+    'consumption_compare': "SELECT month, usage_kwh, u.full_name FROM consumption c JOIN users u ON c.user_id = u.id WHERE c.user_id = ? ORDER BY month",
+    'consumption_export': """
+            SELECT c.id, u.full_name, c.month, c.usage_kwh, c.total_bill, c.bill_status
+            FROM consumption c JOIN users u ON c.user_id = u.id
+            ORDER BY u.full_name, c.month
+        """,
+    # Bills are written as (total_bill_paise, total_bill) with total_bill = paise / 100
+    'consumption_insert': "INSERT INTO consumption (user_id, month, usage_kwh, total_bill_paise, total_bill, bill_status) VALUES (?, ?, ?, ?, ?, 'Pending')",
+    'consumption_update': "UPDATE consumption SET usage_kwh = ?, total_bill_paise = ?, total_bill = ?, bill_status = 'Pending', payment_timestamp = NULL WHERE id = ?",
+    'consumption_update_for_month': "UPDATE consumption SET usage_kwh = ?, total_bill_paise = ?, total_bill = ?, bill_status = 'Pending', payment_timestamp = NULL WHERE user_id = ? AND month = ?",
+    'consumption_statements_for_month': "SELECT c.user_id, u.full_name, c.usage_kwh FROM consumption c JOIN users u ON c.user_id = u.id WHERE c.month = ? ORDER BY u.full_name, c.user_id",
+    'consumption_columns': "SELECT user_id, month, usage_kwh FROM consumption",
+    'consumption_columns_between': "SELECT user_id, month, usage_kwh FROM consumption WHERE month BETWEEN ? AND ?",
+    # Bulk import (importer.py): insert or update by (user_id, month), as the upserts do
+    'consumption_upsert': """
+        INSERT INTO consumption (user_id, month, usage_kwh, total_bill_paise, total_bill, bill_status)
+        VALUES (?, ?, ?, ?, ?, 'Pending')
+        ON CONFLICT(user_id, month) DO UPDATE SET
+            usage_kwh = excluded.usage_kwh, total_bill_paise = excluded.total_bill_paise,
+            total_bill = excluded.total_bill, bill_status = 'Pending', payment_timestamp = NULL
+    """,
+    # Every stored (user_id, month) as one int (importer._reading_key): user_id << 20 | months since 0000-01
+    'consumption_keys': "SELECT user_id << 20 | (CAST(substr(month, 1, 4) AS INTEGER) * 12 + CAST(substr(month, 6, 2) AS INTEGER) - 1) FROM consumption",
+    # Import checkpoints: byte offset and counts, written in each chunk's transaction
+    'import_job_running': "SELECT id, byte_offset, next_row, rows, added, updated, failed, chunks FROM import_jobs WHERE file_hash = ? AND status = 'Running' ORDER BY id DESC LIMIT 1",
+    'import_job_insert': "INSERT INTO import_jobs (file_name, file_hash, file_size, byte_offset, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+    'import_job_checkpoint': "UPDATE import_jobs SET byte_offset = ?, next_row = ?, rows = ?, added = ?, updated = ?, failed = ?, chunks = ?, updated_at = ? WHERE id = ?",
+    'import_job_finish': "UPDATE import_jobs SET status = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+    'import_jobs_abandon': "UPDATE import_jobs SET status = 'Abandoned', updated_at = ? WHERE file_hash = ? AND status = 'Running'",
+    'consumption_set_total_bill': "UPDATE consumption SET total_bill_paise = ?, total_bill = ? WHERE id = ?",
+    'consumption_pay': "UPDATE consumption SET bill_status = 'Paid', payment_timestamp = ? WHERE id = ?",
+    'consumption_delete': "DELETE FROM consumption WHERE id = ?",
+
+    # --- Analytics ---
+    'usage_total': "SELECT SUM(usage_kwh) as total FROM consumption",
+    'usage_by_month': "SELECT month, SUM(usage_kwh) as total_usage FROM consumption GROUP BY month ORDER BY month",
+    'billing_totals_by_status': "SELECT bill_status, COUNT(*) AS bills, SUM(total_bill_paise) AS total_paise FROM consumption GROUP BY bill_status ORDER BY bill_status",
+    'usage_by_client': """
+        SELECT u.full_name, SUM(c.usage_kwh) as total_usage
+        FROM consumption c JOIN users u ON c.user_id = u.id
+        WHERE u.role = 'client' GROUP BY u.full_name
+        """,
+    'usage_by_client_ranked': """
+        SELECT u.full_name, SUM(c.usage_kwh) as total_usage
+        FROM consumption c JOIN users u ON c.user_id = u.id
+        WHERE u.role = 'client'
+        GROUP BY u.full_name ORDER BY total_usage DESC
+    """,
+
+    # --- Tariffs ---
+    'tariff_revision': "SELECT revision FROM tariff_revision WHERE id = 1",
+    'tariffs_all': "SELECT id, category, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate FROM tariffs ORDER BY category, effective_from",
+    'tariff_slabs_all': "SELECT tariff_id, width_kwh, rate FROM tariff_slabs ORDER BY tariff_id, slab_order",
+    'tariff_id_for_month': "SELECT id FROM tariffs WHERE category = ? AND effective_from = ?",
+    'tariff_insert': "INSERT INTO tariffs (category, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate) VALUES (?, ?, ?, ?, ?, ?)",
+    'tariff_update': "UPDATE tariffs SET fixed_charge = ?, wheeling_per_kwh = ?, fac_per_kwh = ?, duty_rate = ? WHERE id = ?",
+    'tariff_delete': "DELETE FROM tariffs WHERE id = ?",
+    'tariff_slab_insert': "INSERT INTO tariff_slabs (tariff_id, slab_order, width_kwh, rate) VALUES (?, ?, ?, ?)",
+    'tariff_slabs_delete': "DELETE FROM tariff_slabs WHERE tariff_id = ?",
+
+    # --- Invoices ---
+    # Readings whose user is gone are billed in the default category
+    'consumption_for_month': f"SELECT c.id, c.user_id, c.usage_kwh, c.total_bill_paise, COALESCE(u.tariff_category, '{DEFAULT_TARIFF_CATEGORY}') FROM consumption c LEFT JOIN users u ON u.id = c.user_id WHERE c.user_id = ? AND c.month = ?",
+    'consumption_uninvoiced_for_month': f"SELECT c.id, c.user_id, c.usage_kwh, c.total_bill_paise, COALESCE(u.tariff_category, '{DEFAULT_TARIFF_CATEGORY}') FROM consumption c LEFT JOIN users u ON u.id = c.user_id WHERE c.month = ? AND c.id > ? AND NOT EXISTS (SELECT 1 FROM invoices i WHERE i.consumption_id = c.id) ORDER BY c.id LIMIT ?",
+    'consumption_uninvoiced_statements_for_month': """
+        SELECT c.user_id, u.full_name, c.usage_kwh, u.tariff_category
+        FROM consumption c JOIN users u ON c.user_id = u.id
+        WHERE c.month = ? AND NOT EXISTS (SELECT 1 FROM invoices i WHERE i.consumption_id = c.id)
+        ORDER BY u.full_name, c.user_id
+    """,
+    'invoice_id_for_month': "SELECT id FROM invoices WHERE user_id = ? AND month = ?",
+    'invoice_max_id': "SELECT MAX(id) FROM invoices",
+    'invoice_ids_after': "SELECT consumption_id, id FROM invoices WHERE id > ?",
+    'invoice_counts_by_month': "SELECT month, COUNT(*) AS invoices FROM invoices GROUP BY month ORDER BY month",
+    # invoices.invoice_from_rows() reads these by position; the statements
+    # query repeats the same columns and adds user_id, full_name at the end.
+    # tariff_category is NULL on invoices issued before categories existed.
+    # LEFT JOIN: a 0 kWh bill has no slab lines.
+    'invoice_with_lines': """
+        SELECT i.id, i.month, i.usage_kwh, i.energy_charge, i.fixed_charge, i.wheeling_charge, i.fac,
+               i.sub_total, i.duty_rate, i.electricity_duty, i.total_bill_paise, i.tariff_section, i.issued_at,
+               i.tariff_category, l.label, l.units, l.rate, l.amount
+        FROM invoices i LEFT JOIN invoice_lines l ON l.invoice_id = i.id
+        WHERE i.user_id = ? AND i.month = ?
+        ORDER BY l.line_order
+    """,
+    'invoice_statements_for_month': """
+        SELECT i.id, i.month, i.usage_kwh, i.energy_charge, i.fixed_charge, i.wheeling_charge, i.fac,
+               i.sub_total, i.duty_rate, i.electricity_duty, i.total_bill_paise, i.tariff_section, i.issued_at,
+               i.tariff_category, l.label, l.units, l.rate, l.amount, i.user_id, u.full_name
+        FROM invoices i JOIN users u ON i.user_id = u.id LEFT JOIN invoice_lines l ON l.invoice_id = i.id
+        WHERE i.month = ?
+        ORDER BY u.full_name, i.user_id, l.line_order
+    """,
+    'invoice_insert': """
+        INSERT INTO invoices (consumption_id, user_id, month, usage_kwh, tariff_effective_from,
+                              energy_charge, fixed_charge, wheeling_charge, fac, sub_total,
+                              duty_rate, electricity_duty, total_bill_paise, tariff_section, issued_at,
+                              tariff_category)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    'invoice_line_insert': "INSERT INTO invoice_lines (invoice_id, line_order, label, units, rate, amount) VALUES (?, ?, ?, ?, ?, ?)",
+    'invoice_delete': "DELETE FROM invoices WHERE id = ?",
+    'invoice_lines_delete': "DELETE FROM invoice_lines WHERE invoice_id = ?",
+
+    # --- Grievances ---
+    'tickets_for_user': "SELECT token, created_at, subject, status, id FROM grievance_tickets WHERE user_id = ? ORDER BY updated_at DESC",
+    'tickets_all': "SELECT token, created_at, username, subject, status, id FROM grievance_tickets ORDER BY updated_at DESC",
+    'tickets_by_status': "SELECT token, created_at, username, subject, status, id FROM grievance_tickets WHERE status = ? ORDER BY updated_at DESC",
+    'ticket_status': "SELECT status FROM grievance_tickets WHERE id = ?",
+    'ticket_messages': "SELECT sender_name, timestamp, message FROM grievance_messages WHERE ticket_id = ? ORDER BY timestamp ASC",
+    'ticket_insert': "INSERT INTO grievance_tickets (token, user_id, username, subject, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'Pending', ?, ?)",
+    'ticket_message_insert': "INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+    'ticket_set_status': "UPDATE grievance_tickets SET status = ?, updated_at = ? WHERE id = ?",
+
+    # --- Action log ---
+    'action_log_recent': "SELECT timestamp, actor, action FROM action_log ORDER BY id DESC LIMIT 200",
+    'action_log_recent_by_actor': "SELECT timestamp, actor, action FROM action_log WHERE actor = ? ORDER BY id DESC LIMIT 200",
+}
+
+def sql(name):
+    """The SQL text for a catalog name."""
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"Unknown query name: {name!r}") from None
+
+# --- Per-name Timings ---
+# Always on: two perf_counter() calls and a dict update per query.
+_timings = {}
+_timings_lock = threading.Lock()
+
+def _timed(name, helper, *args):
+    query = sql(name)
+    start = time.perf_counter()
+    try:
+        return helper(query, *args)
+    finally:
+        elapsed = time.perf_counter() - start
+        with _timings_lock:
+            entry = _timings.get(name)
+            if entry is None:
+                entry = _timings[name] = {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            entry['calls'] += 1
+            entry['total_seconds'] += elapsed
+            if elapsed > entry['max_seconds']:
+                entry['max_seconds'] = elapsed
+
+def timings():
+    """One dict per query name that has run, slowest total time first. Times are in milliseconds."""
+    with _timings_lock:
+        items = [(name, dict(entry)) for name, entry in _timings.items()]
+    report = [{
+        'name': name,
+        'calls': entry['calls'],
+        'total_ms': entry['total_seconds'] * 1000,
+        'avg_ms': entry['total_seconds'] * 1000 / entry['calls'],
+        'max_ms': entry['max_seconds'] * 1000,
+    } for name, entry in items]
+    report.sort(key=lambda item: item['total_ms'], reverse=True)
+    return report
+
+def format_timings(limit=None):
+    """timings() as a plain-text table."""
+    report = timings()
+    if not report:
+        return "No catalog queries have run yet."
+    if limit is not None:
+        report = report[:limit]
+    lines = [f"{'Query':<30} | {'Calls':>7} | {'Total ms':>10} | {'Avg ms':>8} | {'Max ms':>8}", "-" * 75]
+    for item in report:
+        lines.append(f"{item['name']:<30} | {item['calls']:>7} | {item['total_ms']:>10.2f} | "
+                     f"{item['avg_ms']:>8.3f} | {item['max_ms']:>8.3f}")
+    return "\n".join(lines)
+
+def reset_timings():
+    with _timings_lock:
+        _timings.clear()
+
+# --- Runners ---
+# Same behaviour and return values as the database.py helper each one wraps.
+
+def execute(name, params=()):
+    return _timed(name, database.db_query, params)
+
+def execute_lastrowid(name, params=()):
+    return _timed(name, database.db_query_lastrowid, params)
+
+def execute_many(name, rows, chunk_size=5000):
+    return _timed(name, database.db_query_many, rows, chunk_size)
+
+def fetch_one(name, params=()):
+    return _timed(name, database.db_query_one, params)
+
+def fetch_rows(name, params=()):
+    return _timed(name, database.db_query_rows, params)
+
+def fetch_scalar(name, params=(), default=None):
+    return _timed(name, database.db_query_scalar, params, default)
+
+def fetch_df(name, params=()):
+    return _timed(name, database.db_query_to_df, params)
+
+def fetch_chunks(name, params=(), chunk_size=5000, row_factory=sqlite3.Row):
+    """database.db_query_chunks() for a catalog name. Not timed here: the work happens while iterating."""
+    return database.db_query_chunks(sql(name), params, chunk_size, row_factory)
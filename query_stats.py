@@ -0,0 +1,171 @@
+import os
+import re
+import sys
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+
+# --- Query Instrumentation ---
+# Opt-in timing for every db_query* helper in database.py. Turn it on per
+# process with ELECTRICITY_DB_STATS=1, or call enable() (the CLI admin menu
+# has a switch for it). While it is off, the helpers only pay for one
+# attribute check per call.
+ENABLED = os.environ.get('ELECTRICITY_DB_STATS', '') not in ('', '0')
+
+# Queries at or above this many milliseconds are appended to SLOW_QUERY_LOG.
+SLOW_QUERY_MS = float(os.environ.get('ELECTRICITY_DB_SLOW_MS', 100))
+SLOW_QUERY_LOG = 'slow_queries.log'
+
+# Only the most recent timings per fingerprint are kept for the percentiles.
+MAX_SAMPLES = 5000
+
+# Frames from these files are skipped when working out who ran a query.
+_INTERNAL_FILES = ('database.py', 'query_stats.py', 'queries.py')
+
+_lock = threading.Lock()
+_stats = {}
+
+def enable(slow_ms=None, log_file=None):
+    global ENABLED, SLOW_QUERY_MS, SLOW_QUERY_LOG
+    if slow_ms is not None:
+        SLOW_QUERY_MS = float(slow_ms)
+    if log_file is not None:
+        SLOW_QUERY_LOG = log_file
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Forgets everything recorded so far (the slow-query log file is left alone)."""
+    with _lock:
+        _stats.clear()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """
+    Normalises a SQL string so that the same statement with different
+    literals or spacing is reported as one entry, e.g.
+        "SELECT * FROM users WHERE id = 5"  ->  "SELECT * FROM users WHERE id = ?"
+    """
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _IN_LIST.sub('IN (?, ...)', text)
+
+def caller_name():
+    """The first function outside the database modules, e.g. 'AdminView.refresh_user_list'."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if not code.co_filename.endswith(_INTERNAL_FILES) and 'contextlib' not in code.co_filename:
+            return getattr(code, 'co_qualname', code.co_name)
+        frame = frame.f_back
+    return '<unknown>'
+
+def record(query, seconds, rows=None, df_seconds=None, error=None):
+    """Called by database.py after each instrumented query."""
+    key = fingerprint(query)
+    caller = caller_name()
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {
+                'calls': 0, 'errors': 0, 'rows': 0, 'df_seconds': 0.0,
+                'total_seconds': 0.0, 'samples': deque(maxlen=MAX_SAMPLES),
+                'callers': Counter(),
+            }
+        entry['calls'] += 1
+        entry['total_seconds'] += seconds
+        entry['samples'].append(seconds)
+        entry['callers'][caller] += 1
+        if rows is not None:
+            entry['rows'] += rows
+        if df_seconds is not None:
+            entry['df_seconds'] += df_seconds
+        if error is not None:
+            entry['errors'] += 1
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        _log_slow_query(key, caller, seconds, rows, df_seconds, error)
+
+def _log_slow_query(key, caller, seconds, rows, df_seconds, error):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    line = f"{now} | {seconds * 1000:9.1f} ms | rows={rows if rows is not None else '-'}"
+    if df_seconds is not None:
+        line += f" | df={df_seconds * 1000:.1f} ms"
+    line += f" | {caller} | {key}"
+    if error is not None:
+        line += f" | ERROR: {error}"
+    try:
+        with open(SLOW_QUERY_LOG, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Slow Query Log Error: {e}")
+
+def _percentile(sorted_samples, pct):
+    # Nearest-rank percentile
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return sorted_samples[int(rank) - 1]
+
+def summary():
+    """
+    One dict per fingerprint, slowest total time first. Times are in milliseconds.
+    """
+    with _lock:
+        entries = [(key, dict(entry, samples=sorted(entry['samples']), callers=entry['callers'].copy()))
+                   for key, entry in _stats.items()]
+    report = []
+    for key, entry in entries:
+        samples = entry['samples']
+        report.append({
+            'query': key,
+            'calls': entry['calls'],
+            'errors': entry['errors'],
+            'rows': entry['rows'],
+            'total_ms': entry['total_seconds'] * 1000,
+            'df_ms': entry['df_seconds'] * 1000,
+            'p50_ms': _percentile(samples, 50) * 1000,
+            'p95_ms': _percentile(samples, 95) * 1000,
+            'p99_ms': _percentile(samples, 99) * 1000,
+            'max_ms': (samples[-1] if samples else 0.0) * 1000,
+            'callers': [name for name, _ in entry['callers'].most_common()],
+        })
+    report.sort(key=lambda item: item['total_ms'], reverse=True)
+    return report
+
+def format_summary(limit=None):
+    """The summary() as a plain-text table for printing or saving."""
+    report = summary()
+    if not report:
+        return "No queries recorded. Enable instrumentation with ELECTRICITY_DB_STATS=1."
+    if limit is not None:
+        report = report[:limit]
+
+    lines = [f"{'Calls':>6} | {'Total ms':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+             f"{'Max ms':>8} | {'DF ms':>8} | {'Rows':>8} | Query / Callers"]
+    lines.append("-" * 120)
+    for item in report:
+        lines.append(f"{item['calls']:>6} | {item['total_ms']:>9.2f} | {item['p50_ms']:>8.3f} | "
+                     f"{item['p95_ms']:>8.3f} | {item['p99_ms']:>8.3f} | {item['max_ms']:>8.3f} | "
+                     f"{item['df_ms']:>8.2f} | {item['rows']:>8} | {item['query']}")
+        callers = ", ".join(item['callers'][:3])
+        if len(item['callers']) > 3:
+            callers += f", +{len(item['callers']) - 3} more"
+        errors = f" ({item['errors']} errors)" if item['errors'] else ""
+        lines.append(f"{'':>6} | {'':>9} | {'':>8} | {'':>8} | {'':>8} | {'':>8} | {'':>8} | {'':>8} |   <- {callers}{errors}")
+    return "\n".join(lines)
+
+def dump(file_path):
+    """Writes format_summary() to `file_path`."""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(format_summary() + "\n")
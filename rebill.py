@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+import database
+import queries
+import tariffs
+from billing import paise_to_rupees
+
+# --- Bulk Rebilling ---
+# Recomputes stored bill totals after a tariff change without going
+# through upsert_consumption row by row (which also resets bill_status).
+#
+#     summary = rebill.rebill(month='2025-07', dry_run=True)
+#     summary = rebill.rebill(month='2025-07')
+#
+# Rows are read in id order, CHUNK_SIZE at a time (keyset paging on id, so
+# every chunk is an index range read however big the table gets). Each chunk
+# is billed in exact integer paise with tariffs.calculate_bills_paise_for_months(),
+# one batch per tariff (by month and tariff category), and only the rows whose total
+# changed are written back, with one executemany UPDATE inside its own
+# transaction. Only total_bill_paise / total_bill are touched; bill_status
+# and payment_timestamp are left as they are. Readings with an issued invoice
+# (invoices.py) are skipped: their bill is fixed.
+CHUNK_SIZE = 5000
+
+# Dry runs keep at most this many changed rows for display (counts and
+# totals still cover every row).
+DIFF_LIMIT = 1000
+
+def chunk_query(month, user_id):
+    """The keyset-paged SELECT for the given filters, and the filter params."""
+    # The category comes from a primary-key lookup per row, which keeps the
+    # read on the consumption id range; readings without a user bill as the default
+    query = ("SELECT id, user_id, month, usage_kwh, total_bill_paise, "
+             f"COALESCE((SELECT u.tariff_category FROM users u WHERE u.id = consumption.user_id), '{tariffs.DEFAULT_CATEGORY}') "
+             "FROM consumption WHERE id > ?")
+    params = []
+    if month is not None:
+        # On its own, a month filter would read idx_consumption_month and
+        # re-sort the whole month by id for every chunk; the unary + keeps
+        # the planner on the id range instead.
+        query += " AND +month = ?" if user_id is None else " AND month = ?"
+        params.append(month)
+    if user_id is not None:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    # Issued invoices keep the amounts they were issued with
+    query += " AND NOT EXISTS (SELECT 1 FROM invoices i WHERE i.consumption_id = consumption.id)"
+    query += " ORDER BY id LIMIT ?"
+    return query, params
+
+def rebill(month=None, user_id=None, dry_run=False, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Recomputes the stored bill for every un-invoiced consumption row matching
+    the filters (`month` 'YYYY-MM' and/or `user_id`; None means all) with the tariff in
+    force for each row's month and client category, exactly as the upserts
+    bill a new reading.
+
+    With dry_run=True nothing is written. `progress`, if given, is called as
+    progress(rows_scanned, rows_changed) after every chunk.
+
+    Returns a summary dict:
+        {'rows_scanned', 'rows_changed', 'chunks', 'old_total', 'new_total',
+         'seconds', 'rows_per_second', 'dry_run',
+         'diff': [(id, user_id, month, usage_kwh, old_total, new_total), ...]}
+    Totals are in rupees, summed exactly in paise.
+    'diff' is only filled on a dry run, capped at DIFF_LIMIT rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    query, filter_params = chunk_query(month, user_id)
+    summary = {'rows_scanned': 0, 'rows_changed': 0, 'chunks': 0, 'dry_run': dry_run, 'diff': []}
+    old_total_paise = new_total_paise = 0
+    start = time.perf_counter()
+    last_id = 0
+
+    while True:
+        rows = database.db_query_rows(query, [last_id, *filter_params, chunk_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        summary['chunks'] += 1
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        months = [row[2] for row in rows]
+        usage = np.array([row[3] for row in rows], dtype=np.float64)
+        old_totals = np.array([row[4] for row in rows], dtype=np.int64)
+        categories = [row[5] for row in rows]
+        new_totals = tariffs.calculate_bills_paise_for_months(usage, months, categories)
+
+        changed = np.flatnonzero(new_totals != old_totals)
+        summary['rows_scanned'] += len(rows)
+        summary['rows_changed'] += len(changed)
+        old_total_paise += int(old_totals.sum())
+        new_total_paise += int(new_totals.sum())
+
+        if dry_run:
+            room = DIFF_LIMIT - len(summary['diff'])
+            for i in changed[:max(room, 0)]:
+                row = rows[i]
+                summary['diff'].append((row[0], row[1], row[2], row[3],
+                                        paise_to_rupees(row[4]), paise_to_rupees(int(new_totals[i]))))
+        elif len(changed):
+            new_paise = new_totals[changed].tolist()
+            updates = zip(new_paise, map(paise_to_rupees, new_paise), ids[changed].tolist())
+            with database.transaction():
+                queries.execute_many('consumption_set_total_bill', updates, chunk_size)
+
+        if progress is not None:
+            progress(summary['rows_scanned'], summary['rows_changed'])
+        if len(rows) < chunk_size:
+            break
+
+    summary['old_total'] = paise_to_rupees(old_total_paise)
+    summary['new_total'] = paise_to_rupees(new_total_paise)
+    summary['seconds'] = time.perf_counter() - start
+    summary['rows_per_second'] = summary['rows_scanned'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
@@ -0,0 +1,278 @@
+import heapq
+import itertools
+import operator
+import os
+import time
+import weakref
+import zipfile
+from string import Formatter
+
+import numpy as np
+
+import billing
+import invoices
+import queries
+import tariffs
+from billing import paise_to_rupees
+
+# --- Bill Statements ---
+# One template for the itemized bill text shown in the GUI, the CLI and the
+# exported .txt files. Everything that only depends on the tariff (the duty
+# label, the "APPLIED TARIFF" title and footer, and the label/rate part of
+# each energy slab line) is baked into a per-tariff template the first time that tariff is
+# used. That template is parsed once into literal text and (field, format spec)
+# pairs, so rendering a bill only formats the per-bill values.
+#
+#     text = statements.render_bill(kwh_units, month, user_name)
+#     text = statements.bill_text(user_id, month, user_name)   # issued or estimate
+#     summary = statements.export_month_bills('2025-07', 'bills_2025-07.zip')
+#
+# The amount payable is the exact paise total (billing.bill_paise), the same
+# figure the upserts store in consumption.total_bill_paise. Once a month is
+# issued (invoices.py) its bills are rendered from the stored invoice lines
+# instead, with the same template.
+BILL_TEMPLATE = (
+    "--- ESTIMATED ELECTRICITY BILL ---\n\n"
+    "Client: {user_name}\n"
+    "Billing Month: {month}\n"
+    "Total Consumption: {kwh_units:.2f} kWh\n"
+    "----------------------------------\n\n"
+    "ITEMIZED CHARGES:\n\n"
+    "A. Energy Charges:\n"
+    "{energy_lines}\n"
+    "   Total Energy Charge:   ₹{energy_charge:>10.2f}\n\n"
+    "B. Fixed Charge:             ₹{fixed_charge:>10.2f}\n"
+    "C. Wheeling Charge:          ₹{wheeling_charge:>10.2f}\n"
+    "D. Fuel Adjustment (FAC):    ₹{fac:>10.2f}\n"
+    "----------------------------------\n"
+    "   Sub-Total:               ₹{sub_total:>10.2f}\n"
+    "{duty_label}₹{electricity_duty:>10.2f}\n\n"
+    "--- TOTAL BILL AMOUNT ---\n"
+    "   (A+B+C+D+E):             ₹{total_bill:>10.2f}\n"
+    "----------------------------------\n"
+    "\n\n--- APPLIED TARIFF ({tariff_title}) ---\n"
+    "{tariff_section}\n"
+)
+
+# Written between bills when a whole month goes into one .txt file
+STATEMENT_SEPARATOR = "\n" + "=" * 60 + "\n\n"
+
+# Rows read (and billed in one batch) at a time by export_month_bills()
+EXPORT_CHUNK_SIZE = 2000
+
+# Deflate level for .zip exports. Bills are small and repetitive, so level 1
+# is ~40% faster per file than the default for ~4% more bytes.
+ZIP_COMPRESSLEVEL = 1
+
+def _escape(text):
+    return text.replace('{', '{{').replace('}', '}}')
+
+def _parse(template):
+    return [(literal, field, spec) for literal, field, spec, _ in Formatter().parse(template)]
+
+def _render_parts(parts, values):
+    out = []
+    for literal, field, spec in parts:
+        out.append(literal)
+        if field is not None:
+            out.append(format(values[field], spec))
+    return "".join(out)
+
+def _duty_label(duty_rate):
+    return f"{f'E. Electricity Duty ({duty_rate * 100:.0f}%):':<29}"
+
+class StatementTemplate:
+    """BILL_TEMPLATE with one tariff's static parts filled in."""
+    def __init__(self, tariff):
+        self.tariff = tariff
+        template = BILL_TEMPLATE.replace("{duty_label}", _escape(_duty_label(tariff.duty_rate)))
+        template = template.replace("{tariff_title}", _escape(tariff.title))
+        template = template.replace("{tariff_section}", _escape("\n".join(tariff.rate_lines())))
+        self._parts = _parse(template)
+        self._slab_formats = [
+            (label + " {:>6.2f} kWh @ ₹" + f"{rate:.2f}" + "/unit = ₹{:.2f}").format
+            for label, rate in zip(tariff.slab_labels, tariff.rates)
+        ]
+        self._lower_bounds = np.array(tariff.lower_bounds)
+        self._widths = np.array(tariff.widths)
+
+    def energy_lines(self, kwh_units):
+        """The itemized slab lines, identical to tariff.line_items()."""
+        tariff = self.tariff
+        last = tariff.slab_index(kwh_units)
+        lines = []
+        for i in range(last + 1):
+            units = tariff.widths[i] if i < last else min(kwh_units - tariff.lower_bounds[i], tariff.widths[i])
+            lines.append(self._slab_formats[i](units, units * tariff.rates[i]))
+        return "\n".join(lines)
+
+    def render(self, kwh_units, month, user_name, bill, total_paise, energy_lines):
+        values = {
+            'user_name': user_name, 'month': month, 'kwh_units': kwh_units, 'energy_lines': energy_lines,
+            'energy_charge': bill['A_Energy_Charge'], 'fixed_charge': bill['B_Fixed_Charge'],
+            'wheeling_charge': bill['C_Wheeling_Charge'], 'fac': bill['D_FAC'],
+            'sub_total': bill['A_Energy_Charge'] + bill['B_Fixed_Charge'] + bill['C_Wheeling_Charge'] + bill['D_FAC'],
+            'electricity_duty': bill['E_Electricity_Duty'], 'total_bill': paise_to_rupees(total_paise),
+        }
+        return _render_parts(self._parts, values)
+
+    def render_batch(self, kwh_units, month, user_names):
+        """Yields the bill text for each reading, billed in one batch."""
+        tariff = self.tariff
+        kwh = np.asarray(kwh_units, dtype=np.float64)
+        bills = {key: values.tolist() for key, values in tariff.bills(kwh).items()}
+        totals_paise = tariff.bills_paise(kwh).tolist()
+        # Units billed in each slab, same arithmetic as energy_lines()
+        slabs_used = np.searchsorted(self._lower_bounds, kwh, side='left').tolist()
+        units = np.minimum(kwh[:, None] - self._lower_bounds, self._widths).tolist()
+        rates = tariff.rates
+        slab_formats = self._slab_formats
+        keys = list(bills)
+
+        for row, (kwh_value, user_name) in enumerate(zip(kwh.tolist(), user_names)):
+            row_units = units[row]
+            energy_lines = "\n".join(slab_formats[i](row_units[i], row_units[i] * rates[i])
+                                     for i in range(slabs_used[row]))
+            bill = {key: bills[key][row] for key in keys}
+            yield self.render(kwh_value, month, user_name, bill, totals_paise[row], energy_lines)
+
+_templates = weakref.WeakKeyDictionary()
+
+def template_for(tariff):
+    """The cached StatementTemplate for a CompiledTariff."""
+    template = _templates.get(tariff)
+    if template is None:
+        template = _templates[tariff] = StatementTemplate(tariff)
+    return template
+
+def render_bill(kwh_units, month, user_name, tariff=None):
+    """
+    The itemized bill text for one reading, billed with `tariff`
+    (default: the default category's tariff for `month`).
+    """
+    if tariff is None:
+        tariff = tariffs.tariff_for_month(month)
+    template = template_for(tariff)
+    return template.render(kwh_units, month, user_name, tariff.bill(kwh_units),
+                           tariff.bill_paise(kwh_units), template.energy_lines(kwh_units))
+
+# An issued invoice is a tax invoice, not an estimate: same body, its own header
+INVOICE_TEMPLATE = BILL_TEMPLATE.replace(
+    "--- ESTIMATED ELECTRICITY BILL ---\n\n",
+    "--- TAX INVOICE No. {invoice_id} ---\n\n"
+    "Issued: {issued_at}\n",
+)
+
+# INVOICE_TEMPLATE with every field left open
+_INVOICE_PARTS = _parse(INVOICE_TEMPLATE)
+
+def render_invoice(invoice, user_name):
+    """The bill text for an issued invoice (invoices.get_invoice), from its stored lines alone."""
+    values = dict(invoice['charges'])
+    values.update({
+        'invoice_id': invoice['id'], 'issued_at': invoice['issued_at'],
+        'user_name': user_name, 'month': invoice['month'], 'kwh_units': invoice['usage_kwh'],
+        'energy_lines': "\n".join(f"{label} {units:>6.2f} kWh @ ₹{rate:.2f}/unit = ₹{amount:.2f}"
+                                  for label, units, rate, amount in invoice['slabs']),
+        'duty_label': _duty_label(invoice['duty_rate']),
+        'tariff_section': invoice['tariff_section'],
+        'tariff_title': billing.tariff_category_title(invoice['tariff_category']),
+        'total_bill': paise_to_rupees(invoice['total_bill_paise']),
+    })
+    return _render_parts(_INVOICE_PARTS, values)
+
+def bill_text(user_id, month, user_name):
+    """
+    The client's bill for `month`: the issued invoice if there is one,
+    otherwise an estimate from the reading with the month's tariff for the
+    client's category. None if there is no reading for that month either.
+    """
+    invoice = invoices.get_invoice(user_id, month)
+    if invoice is not None:
+        return render_invoice(invoice, user_name)
+    kwh_units = queries.fetch_scalar('consumption_usage_for_month', (user_id, month))
+    if kwh_units is None:
+        return None
+    return render_bill(kwh_units, month, user_name, tariffs.tariff_for_user(user_id, month))
+
+def bill_filename(client_name, month, user_id=None):
+    """BILL_<name>_<month>.txt, as exported from the bill screens (with the id when given)."""
+    clean_client_name = (client_name or "client").replace(" ", "_")
+    if user_id is not None:
+        return f"BILL_{clean_client_name}_{user_id}_{month}.txt"
+    return f"BILL_{clean_client_name}_{month}.txt"
+
+def _issued_statements(month, chunk_size):
+    """(full_name, user_id, text) for each issued invoice in `month`, in name order."""
+    rows = itertools.chain.from_iterable(
+        queries.fetch_chunks('invoice_statements_for_month', (month,), chunk_size, row_factory=None))
+    for _, invoice_rows in itertools.groupby(rows, key=operator.itemgetter(0)):
+        invoice_rows = list(invoice_rows)
+        # user_id and full_name follow the invoice_with_lines columns
+        user_id, full_name = invoice_rows[0][18:20]
+        yield full_name, user_id, render_invoice(invoices.invoice_from_rows(invoice_rows), full_name)
+
+def _estimated_statements(month, chunk_size):
+    """
+    (full_name, user_id, text) for each reading in `month` not yet invoiced.
+    Each chunk is billed in one batch per tariff category and then put back
+    in name order.
+    """
+    for chunk in queries.fetch_chunks('consumption_uninvoiced_statements_for_month', (month,), chunk_size):
+        rows_by_category = {}
+        for i, row in enumerate(chunk):
+            rows_by_category.setdefault(row['tariff_category'], []).append(i)
+        texts = [None] * len(chunk)
+        for category, indices in rows_by_category.items():
+            template = template_for(tariffs.tariff_for_month(month, category))
+            rendered = template.render_batch([chunk[i]['usage_kwh'] for i in indices], month,
+                                             [chunk[i]['full_name'] for i in indices])
+            for i, text in zip(indices, rendered):
+                texts[i] = text
+        for row, text in zip(chunk, texts):
+            yield row['full_name'], row['user_id'], text
+
+def export_month_bills(month, path, progress=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Writes the bill for every client with a reading in `month`: the issued
+    invoice where there is one, an estimate otherwise. If `path` ends in
+    .zip it gets one .txt per client; otherwise every bill goes into the one
+    text file, separated by STATEMENT_SEPARATOR. Rows are read, rendered and
+    written chunk by chunk, so memory use doesn't grow with the number of
+    clients. `progress(bills_written)` is called every `chunk_size` bills.
+
+    Returns {'bills', 'seconds', 'bills_per_second', 'path'}.
+    """
+    as_zip = path.lower().endswith('.zip')
+    written = 0
+    start = time.perf_counter()
+    # Both streams come back sorted by (name, user id); merging keeps the
+    # file in client order when only part of the month has been issued
+    bills = heapq.merge(_issued_statements(month, chunk_size), _estimated_statements(month, chunk_size),
+                        key=lambda bill: (bill[0] or "", bill[1]))
+
+    if as_zip:
+        out = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL)
+    else:
+        out = open(path, 'w', encoding='utf-8')
+    with out:
+        for full_name, user_id, text in bills:
+            if as_zip:
+                out.writestr(bill_filename(full_name, month, user_id), text)
+            else:
+                if written:
+                    out.write(STATEMENT_SEPARATOR)
+                out.write(text)
+            written += 1
+            if progress is not None and written % chunk_size == 0:
+                progress(written)
+    if progress is not None and written % chunk_size:
+        progress(written)
+
+    seconds = time.perf_counter() - start
+    return {
+        'bills': written,
+        'seconds': seconds,
+        'bills_per_second': written / seconds if seconds else 0.0,
+        'path': os.path.abspath(path),
+    }
@@ -0,0 +1,284 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import billing
+import database
+import queries
+
+# --- Effective-dated Tariffs ---
+# The rates a bill uses come from the `tariffs` / `tariff_slabs` tables
+# (migration 3). Each tariff category (billing.TARIFF_CATEGORIES, migration 6)
+# has its own rows; each row takes effect from its `effective_from` month and
+# stays in force until the next one in the same category, so a month is billed
+# by the latest tariff of the consumer's category whose effective_from is <=
+# that month.
+#
+#     tariff = tariffs.tariff_for_month('2025-07', 'LT-II')
+#     tariff = tariffs.tariff_for_user(user_id, '2025-07')
+#     bill_data, bill_details = calculate_mahadiscom_bill(kwh, tariff)
+#
+# Every tariff is compiled into a billing.CompiledTariff once and kept in
+# process, and each month's answer is memoized, so a lookup is a dict hit.
+# Triggers bump tariff_revision on any write to the tariff tables; the cache
+# re-reads that counter at most every CHECK_INTERVAL_SECONDS and recompiles
+# when it has moved. save_tariff() drops the cache straight away.
+CHECK_INTERVAL_SECONDS = 2.0
+
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+CATEGORIES = billing.TARIFF_CATEGORIES
+DEFAULT_CATEGORY = billing.DEFAULT_TARIFF_CATEGORY
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _load_cache():
+    revision = queries.fetch_scalar('tariff_revision', default=0)
+    slabs_by_tariff = {}
+    for tariff_id, width_kwh, rate in queries.fetch_rows('tariff_slabs_all'):
+        width = float('inf') if width_kwh is None else width_kwh
+        slabs_by_tariff.setdefault(tariff_id, []).append((width, rate))
+
+    # category -> (effective_from months, CompiledTariffs), both in month order
+    categories = {}
+    for tariff_id, category, effective_from, fixed_charge, wheeling, fac, duty_rate in queries.fetch_rows('tariffs_all'):
+        slabs = slabs_by_tariff.get(tariff_id)
+        if not slabs:
+            print(f"Tariff Error: {category} tariff effective {effective_from} has no slabs; skipping it.")
+            continue
+        months, compiled = categories.setdefault(category, ([], []))
+        months.append(effective_from)
+        compiled.append(billing.CompiledTariff(slabs, fixed_charge, wheeling, fac, duty_rate,
+                                               effective_from=effective_from, category=category))
+    return {
+        'db_file': database.DB_FILE,
+        'revision': revision,
+        'checked_at': time.monotonic(),
+        'categories': categories,
+        'by_month': {},
+    }
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        cache = _cache
+        now = time.monotonic()
+        if cache is not None and cache['db_file'] == database.DB_FILE:
+            if now - cache['checked_at'] < CHECK_INTERVAL_SECONDS:
+                return cache
+            cache['checked_at'] = now
+            if queries.fetch_scalar('tariff_revision', default=0) == cache['revision']:
+                return cache
+        _cache = _load_cache()
+        return _cache
+
+def invalidate_cache():
+    """Forces the next lookup to reload and recompile the tariff tables."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+def tariff_for_month(month=None, category=None):
+    """
+    The CompiledTariff in force for `month` ('YYYY-MM', default: this month)
+    in `category` (default, or not in CATEGORIES: DEFAULT_CATEGORY). Falls
+    back to the category's built-in tariff (billing.TARIFFS) if no stored
+    tariff covers it.
+    """
+    if month is None:
+        month = datetime.now().strftime('%Y-%m')
+    if category not in CATEGORIES:
+        category = DEFAULT_CATEGORY
+    cache = _get_cache()
+    tariff = cache['by_month'].get((category, month))
+    if tariff is None:
+        months, compiled = cache['categories'].get(category, ((), ()))
+        i = bisect_right(months, month) - 1
+        tariff = compiled[i] if i >= 0 else billing.TARIFFS[category]
+        # Under the lock _get_cache() swaps caches with, so the memo only
+        # goes into a cache that hasn't been replaced in the meantime
+        with _cache_lock:
+            if _cache is cache:
+                cache['by_month'][(category, month)] = tariff
+    return tariff
+
+def user_category(user_id):
+    """The client's tariff category (DEFAULT_CATEGORY if the user doesn't exist)."""
+    return queries.fetch_scalar('user_tariff_category', (user_id,), default=DEFAULT_CATEGORY)
+
+def tariff_for_user(user_id, month=None):
+    """tariff_for_month() for the client's own tariff category."""
+    return tariff_for_month(month, user_category(user_id))
+
+def set_user_category(user_id, category):
+    """Moves a client to another tariff category. Raises ValueError for an unknown one."""
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown tariff category {category!r}; expected one of {', '.join(CATEGORIES)}.")
+    queries.execute('user_set_tariff_category', (category, user_id))
+
+def list_tariffs(category=None):
+    """
+    Every stored tariff as a CompiledTariff, by category and then oldest
+    effective_from first; only `category`'s if one is given.
+    """
+    categories = _get_cache()['categories']
+    return [tariff for name, (_, compiled) in sorted(categories.items())
+            if category is None or name == category for tariff in compiled]
+
+def _is_whole(value):
+    return abs(value - round(value)) < 1e-6
+
+def validate_tariff(slabs, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate):
+    """
+    Raises ValueError unless the tariff can be billed exactly: slabs ending
+    in exactly one open-ended slab, positive widths, non-negative rates and
+    whole paise / basis points. Used for stored and what-if tariffs alike.
+    """
+    if not slabs or slabs[-1][0] != float('inf'):
+        raise ValueError("The last slab must be open-ended (width 'inf').")
+    for order, (width, rate) in enumerate(slabs):
+        if not width > 0 or rate < 0:
+            raise ValueError(f"Slab {order + 1}: width must be positive and rate non-negative.")
+        if width == float('inf') and order != len(slabs) - 1:
+            raise ValueError("Only the last slab can be open-ended.")
+    charges = [fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate]
+    if not all(math.isfinite(value) and value >= 0 for value in charges + [rate for _, rate in slabs]):
+        raise ValueError("Charges, rates and the duty rate must be non-negative numbers.")
+    # The exact paise path (billing.bill_paise) needs these in whole units
+    if any(not _is_whole(value * 100) for value in [fixed_charge, wheeling_per_kwh, fac_per_kwh]
+           + [rate for _, rate in slabs] + [width for width, _ in slabs[:-1]]):
+        raise ValueError("Charges, rates and slab widths can have at most 2 decimal places.")
+    if not _is_whole(duty_rate * 10000):
+        raise ValueError("The duty rate must be a whole number of basis points (e.g. 0.16 or 0.1625).")
+
+def save_tariff(effective_from, slabs, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate,
+                category=DEFAULT_CATEGORY):
+    """
+    Stores a `category` tariff taking effect from `effective_from` ('YYYY-MM'),
+    replacing any tariff already stored for that category and month.
+    `slabs` is a list of (width_kwh, rate) like billing.slabs, ending in
+    exactly one open-ended slab (width float('inf')). Returns the tariff id.
+    """
+    if not MONTH_PATTERN.match(effective_from):
+        raise ValueError(f"Effective month must be YYYY-MM, got {effective_from!r}.")
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown tariff category {category!r}; expected one of {', '.join(CATEGORIES)}.")
+    validate_tariff(slabs, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate)
+
+    with database.transaction():
+        tariff_id = queries.fetch_scalar('tariff_id_for_month', (category, effective_from))
+        if tariff_id is None:
+            tariff_id = queries.execute_lastrowid(
+                'tariff_insert', (category, effective_from, fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate))
+        else:
+            queries.execute('tariff_update', (fixed_charge, wheeling_per_kwh, fac_per_kwh, duty_rate, tariff_id))
+            queries.execute('tariff_slabs_delete', (tariff_id,))
+        queries.execute_many('tariff_slab_insert', [
+            (tariff_id, order, None if width == float('inf') else width, rate)
+            for order, (width, rate) in enumerate(slabs)
+        ])
+    invalidate_cache()
+    return tariff_id
+
+def delete_tariff(effective_from, category=DEFAULT_CATEGORY):
+    """Removes the `category` tariff taking effect from `effective_from`. Returns False if there was none."""
+    with database.transaction():
+        tariff_id = queries.fetch_scalar('tariff_id_for_month', (category, effective_from))
+        if tariff_id is None:
+            return False
+        queries.execute('tariff_slabs_delete', (tariff_id,))
+        queries.execute('tariff_delete', (tariff_id,))
+    invalidate_cache()
+    return True
+
+def _factorize(values):
+    """
+    (distinct values, int code per row) for a column of months or category
+    codes. Short ASCII strings are packed 7 bits a character into one int64,
+    which is exact for them, and hashed with pandas.factorize: several times
+    faster than np.unique, which sorts the strings.
+    """
+    values = np.ascontiguousarray(values)
+    chars = values.dtype.itemsize // 4
+    if values.dtype.kind == 'U' and 0 < chars <= 9 and len(values):
+        points = values.view(np.uint32).reshape(len(values), chars)
+        if points.max() < 128:
+            packed = np.zeros(len(values), dtype=np.int64)
+            for i in range(chars):
+                packed = (packed << 7) | points[:, i]
+            codes, uniques = pd.factorize(packed)
+            keys = ["".join(chr((key >> 7 * (chars - 1 - i)) & 127) for i in range(chars)).rstrip("\0")
+                    for key in uniques.tolist()]
+            return keys, codes
+    # Anything else (e.g. an object column with a None) keeps every value as a key
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return list(uniques), codes
+
+def tariff_groups(months, categories=None):
+    """
+    Splits parallel `months` / `categories` (None: all DEFAULT_CATEGORY)
+    into one group per tariff in force: [(tariff, row indices), ...].
+    Each row gets a (month, category) code, every distinct code is looked up
+    once, and a row's tariff is then a table lookup, so mixing categories
+    in a batch costs about as little as billing one. A batch that needs a
+    single tariff comes back as [(tariff, slice(None))].
+    """
+    month_keys, month_codes = _factorize(months)
+    if categories is None:
+        category_keys, category_codes = [DEFAULT_CATEGORY], 0
+    else:
+        category_keys, category_codes = _factorize(categories)
+
+    tariff_index = {}
+    code_tariff = np.empty(len(category_keys) * len(month_keys), dtype=np.intp)
+    for c, category in enumerate(category_keys):
+        for m, month in enumerate(month_keys):
+            tariff = tariff_for_month(month, category)
+            code_tariff[c * len(month_keys) + m] = tariff_index.setdefault(tariff, len(tariff_index))
+    if len(tariff_index) <= 1:
+        return [(next(iter(tariff_index), None), slice(None))]
+
+    row_tariff = code_tariff[category_codes * len(month_keys) + month_codes]
+    return [(tariff, np.flatnonzero(row_tariff == i)) for tariff, i in tariff_index.items()]
+
+def calculate_bills_for_months(kwh_units, months, categories=None):
+    """
+    billing.calculate_bills() with each reading billed by the tariff in force
+    for its own month and tariff category. `kwh_units`, `months` and
+    `categories` are parallel sequences (categories None: all
+    DEFAULT_CATEGORY). Readings are grouped by tariff (tariff_groups), so each
+    tariff is applied in one pass.
+    """
+    kwh = np.asarray(kwh_units, dtype=np.float64)
+    groups = tariff_groups(months, categories)
+
+    if len(groups) == 1:
+        return billing.calculate_bills(kwh, groups[0][0])
+
+    bills = {}
+    for tariff, rows in groups:
+        for key, values in tariff.bills(kwh[rows]).items():
+            if key not in bills:
+                bills[key] = np.empty_like(kwh)
+            bills[key][rows] = values
+    return bills
+
+def calculate_bills_paise_for_months(kwh_units, months, categories=None):
+    """billing.calculate_bills_paise() with each reading billed by its own month's and category's tariff."""
+    kwh = np.asarray(kwh_units, dtype=np.float64)
+    groups = tariff_groups(months, categories)
+
+    if len(groups) == 1:
+        return billing.calculate_bills_paise(kwh, groups[0][0])
+
+    totals = np.empty(len(kwh), dtype=np.int64)
+    for tariff, rows in groups:
+        totals[rows] = tariff.bills_paise(kwh[rows])
+    return totals
@@ -7,17 +7,56 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime
 import os 
 import bcrypt
-import csv
 
-from database import db_query, db_query_to_df, log_action
-from billing import calculate_mahadiscom_bill
+from database import db_query_to_df, log_action, transaction
+import async_db
+import importer
+import invoices
+import jobs
+import queries
+import tariffs
+from billing import calculate_bill_paise, is_meter_reading, paise_to_rupees
 from views.dialogs import ChangePasswordDialog, ResetPasswordDialog, UpdateUserDialog
 
+# --- Background job bodies (run on a jobs.py thread: no widgets here) ---
+
+def import_csv_job(job, filename, admin_name):
+    """Imports a consumption CSV; returns importer's summary. A cancel stops after the current chunk."""
+    last = {}
+
+    def progress(summary):
+        last.update(summary)
+        job.report(summary['bytes_read'], summary['bytes_total'], f"{summary['rows']:,} rows")
+
+    try:
+        summary = importer.import_consumption_csv(filename, progress=progress)
+    except jobs.JobCancelled:
+        log_action(admin_name, f"Cancelled CSV import after {last.get('rows', 0)} rows: "
+                               f"{last.get('added', 0)} added, {last.get('updated', 0)} updated, {last.get('failed', 0)} failed.")
+        raise
+    log_action(admin_name, f"Imported CSV: {summary['added']} added, {summary['updated']} updated, {summary['failed']} failed.")
+    return summary
+
+def export_query_to_excel(job, name, filename, admin_name, log_message):
+    """Writes catalog query `name` to an Excel file, reading it in chunks; returns the row count."""
+    frames = []
+    rows = 0
+    for chunk in queries.fetch_chunks(name):
+        rows += len(chunk)
+        frames.append(pd.DataFrame(chunk, columns=chunk[0].keys()))
+        job.report(rows, None, f"{rows:,} rows read")
+    df = pd.concat(frames, ignore_index=True) if frames else queries.fetch_df(name)
+    job.report(rows, None, f"writing {rows:,} rows")
+    df.to_excel(filename, index=False, engine='openpyxl')
+    log_action(admin_name, log_message)
+    return rows
+
 class AdminView(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
         
+        self._refresh_future = None
         self.pie_fig = None
         self.pie_canvas = None
         self.line_fig = None
@@ -39,6 +78,18 @@ class AdminView(ctk.CTkFrame):
         
         self.welcome_label = ctk.CTkLabel(self, text="Admin Dashboard", font=font_bold)
         self.welcome_label.place(relx=0.02, rely=0.02, anchor="nw")
+
+        # Progress of the running background job (imports / exports); shown only while one runs
+        self.job = None
+        self.job_title = ""
+        self.job_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.job_label = ctk.CTkLabel(self.job_frame, text="", font=font_normal, width=200, anchor="e")
+        self.job_label.pack(side="left", padx=5)
+        self.job_progress = ctk.CTkProgressBar(self.job_frame, width=160)
+        self.job_progress.pack(side="left", padx=5)
+        self.job_cancel_button = ctk.CTkButton(self.job_frame, text="✖ Cancel", width=80, font=font_normal,
+                                               fg_color="#D8000C", hover_color="#B0000A", command=self.cancel_job)
+        self.job_cancel_button.pack(side="left", padx=5)
         
         self.tab_view = ctk.CTkTabview(self)
         self.tab_view.place(relx=0.5, rely=0.53, relwidth=0.98, relheight=0.88, anchor="center") 
@@ -82,6 +133,9 @@ class AdminView(ctk.CTkFrame):
         self.role_menu = ctk.CTkOptionMenu(add_frame, values=["client", "admin"], width=90, font=font_normal)
         self.role_menu.set("client")
         self.role_menu.pack(side="left", padx=5)
+        self.tariff_category_menu = ctk.CTkOptionMenu(add_frame, values=list(tariffs.CATEGORIES), width=100, font=font_normal)
+        self.tariff_category_menu.set(tariffs.DEFAULT_CATEGORY)
+        self.tariff_category_menu.pack(side="left", padx=5)
         add_button = ctk.CTkButton(add_frame, text="👤 Add User", width=100, command=self.add_user, font=font_normal)
         add_button.pack(side="left", padx=10)
         
@@ -247,6 +301,11 @@ class AdminView(ctk.CTkFrame):
                                                       font=font_normal, width=120,
                                                       command=self.export_admin_bill_to_txt)
         self.export_admin_bill_button.pack(side="left", padx=(5, 5))
+
+        self.issue_bills_button = ctk.CTkButton(top_bill_frame, text="🧾 Issue Month's Bills",
+                                                font=font_normal, width=140,
+                                                command=self.issue_month_bills)
+        self.issue_bills_button.pack(side="left", padx=(5, 5))
         
         bill_display_frame = ctk.CTkFrame(tab, fg_color="transparent")
         bill_display_frame.pack(side="top", fill="both", expand=True, padx=10, pady=10)
@@ -405,17 +464,21 @@ class AdminView(ctk.CTkFrame):
         username = self.user_user_entry.get()
         password = self.user_pass_entry.get()
         role = self.role_menu.get() 
+        category = self.tariff_category_menu.get() if role == 'client' else tariffs.DEFAULT_CATEGORY
         if not name or not username or not password:
             messagebox.showerror("Error", "All fields are required.")
             return
         
         try:
             hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            db_query(
-                "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
-                (username, hashed_password, role, name)
-            )
-            log_action(self.controller.current_user_name, f"Added new user: '{username}' (Role: {role}).")
+            with transaction():
+                user_id = queries.execute_lastrowid(
+                    'user_insert',
+                    (username, hashed_password, role, name)
+                )
+                if category != tariffs.DEFAULT_CATEGORY:
+                    tariffs.set_user_category(user_id, category)
+            log_action(self.controller.current_user_name, f"Added new user: '{username}' (Role: {role}, Tariff: {category}).")
             messagebox.showinfo("Success", f"User '{username}' added as {role}.")
             self.user_name_entry.delete(0, 'end')
             self.user_user_entry.delete(0, 'end')
@@ -439,7 +502,7 @@ class AdminView(ctk.CTkFrame):
             return
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to remove '{client_name}'? This will also delete all their consumption data."):
             try:
-                db_query("DELETE FROM users WHERE id = ?", (client_id,))
+                queries.execute('user_delete', (client_id,))
                 log_action(self.controller.current_user_name, f"Removed user: '{client_name}' (ID: {client_id}).")
                 messagebox.showinfo("Success", f"User '{client_name}' removed.")
                 self.refresh_data()
@@ -480,43 +543,40 @@ class AdminView(ctk.CTkFrame):
             self.reset_pass_dialog.grab_set()
 
     def export_users_to_excel(self):
-        try:
-            df = db_query_to_df("SELECT id, username, full_name, role FROM users")
-            filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                      filetypes=[("Excel files", "*.xlsx")],
-                                                      title="Save User List As")
-            if not filename:
-                return
-            
-            df.to_excel(filename, index=False, engine='openpyxl')
-            log_action(self.controller.current_user_name, "Exported user list to Excel.")
+        filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                  filetypes=[("Excel files", "*.xlsx")],
+                                                  title="Save User List As")
+        if not filename:
+            return
+
+        def done(rows):
             messagebox.showinfo("Success", f"User list exported successfully to:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"An error occurred: {e}")
+            self.refresh_log_tab()
+
+        self.start_job("Exporting users", export_query_to_excel, 'users_all', filename,
+                       self.controller.current_user_name, "Exported user list to Excel.",
+                       on_done=done, error_title="Export Error")
 
     def upsert_consumption(self, client_id, db_month, usage_float):
         try:
-            bill_data, _ = calculate_mahadiscom_bill(usage_float)
-            total_bill = bill_data['F_Total_Bill']
+            total_paise = calculate_bill_paise(usage_float, tariffs.tariff_for_user(client_id, db_month))
+            total_bill = paise_to_rupees(total_paise)
             
-            find_query = "SELECT id FROM consumption WHERE user_id = ? AND month = ?"
-            existing_record = db_query_to_df(find_query, params=(client_id, db_month))
+            record_id = queries.fetch_scalar('consumption_id_for_month', (client_id, db_month))
             
-            if not existing_record.empty:
-                record_id = existing_record.iloc[0]['id']
-                update_query = "UPDATE consumption SET usage_kwh = ?, total_bill = ?, bill_status = 'Pending', payment_timestamp = NULL WHERE id = ?"
-                db_query(update_query, params=(usage_float, total_bill, record_id))
+            if record_id is not None:
+                queries.execute('consumption_update', (usage_float, total_paise, total_bill, record_id))
+                invoices.reissue_if_issued(client_id, db_month)
                 return "Updated"
             else:
-                insert_query = "INSERT INTO consumption (user_id, month, usage_kwh, total_bill, bill_status) VALUES (?, ?, ?, ?, 'Pending')"
-                db_query(insert_query, params=(client_id, db_month, usage_float, total_bill))
+                queries.execute('consumption_insert', (client_id, db_month, usage_float, total_paise, total_bill))
                 return "Added"
         except sqlite3.IntegrityError:
             try:
-                bill_data, _ = calculate_mahadiscom_bill(usage_float)
-                total_bill = bill_data['F_Total_Bill']
-                update_query = "UPDATE consumption SET usage_kwh = ?, total_bill = ?, bill_status = 'Pending', payment_timestamp = NULL WHERE user_id = ? AND month = ?"
-                db_query(update_query, params=(usage_float, total_bill, client_id, db_month))
+                total_paise = calculate_bill_paise(usage_float, tariffs.tariff_for_user(client_id, db_month))
+                total_bill = paise_to_rupees(total_paise)
+                queries.execute('consumption_update_for_month', (usage_float, total_paise, total_bill, client_id, db_month))
+                invoices.reissue_if_issued(client_id, db_month)
                 return "Updated"
             except Exception as e:
                  raise Exception(f"Failed to update after integrity error: {e}")
@@ -540,6 +600,9 @@ class AdminView(ctk.CTkFrame):
         except ValueError:
             messagebox.showerror("Error", "Usage must be a valid number (e.g., 150.5).")
             return
+        if not is_meter_reading(usage_float):
+            messagebox.showerror("Error", "Usage can have at most 2 decimal places (e.g., 150.25).")
+            return
         if not (year.isdigit() and len(year) == 4):
             messagebox.showerror("Error", "Year must be a 4-digit number (e.g., 2025).")
             return
@@ -548,9 +611,9 @@ class AdminView(ctk.CTkFrame):
             client_id = self.client_map[selected_client_name]
             db_month = f"{year}-{month}"
             
-            action = self.upsert_consumption(client_id, db_month, usage_float)
-            
-            log_action(self.controller.current_user_name, f"{action} usage for '{selected_client_name}' ({db_month}) to {usage_float} kWh.")
+            with transaction():
+                action = self.upsert_consumption(client_id, db_month, usage_float)
+                log_action(self.controller.current_user_name, f"{action} usage for '{selected_client_name}' ({db_month}) to {usage_float} kWh.")
             messagebox.showinfo("Success", f"Usage {action.lower()} for {selected_client_name} for month {db_month}.")
             
             self.usage_entry.delete(0, 'end')
@@ -572,7 +635,7 @@ class AdminView(ctk.CTkFrame):
 
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete the record for {client_name} for month {record_month}?"):
             try:
-                db_query("DELETE FROM consumption WHERE id = ?", (record_id,))
+                queries.execute('consumption_delete', (record_id,))
                 log_action(self.controller.current_user_name, f"Deleted usage record for {client_name} (Month: {record_month}, ID: {record_id}).")
                 messagebox.showinfo("Success", "Usage record deleted.")
                 self.refresh_data() 
@@ -585,55 +648,99 @@ class AdminView(ctk.CTkFrame):
         if not filename:
             return
             
-        added_count = 0
-        updated_count = 0
-        failed_count = 0
-        
-        try:
-            with open(filename, mode='r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                
-                for row in reader:
-                    try:
-                        user_id = int(row['user_id'])
-                        month = row['month']
-                        usage_kwh = float(row['usage_kwh'])
-                        
-                        action = self.upsert_consumption(user_id, month, usage_kwh)
-                        if action == "Added":
-                            added_count += 1
-                        else:
-                            updated_count += 1
-                    except Exception as e:
-                        print(f"Failed to process row: {row}. Error: {e}")
-                        failed_count += 1
-                        
-            log_action(self.controller.current_user_name, f"Imported CSV: {added_count} added, {updated_count} updated, {failed_count} failed.")
-            messagebox.showinfo("Import Complete", f"Import successful.\n\nAdded: {added_count}\nUpdated: {updated_count}\nFailed: {failed_count}")
-            self.refresh_data()
-            
-        except Exception as e:
-            messagebox.showerror("Import Error", f"An error occurred during import: {e}")
+        def done(summary):
+            for row_number, reason in summary['errors']:
+                print(f"Failed to process row {row_number}: {reason}")
+            resumed = ("" if summary['resumed_at_row'] is None
+                       else f"\n\nResumed an interrupted import of this file at row {summary['resumed_at_row']}.")
+            rejected = "" if not summary['error_file'] else f"\n\nRejected rows and reasons:\n{summary['error_file']}"
+            messagebox.showinfo("Import Complete", f"Import successful.\n\nAdded: {summary['added']}\nUpdated: {summary['updated']}\nFailed: {summary['failed']}"
+                                                   f"\n\n{summary['rows_per_second']:,.0f} rows/s{resumed}{rejected}")
+            self.refresh_after_import()
+
+        def cancelled():
+            messagebox.showinfo("Import Cancelled", "The import was stopped. Rows imported so far are kept; "
+                                                    "import the same file again to continue where it stopped.")
+            self.refresh_after_import()
+
+        self.start_job("Importing CSV", import_csv_job, filename, self.controller.current_user_name,
+                       on_done=done, on_cancel=cancelled, error_title="Import Error",
+                       on_error=lambda e: self.refresh_after_import())
 
     def export_consumption_to_excel(self):
-        try:
-            df = db_query_to_df("""
-                SELECT c.id, u.full_name, c.month, c.usage_kwh, c.total_bill, c.bill_status
-                FROM consumption c
-                JOIN users u ON c.user_id = u.id
-                ORDER BY u.full_name, c.month
-            """)
-            filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                      filetypes=[("Excel files", "*.xlsx")],
-                                                      title="Save Consumption Data As")
-            if not filename:
-                return
-            
-            df.to_excel(filename, index=False, engine='openpyxl')
-            log_action(self.controller.current_user_name, "Exported consumption list to Excel.")
+        filename = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                  filetypes=[("Excel files", "*.xlsx")],
+                                                  title="Save Consumption Data As")
+        if not filename:
+            return
+
+        def done(rows):
             messagebox.showinfo("Success", f"Consumption data exported successfully to:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"An error occurred: {e}")
+            self.refresh_log_tab()
+
+        self.start_job("Exporting consumption", export_query_to_excel, 'consumption_export', filename,
+                       self.controller.current_user_name, "Exported consumption list to Excel.",
+                       on_done=done, error_title="Export Error")
+
+    # --- Background jobs ---
+    def start_job(self, title, func, *args, on_done, on_cancel=None, on_error=None, error_title="Error"):
+        """
+        Runs func(job, *args) with jobs.start(), showing the progress bar and
+        Cancel button while it runs. One job at a time. on_error(exception),
+        if given, runs after the error message box.
+        """
+        if self.job is not None:
+            messagebox.showinfo("Please Wait", f"{self.job_title} is still running. Wait for it to finish or cancel it first.")
+            return
+
+        def finished(callback, *result):
+            self.job = None
+            self.job_progress.stop()
+            self.job_frame.place_forget()
+            if callback is not None:
+                callback(*result)
+
+        def failed(error):
+            finished(None)
+            messagebox.showerror(error_title, f"An error occurred: {error}")
+            if on_error is not None:
+                on_error(error)
+
+        self.job_title = title
+        self.job_label.configure(text=f"{title}...")
+        self.job_cancel_button.configure(state="normal")
+        self.job_progress.configure(mode="indeterminate")
+        self.job_progress.start()
+        self.job_frame.place(relx=0.5, rely=0.02, anchor="n")
+        self.job = jobs.start(self, func, *args, on_progress=self.show_job_progress,
+                              on_done=lambda result: finished(on_done, result),
+                              on_cancel=lambda: finished(on_cancel), on_error=failed)
+
+    def show_job_progress(self, done, total, message):
+        if self.job is None or self.job.cancelled:
+            return
+        if total:
+            if self.job_progress.cget("mode") != "determinate":
+                self.job_progress.stop()
+                self.job_progress.configure(mode="determinate")
+            self.job_progress.set(done / total)
+        self.job_label.configure(text=f"{self.job_title}: {message}")
+
+    def cancel_job(self):
+        if self.job is None:
+            return
+        self.job.cancel()
+        self.job_cancel_button.configure(state="disabled")
+        self.job_label.configure(text=f"{self.job_title}: cancelling...")
+
+    def refresh_after_import(self):
+        """Repaints only what a consumption import changes: readings, usage totals, charts and the log."""
+        if not self.controller.current_user_id:
+            return
+        self.refresh_consumption_data()
+        self.refresh_user_list()
+        self.update_charts()
+        self.refresh_log_tab()
 
     def show_admin_bill_popup(self):
         bill_text = self.admin_bill_textbox.get("1.0", "end-1c")
@@ -674,6 +781,22 @@ class AdminView(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror("Export Error", f"An error occurred: {e}")
 
+    def issue_month_bills(self):
+        month = self.bill_month_menu.get()
+        if month in ["Select Client First", "No Data"]:
+            messagebox.showerror("Error", "Please select a client and a month first.")
+            return
+        if not messagebox.askyesno("Confirm Issue", f"Issue the bills for every client with a reading in {month}?\n\n"
+                                   "Issued bills keep their amounts even if the tariff changes later."):
+            return
+        try:
+            issued = invoices.issue_month(month)
+            log_action(self.controller.current_user_name, f"Issued {issued} bills for {month}.")
+            messagebox.showinfo("Success", f"Issued {issued} new bill(s) for {month}.")
+            self.display_admin_bill_preview(month)
+        except Exception as e:
+            messagebox.showerror("Error", f"An error occurred while issuing bills: {e}")
+
     def display_admin_bill_preview(self, selected_month):
         self.admin_bill_textbox.configure(state="normal")
         self.admin_bill_textbox.delete("1.0", "end")
@@ -685,13 +808,10 @@ class AdminView(ctk.CTkFrame):
                 return
                 
             client_id = self.client_map[selected_client_name]
-            usage_df = db_query_to_df("SELECT usage_kwh FROM consumption WHERE user_id = ? AND month = ?", 
-                                      params=(client_id, selected_month))
-            if usage_df.empty:
+            bill_text = self.controller.generate_bill_text(client_id, selected_month, selected_client_name)
+            if bill_text is None:
                 self.admin_bill_textbox.insert("1.0", f"No consumption data found for {selected_client_name} for {selected_month}.")
             else:
-                kwh_units = usage_df['usage_kwh'].iloc[0]
-                bill_text = self.controller.generate_bill_text(kwh_units, selected_month, selected_client_name)
                 self.admin_bill_textbox.insert("1.0", bill_text)
         except Exception as e:
             self.admin_bill_textbox.insert("1.0", f"An error occurred: {e}")
@@ -702,7 +822,7 @@ class AdminView(ctk.CTkFrame):
         self.admin_bill_textbox.delete("1.0", "end")
         if selected_client_name in self.client_map:
             client_id = self.client_map[selected_client_name]
-            data_df = db_query_to_df("SELECT month FROM consumption WHERE user_id = ? ORDER BY month DESC", params=(client_id,))
+            data_df = queries.fetch_df('consumption_months', params=(client_id,))
             available_months = list(data_df['month'])
             if not available_months:
                 available_months = ["No Data"]
@@ -719,14 +839,11 @@ class AdminView(ctk.CTkFrame):
         self.admin_bill_textbox.configure(state="disabled")
 
     def refresh_pie_chart(self):
+        self.paint_pie_chart(queries.fetch_df('usage_by_client'))
+
+    def paint_pie_chart(self, df):
         if self.pie_canvas:
             self.pie_canvas.get_tk_widget().destroy()
-        query = """
-        SELECT u.full_name, SUM(c.usage_kwh) as total_usage
-        FROM consumption c JOIN users u ON c.user_id = u.id
-        WHERE u.role = 'client' GROUP BY u.full_name
-        """
-        df = db_query_to_df(query)
         self.pie_fig = plt.Figure(figsize=(5, 4), dpi=100)
         self.pie_fig.set_facecolor(plt.rcParams['figure.facecolor'])
         ax = self.pie_fig.add_subplot(111)
@@ -743,10 +860,11 @@ class AdminView(ctk.CTkFrame):
         self.pie_canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
             
     def refresh_admin_line_graph(self):
+        self.paint_admin_line_graph(queries.fetch_df('usage_by_month'))
+
+    def paint_admin_line_graph(self, df):
         if self.line_canvas:
             self.line_canvas.get_tk_widget().destroy()
-        query = "SELECT month, SUM(usage_kwh) as total_usage FROM consumption GROUP BY month ORDER BY month"
-        df = db_query_to_df(query)
         self.line_fig = plt.Figure(figsize=(5, 4), dpi=100)
         self.line_fig.set_facecolor(plt.rcParams['figure.facecolor'])
         ax = self.line_fig.add_subplot(111)
@@ -780,7 +898,7 @@ class AdminView(ctk.CTkFrame):
                 widget.destroy()
         self.client_checkbox_widgets = [] 
         
-        clients_df = db_query_to_df("SELECT id, full_name FROM users WHERE role = 'client' ORDER BY full_name")
+        clients_df = queries.fetch_df('clients_by_name')
         for index, row in clients_df.iterrows():
             client_id = row['id']
             client_name = row['full_name']
@@ -816,8 +934,7 @@ class AdminView(ctk.CTkFrame):
             client_data = {}
             
             for i, client_id in enumerate(selected_client_ids):
-                query = "SELECT month, usage_kwh, u.full_name FROM consumption c JOIN users u ON c.user_id = u.id WHERE c.user_id = ? ORDER BY month"
-                df = db_query_to_df(query, params=(client_id,))
+                df = queries.fetch_df('consumption_compare', (client_id,))
                 
                 if not df.empty:
                     color = colors[i % len(colors)]
@@ -860,9 +977,9 @@ class AdminView(ctk.CTkFrame):
         self.sort_user_table("total_usage")
             
     def refresh_user_list(self):
-        for item in self.user_tree.get_children():
-            self.user_tree.delete(item)
-        
+        self.paint_user_list(db_query_to_df(*self.user_list_query()))
+
+    def user_list_query(self):
         search_term = self.user_search_entry.get()
         base_query = """
             SELECT u.id, u.username, u.full_name, u.role, COALESCE(SUM(c.usage_kwh), 0) as total_usage
@@ -885,8 +1002,11 @@ class AdminView(ctk.CTkFrame):
             base_query += f" ORDER BY total_usage {sort_direction}"
         else:
             base_query += f" ORDER BY {sort_column} {sort_direction}"
+        return base_query, params
 
-        users_df = db_query_to_df(base_query, params=params)
+    def paint_user_list(self, users_df):
+        for item in self.user_tree.get_children():
+            self.user_tree.delete(item)
         for index, user in users_df.iterrows():
             user_tuple = (
                 user['id'], 
@@ -898,7 +1018,7 @@ class AdminView(ctk.CTkFrame):
             self.user_tree.insert("", "end", values=user_tuple)
             
     def refresh_consumption_data(self):
-        clients_df = db_query_to_df("SELECT id, full_name FROM users WHERE role = 'client' ORDER BY full_name")
+        clients_df = queries.fetch_df('clients_by_name')
         self.client_map = {name: uid for uid, name in clients_df.values} 
         client_names = ["Select Client"] + list(self.client_map.keys())
         current_selection = self.client_select_menu.get()
@@ -912,8 +1032,7 @@ class AdminView(ctk.CTkFrame):
                 self.client_select_menu.set(client_names[0])
                 
         self.load_client_consumption(self.client_select_menu.get())
-        total_df = db_query_to_df("SELECT SUM(usage_kwh) as total FROM consumption")
-        total_usage = total_df['total'].iloc[0] if total_df['total'].iloc[0] else 0.0
+        total_usage = queries.fetch_scalar('usage_total', default=0.0)
         self.total_label.configure(text=f"Total All Consumption: {total_usage:.2f} kWh")
 
     def search_consumption(self):
@@ -930,21 +1049,15 @@ class AdminView(ctk.CTkFrame):
         if selected_client_name in self.client_map:
             client_id = self.client_map[selected_client_name]
             
-            query = "SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ?"
-            params = [client_id]
-            
             if search_term:
-                query += " AND month LIKE ?"
-                params.append(f"%{search_term}%")
-                
-            query += " ORDER BY month DESC"
-            
-            data_df = db_query_to_df(query, params=params)
+                data_df = queries.fetch_df('consumption_history_search', (client_id, f"%{search_term}%"))
+            else:
+                data_df = queries.fetch_df('consumption_history', (client_id,))
             
             if data_df.empty:
                 self.consumption_stats_label.configure(text="Total: 0 kWh | Avg: 0 kWh/month")
             else:
-                full_data_df = db_query_to_df("SELECT usage_kwh FROM consumption WHERE user_id = ?", params=(client_id,))
+                full_data_df = queries.fetch_df('consumption_usage', params=(client_id,))
                 total_usage = full_data_df['usage_kwh'].sum()
                 avg_usage = full_data_df['usage_kwh'].mean()
                 self.consumption_stats_label.configure(text=f"Total: {total_usage:.2f} kWh | Avg: {avg_usage:.2f} kWh/month")
@@ -966,7 +1079,7 @@ class AdminView(ctk.CTkFrame):
             self.consumption_stats_label.configure(text="Total: 0 kWh | Avg: 0 kWh/month")
     
     def refresh_admin_billing_tab_clients(self):
-        clients_df = db_query_to_df("SELECT id, full_name FROM users WHERE role = 'client' ORDER BY full_name")
+        clients_df = queries.fetch_df('clients_by_name')
         self.client_map = {name: uid for uid, name in clients_df.values}
         client_names = ["Select Client"] + list(self.client_map.keys())
         
@@ -976,51 +1089,49 @@ class AdminView(ctk.CTkFrame):
         self.bill_month_menu.set("Select Client First")
 
     def refresh_log_tab(self):
-        for item in self.log_tree.get_children():
-            self.log_tree.delete(item)
-        
-        users_df = db_query_to_df("SELECT username FROM users ORDER BY username")
+        users_df = queries.fetch_df('usernames')
+        self.update_log_user_filter(users_df)
+        self.paint_log_tab(queries.fetch_df(*self.log_query(self.log_user_filter.get())))
+
+    def update_log_user_filter(self, users_df):
+        """Refreshes the user dropdown; returns False if the selected user has gone."""
         user_list = ["All Users"] + list(users_df['username'])
         
         current_selection = self.log_user_filter.get()
         self.log_user_filter.configure(values=user_list)
         if current_selection in user_list:
             self.log_user_filter.set(current_selection)
-        else:
-            self.log_user_filter.set("All Users")
-        
-        selected_user = self.log_user_filter.get()
-        
-        base_query = "SELECT timestamp, actor, action FROM action_log"
-        params = []
-        
+            return True
+        self.log_user_filter.set("All Users")
+        return False
+
+    def log_query(self, selected_user):
+        """(catalog name, params) for the action log under the given user filter."""
         if selected_user and selected_user != "All Users":
-            base_query += " WHERE actor = ?"
-            params.append(selected_user)
-            
-        base_query += " ORDER BY id DESC LIMIT 200"
-        
-        log_df = db_query_to_df(base_query, params=params)
+            return 'action_log_recent_by_actor', (selected_user,)
+        return 'action_log_recent', ()
+
+    def paint_log_tab(self, log_df):
+        for item in self.log_tree.get_children():
+            self.log_tree.delete(item)
         for index, log_entry in log_df.iterrows():
             self.log_tree.insert("", "end", values=tuple(log_entry))
     
     def refresh_grievance_list(self, filter_status=None):
-        for item in self.grievance_tree.get_children():
-            self.grievance_tree.delete(item)
-            
+        self.paint_grievance_list(queries.fetch_df(*self.grievance_list_query(filter_status)))
+
+    def grievance_list_query(self, filter_status=None):
+        """(catalog name, params) for the ticket list under the given status filter."""
         if filter_status is None:
             filter_status = self.grievance_status_filter.get()
             
-        base_query = "SELECT token, created_at, username, subject, status, id FROM grievance_tickets"
-        params = []
-        
         if filter_status != "All":
-            base_query += " WHERE status = ?"
-            params.append(filter_status)
-            
-        base_query += " ORDER BY updated_at DESC"
-        
-        grievances_df = db_query_to_df(base_query, params=params)
+            return 'tickets_by_status', (filter_status,)
+        return 'tickets_all', ()
+
+    def paint_grievance_list(self, grievances_df):
+        for item in self.grievance_tree.get_children():
+            self.grievance_tree.delete(item)
         for index, row in grievances_df.iterrows():
             self.grievance_tree.insert("", "end", values=(row['token'], row['created_at'], row['username'], row['subject'], row['status']), iid=row['id'])
         
@@ -1043,7 +1154,7 @@ class AdminView(ctk.CTkFrame):
         self.grievance_chat_box.configure(state="normal")
         self.grievance_chat_box.delete("1.0", "end")
         
-        messages_df = db_query_to_df("SELECT sender_name, timestamp, message FROM grievance_messages WHERE ticket_id = ? ORDER BY timestamp ASC",
+        messages_df = queries.fetch_df('ticket_messages',
                                      params=(selected_item_id,))
         
         if messages_df.empty:
@@ -1075,12 +1186,13 @@ class AdminView(ctk.CTkFrame):
             sender_name = self.controller.current_user_name
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                     (selected_item_id, sender_id, sender_name, reply_text, timestamp))
-            
-            db_query("UPDATE grievance_tickets SET status = 'Answered', updated_at = ? WHERE id = ?", (timestamp, selected_item_id))
-            
-            log_action(sender_name, f"Replied to grievance ticket ID {selected_item_id}.")
+            with transaction():
+                queries.execute('ticket_message_insert',
+                         (selected_item_id, sender_id, sender_name, reply_text, timestamp))
+                
+                queries.execute('ticket_set_status', ('Answered', timestamp, selected_item_id))
+                
+                log_action(sender_name, f"Replied to grievance ticket ID {selected_item_id}.")
             self.grievance_reply_entry.delete("1.0", "end")
             self.load_grievance_messages(None)
             self.refresh_grievance_list()
@@ -1104,8 +1216,9 @@ class AdminView(ctk.CTkFrame):
             
         if messagebox.askyesno("Confirm", f"Are you sure you want to mark ticket {token} as 'Resolved'?"):
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            db_query("UPDATE grievance_tickets SET status = 'Resolved', updated_at = ? WHERE id = ?", (timestamp, selected_item_id))
-            log_action(self.controller.current_user_name, f"Resolved grievance token {token}.")
+            with transaction():
+                queries.execute('ticket_set_status', ('Resolved', timestamp, selected_item_id))
+                log_action(self.controller.current_user_name, f"Resolved grievance token {token}.")
             self.refresh_grievance_list()
     
     def update_charts(self):
@@ -1118,12 +1231,40 @@ class AdminView(ctk.CTkFrame):
         if not self.controller.current_user_id:
              return
         self.welcome_label.configure(text=f"Welcome, {self.controller.current_user_name} (Admin)")
-        self.refresh_user_list() 
         self.refresh_consumption_data() 
         self.refresh_admin_billing_tab_clients() 
-        self.update_charts() 
-        self.refresh_log_tab()
-        self.refresh_grievance_list()
+        self.refresh_compare_client_list()
+        self.refresh_compare_graph()
+
+        # The heavier tabs query in the background, side by side, and are
+        # painted when all of their data has arrived.
+        if self._refresh_future is not None:
+            self._refresh_future.cancel()
+        loads = async_db.gather(
+            async_db.fetch_df(*self.user_list_query()),
+            async_db.fetch_named_df('usage_by_client'),
+            async_db.fetch_named_df('usage_by_month'),
+            async_db.fetch_named_df('usernames'),
+            async_db.fetch_named_df(*self.log_query(self.log_user_filter.get())),
+            async_db.fetch_named_df(*self.grievance_list_query()),
+        )
+        self._refresh_future = async_db.run_in_tk(self, loads, self.paint_refreshed_data)
+
+    def paint_refreshed_data(self, results):
+        users_df, pie_df, line_df, log_users_df, log_df, grievances_df = results
+        self._refresh_future = None
+        if not self.controller.current_user_id:
+            # Logged out while the data was loading
+            return
+        self.paint_user_list(users_df)
+        self.paint_pie_chart(pie_df)
+        self.paint_admin_line_graph(line_df)
+        if self.update_log_user_filter(log_users_df):
+            self.paint_log_tab(log_df)
+        else:
+            # The filtered user no longer exists; reload with "All Users"
+            self.paint_log_tab(queries.fetch_df(*self.log_query("All Users")))
+        self.paint_grievance_list(grievances_df)
 
 class ClientView(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -1295,17 +1436,12 @@ class ClientView(ctk.CTkFrame):
             token = f"T-{random.randint(100000, 999999)}"
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            ticket_id = db_query_lastrowid("INSERT INTO grievance_tickets (token, user_id, username, subject, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'Pending', ?, ?)",
-                                          (token, user_id, username, subject, timestamp, timestamp))
-            
-            if ticket_id is None:
-                messagebox.showerror("Error", "Failed to create grievance ticket.")
-                return
-
-            db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                     (ticket_id, user_id, username, body, timestamp))
-                     
-            log_action(username, f"Submitted new grievance (Token: {token}).")
+            with transaction():
+                ticket_id = queries.execute_lastrowid('ticket_insert',
+                                              (token, user_id, username, subject, timestamp, timestamp))
+                queries.execute('ticket_message_insert',
+                         (ticket_id, user_id, username, body, timestamp))
+                log_action(username, f"Submitted new grievance (Token: {token}).")
             messagebox.showinfo("Success", f"Your grievance has been submitted successfully.\n\nYour Token ID is: {token}\n\nAn admin will review it shortly.")
             
             self.grievance_subject_entry.delete(0, 'end')
@@ -1327,7 +1463,7 @@ class ClientView(ctk.CTkFrame):
         if not user_id:
             return
             
-        tickets_df = db_query_to_df("SELECT token, created_at, subject, status, id FROM grievance_tickets WHERE user_id = ? ORDER BY updated_at DESC", 
+        tickets_df = queries.fetch_df('tickets_for_user', 
                                   params=(user_id,))
         
         for index, row in tickets_df.iterrows():
@@ -1353,7 +1489,7 @@ class ClientView(ctk.CTkFrame):
         user_id = self.controller.current_user_id
         if not user_id: return
         
-        data_df = db_query_to_df("SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ? ORDER BY month DESC", params=(user_id,))
+        data_df = queries.fetch_df('consumption_history', params=(user_id,))
         
         if data_df.empty:
             self.cons_tree.insert("", "end", values=("", "No consumption data found.", "", "", ""))
@@ -1396,9 +1532,9 @@ class ClientView(ctk.CTkFrame):
         if messagebox.askyesno("Confirm Payment", f"Do you want to pay ₹{bill_amount} for the bill from {bill_month}?"):
             try:
                 paid_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                db_query("UPDATE consumption SET bill_status = 'Paid', payment_timestamp = ? WHERE id = ?", (paid_timestamp, bill_id))
-                
-                log_action(self.controller.current_user_name, f"Paid bill for {bill_month} (ID: {bill_id}).")
+                with transaction():
+                    queries.execute('consumption_pay', (paid_timestamp, bill_id))
+                    log_action(self.controller.current_user_name, f"Paid bill for {bill_month} (ID: {bill_id}).")
                 messagebox.showinfo("Success", "Payment successful! The bill status has been updated.")
                 self.refresh_data()
             except Exception as e:
@@ -1455,14 +1591,12 @@ class ClientView(ctk.CTkFrame):
             self.client_bill_textbox.configure(state="disabled")
             return
             
-        data_df = db_query_to_df("SELECT usage_kwh FROM consumption WHERE user_id = ? AND month = ?", params=(user_id, selected_month))
+        user_name = self.controller.current_user_name
+        bill_text = self.controller.generate_bill_text(user_id, selected_month, user_name)
         
-        if data_df.empty:
+        if bill_text is None:
             self.client_bill_textbox.insert("1.0", f"Error: No data found for month {selected_month}.")
         else:
-            kwh_units = data_df['usage_kwh'].iloc[0]
-            user_name = self.controller.current_user_name
-            bill_text = self.controller.generate_bill_text(kwh_units, selected_month, user_name)
             self.client_bill_textbox.insert("1.0", bill_text)
             
         self.client_bill_textbox.configure(state="disabled")
@@ -1471,7 +1605,7 @@ class ClientView(ctk.CTkFrame):
         user_id = self.controller.current_user_id
         if not user_id: return
         
-        data_df = db_query_to_df("SELECT month FROM consumption WHERE user_id = ? ORDER BY month DESC", params=(user_id,))
+        data_df = queries.fetch_df('consumption_months', params=(user_id,))
         available_months = list(data_df['month'])
         
         if not available_months:
@@ -1490,8 +1624,7 @@ class ClientView(ctk.CTkFrame):
         user_id = self.controller.current_user_id
         if not user_id: return
 
-        query = "SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month"
-        df = db_query_to_df(query, params=(user_id,))
+        df = queries.fetch_df('consumption_by_month', (user_id,))
         
         self.line_fig = plt.Figure(figsize=(5, 4), dpi=100)
         self.line_fig.set_facecolor(plt.rcParams['figure.facecolor'])
@@ -6,7 +6,9 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime
 import random
 
-from database import db_query, db_query_to_df, db_query_lastrowid, log_action
+from database import log_action, transaction
+import async_db
+import queries
 from views.dialogs import ChangePasswordDialog
 
 class ClientView(ctk.CTkFrame):
@@ -14,6 +16,7 @@ class ClientView(ctk.CTkFrame):
         super().__init__(parent)
         self.controller = controller
         
+        self._refresh_future = None
         self.line_fig = None
         self.line_canvas = None
         
@@ -179,17 +182,12 @@ class ClientView(ctk.CTkFrame):
             token = f"T-{random.randint(100000, 999999)}"
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            ticket_id = db_query_lastrowid("INSERT INTO grievance_tickets (token, user_id, username, subject, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'Pending', ?, ?)",
-                                          (token, user_id, username, subject, timestamp, timestamp))
-            
-            if ticket_id is None:
-                messagebox.showerror("Error", "Failed to create grievance ticket.")
-                return
-
-            db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                     (ticket_id, user_id, username, body, timestamp))
-                     
-            log_action(username, f"Submitted new grievance (Token: {token}).")
+            with transaction():
+                ticket_id = queries.execute_lastrowid('ticket_insert',
+                                              (token, user_id, username, subject, timestamp, timestamp))
+                queries.execute('ticket_message_insert',
+                         (ticket_id, user_id, username, body, timestamp))
+                log_action(username, f"Submitted new grievance (Token: {token}).")
             messagebox.showinfo("Success", f"Your grievance has been submitted successfully.\n\nYour Token ID is: {token}\n\nAn admin will review it shortly.")
             
             self.grievance_subject_entry.delete(0, 'end')
@@ -204,16 +202,17 @@ class ClientView(ctk.CTkFrame):
         if not hasattr(self, 'ticket_tree'):
             return 
             
-        for item in self.ticket_tree.get_children():
-            self.ticket_tree.delete(item)
-            
         user_id = self.controller.current_user_id
         if not user_id:
+            for item in self.ticket_tree.get_children():
+                self.ticket_tree.delete(item)
             return
             
-        tickets_df = db_query_to_df("SELECT token, created_at, subject, status, id FROM grievance_tickets WHERE user_id = ? ORDER BY updated_at DESC", 
-                                  params=(user_id,))
-        
+        self.paint_grievance_list(queries.fetch_df('tickets_for_user', (user_id,)))
+
+    def paint_grievance_list(self, tickets_df):
+        for item in self.ticket_tree.get_children():
+            self.ticket_tree.delete(item)
         for index, row in tickets_df.iterrows():
             self.ticket_tree.insert("", "end", values=(row['token'], row['created_at'], row['subject'], row['status']), iid=row['id'])
 
@@ -232,12 +231,17 @@ class ClientView(ctk.CTkFrame):
         )
 
     def refresh_client_table(self):
-        for item in self.cons_tree.get_children():
-            self.cons_tree.delete(item)
         user_id = self.controller.current_user_id
-        if not user_id: return
+        if not user_id:
+            for item in self.cons_tree.get_children():
+                self.cons_tree.delete(item)
+            return
         
-        data_df = db_query_to_df("SELECT id, month, usage_kwh, total_bill, bill_status, payment_timestamp FROM consumption WHERE user_id = ? ORDER BY month DESC", params=(user_id,))
+        self.paint_client_table(queries.fetch_df('consumption_history', (user_id,)))
+
+    def paint_client_table(self, data_df):
+        for item in self.cons_tree.get_children():
+            self.cons_tree.delete(item)
         
         if data_df.empty:
             self.cons_tree.insert("", "end", values=("", "No consumption data found.", "", "", ""))
@@ -280,9 +284,9 @@ class ClientView(ctk.CTkFrame):
         if messagebox.askyesno("Confirm Payment", f"Do you want to pay ₹{bill_amount} for the bill from {bill_month}?"):
             try:
                 paid_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                db_query("UPDATE consumption SET bill_status = 'Paid', payment_timestamp = ? WHERE id = ?", (paid_timestamp, bill_id))
-                
-                log_action(self.controller.current_user_name, f"Paid bill for {bill_month} (ID: {bill_id}).")
+                with transaction():
+                    queries.execute('consumption_pay', (paid_timestamp, bill_id))
+                    log_action(self.controller.current_user_name, f"Paid bill for {bill_month} (ID: {bill_id}).")
                 messagebox.showinfo("Success", "Payment successful! The bill status has been updated.")
                 self.refresh_data()
             except Exception as e:
@@ -339,14 +343,12 @@ class ClientView(ctk.CTkFrame):
             self.client_bill_textbox.configure(state="disabled")
             return
             
-        data_df = db_query_to_df("SELECT usage_kwh FROM consumption WHERE user_id = ? AND month = ?", params=(user_id, selected_month))
+        user_name = self.controller.current_user_name
+        bill_text = self.controller.generate_bill_text(user_id, selected_month, user_name)
         
-        if data_df.empty:
+        if bill_text is None:
             self.client_bill_textbox.insert("1.0", f"Error: No data found for month {selected_month}.")
         else:
-            kwh_units = data_df['usage_kwh'].iloc[0]
-            user_name = self.controller.current_user_name
-            bill_text = self.controller.generate_bill_text(kwh_units, selected_month, user_name)
             self.client_bill_textbox.insert("1.0", bill_text)
             
         self.client_bill_textbox.configure(state="disabled")
@@ -355,7 +357,9 @@ class ClientView(ctk.CTkFrame):
         user_id = self.controller.current_user_id
         if not user_id: return
         
-        data_df = db_query_to_df("SELECT month FROM consumption WHERE user_id = ? ORDER BY month DESC", params=(user_id,))
+        self.paint_billing_tab(queries.fetch_df('consumption_months', (user_id,)))
+
+    def paint_billing_tab(self, data_df):
         available_months = list(data_df['month'])
         
         if not available_months:
@@ -368,14 +372,17 @@ class ClientView(ctk.CTkFrame):
             self.generate_client_bill_preview(available_months[0])
                 
     def refresh_client_line_graph(self):
-        if self.line_canvas:
-            self.line_canvas.get_tk_widget().destroy()
-
         user_id = self.controller.current_user_id
-        if not user_id: return
+        if not user_id:
+            if self.line_canvas:
+                self.line_canvas.get_tk_widget().destroy()
+            return
 
-        query = "SELECT month, usage_kwh FROM consumption WHERE user_id = ? ORDER BY month"
-        df = db_query_to_df(query, params=(user_id,))
+        self.paint_client_line_graph(queries.fetch_df('consumption_by_month', (user_id,)))
+
+    def paint_client_line_graph(self, df):
+        if self.line_canvas:
+            self.line_canvas.get_tk_widget().destroy()
         
         self.line_fig = plt.Figure(figsize=(5, 4), dpi=100)
         self.line_fig.set_facecolor(plt.rcParams['figure.facecolor'])
@@ -404,10 +411,31 @@ class ClientView(ctk.CTkFrame):
         if not self.controller.current_user_id:
             return 
         self.welcome_label.configure(text=f"Welcome, {self.controller.current_user_name}")
-        self.refresh_client_table()
-        self.refresh_billing_tab()
-        self.refresh_client_line_graph()
-        self.refresh_grievance_list()
+
+        # All four tabs query in the background, side by side, and are painted
+        # when their data has arrived.
+        if self._refresh_future is not None:
+            self._refresh_future.cancel()
+        params = (self.controller.current_user_id,)
+        loads = async_db.gather(
+            async_db.fetch_named_df('consumption_history', params),
+            async_db.fetch_named_df('consumption_months', params),
+            async_db.fetch_named_df('consumption_by_month', params),
+            async_db.fetch_named_df('tickets_for_user', params),
+        )
+        self._refresh_future = async_db.run_in_tk(self, loads, self.paint_refreshed_data)
+
+    def paint_refreshed_data(self, results):
+        table_df, months_df, line_df, tickets_df = results
+        self._refresh_future = None
+        if not self.controller.current_user_id:
+            # Logged out while the data was loading
+            return
+        self.paint_client_table(table_df)
+        self.paint_billing_tab(months_df)
+        self.paint_client_line_graph(line_df)
+        if hasattr(self, 'ticket_tree'):
+            self.paint_grievance_list(tickets_df)
 
 
 if __name__ == "__main__":
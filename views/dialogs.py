@@ -1,7 +1,10 @@
 import customtkinter as ctk
 from tkinter import messagebox
 import bcrypt
-from database import db_query, db_query_to_df, log_action
+import sqlite3
+from database import log_action, transaction
+import queries
+import tariffs
 from datetime import datetime
 
 class ChangePasswordDialog(ctk.CTkToplevel):
@@ -61,13 +64,13 @@ class ChangePasswordDialog(ctk.CTkToplevel):
             return
 
         user_id = self.controller.current_user_id
-        user_df = db_query_to_df("SELECT password FROM users WHERE id = ?", params=(user_id,))
+        user = queries.fetch_one('user_password', params=(user_id,))
         
-        if user_df.empty:
+        if user is None:
             messagebox.showerror("Error", "Could not find user record.", parent=self)
             return
             
-        stored_hash = user_df.iloc[0]['password'].encode('utf-8')
+        stored_hash = user['password'].encode('utf-8')
         
         if not bcrypt.checkpw(current_pass.encode('utf-8'), stored_hash):
             messagebox.showerror("Error", "Your 'Current Password' is incorrect.", parent=self)
@@ -76,7 +79,7 @@ class ChangePasswordDialog(ctk.CTkToplevel):
             
         try:
             new_hashed_pass = bcrypt.hashpw(new_pass.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            db_query("UPDATE users SET password = ? WHERE id = ?", (new_hashed_pass, user_id))
+            queries.execute('user_set_password', (new_hashed_pass, user_id))
             
             log_action(self.controller.current_user_name, "Changed their password successfully.")
             messagebox.showinfo("Success", "Password changed successfully.", parent=self)
@@ -136,7 +139,7 @@ class ResetPasswordDialog(ctk.CTkToplevel):
             
         try:
             new_hashed_pass = bcrypt.hashpw(new_pass.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            db_query("UPDATE users SET password = ? WHERE id = ?", (new_hashed_pass, self.user_id))
+            queries.execute('user_set_password', (new_hashed_pass, self.user_id))
             
             log_action(self.controller.current_user_name, f"Reset password for user ID {self.user_id}.")
             messagebox.showinfo("Success", "Password has been reset successfully.", parent=self)
@@ -151,7 +154,7 @@ class UpdateUserDialog(ctk.CTkToplevel):
         self.user_id = user_id
         
         self.title("Update User Info")
-        self.geometry("350x250")
+        self.geometry("350x320")
         
         self.font_normal = self.controller.font_normal
         self.font_bold = self.controller.font_bold_large
@@ -169,7 +172,13 @@ class UpdateUserDialog(ctk.CTkToplevel):
         ctk.CTkLabel(main_frame, text="Username:", font=self.font_normal).pack(anchor="w", padx=10)
         self.username_entry = ctk.CTkEntry(main_frame, width=250)
         self.username_entry.insert(0, username)
-        self.username_entry.pack(pady=(0, 20), padx=10)
+        self.username_entry.pack(pady=(0, 10), padx=10)
+
+        self.old_category = tariffs.user_category(user_id)
+        ctk.CTkLabel(main_frame, text="Tariff Category:", font=self.font_normal).pack(anchor="w", padx=10)
+        self.category_menu = ctk.CTkOptionMenu(main_frame, values=list(tariffs.CATEGORIES), width=250)
+        self.category_menu.set(self.old_category)
+        self.category_menu.pack(pady=(0, 20), padx=10)
         
         button_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
         button_frame.pack()
@@ -187,13 +196,20 @@ class UpdateUserDialog(ctk.CTkToplevel):
     def save_changes(self):
         new_full_name = self.full_name_entry.get()
         new_username = self.username_entry.get()
+        new_category = self.category_menu.get()
         
         if not new_full_name or not new_username:
             messagebox.showerror("Error", "All fields are required.", parent=self)
             return
             
         try:
-            db_query("UPDATE users SET full_name = ?, username = ? WHERE id = ?", (new_full_name, new_username, self.user_id))
+            with transaction():
+                queries.execute('user_update', (new_full_name, new_username, self.user_id))
+                if new_category != self.old_category:
+                    tariffs.set_user_category(self.user_id, new_category)
+            if new_category != self.old_category:
+                log_action(self.controller.current_user_name,
+                           f"Moved user ID {self.user_id} from tariff {self.old_category} to {new_category}.")
             log_action(self.controller.current_user_name, f"Updated info for user ID {self.user_id}.")
             messagebox.showinfo("Success", "User information updated successfully.", parent=self)
             self.controller.frames["AdminView"].refresh_user_list()
@@ -281,7 +297,7 @@ class GrievanceViewDialog(ctk.CTkToplevel):
         for widget in self.chat_frame.winfo_children():
             widget.destroy()
             
-        messages_df = db_query_to_df("SELECT sender_name, timestamp, message FROM grievance_messages WHERE ticket_id = ? ORDER BY timestamp ASC",
+        messages_df = queries.fetch_df('ticket_messages',
                                      params=(self.ticket_id,))
         
         if messages_df.empty:
@@ -314,14 +330,13 @@ class GrievanceViewDialog(ctk.CTkToplevel):
             sender_name = self.controller.current_user_name
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            db_query("INSERT INTO grievance_messages (ticket_id, sender_id, sender_name, message, timestamp) VALUES (?, ?, ?, ?, ?)",
-                     (self.ticket_id, sender_id, sender_name, reply_text, timestamp))
-            
             new_status = 'Answered' if self.controller.current_user_role == 'admin' else 'Pending' 
             
-            db_query("UPDATE grievance_tickets SET status = ?, updated_at = ? WHERE id = ?", (new_status, timestamp, self.ticket_id))
-            
-            log_action(sender_name, f"Replied to grievance ticket ID {self.ticket_id}.")
+            with transaction():
+                queries.execute('ticket_message_insert',
+                         (self.ticket_id, sender_id, sender_name, reply_text, timestamp))
+                queries.execute('ticket_set_status', (new_status, timestamp, self.ticket_id))
+                log_action(sender_name, f"Replied to grievance ticket ID {self.ticket_id}.")
             self.reply_entry.delete("1.0", "end")
             self.load_chat_history()
             
@@ -334,8 +349,8 @@ class GrievanceViewDialog(ctk.CTkToplevel):
             messagebox.showerror("Error", f"An error occurred: {e}", parent=self)
 
     def check_ticket_status(self):
-        status_df = db_query_to_df("SELECT status FROM grievance_tickets WHERE id = ?", params=(self.ticket_id,))
-        if not status_df.empty and status_df.iloc[0]['status'] == 'Resolved':
+        status = queries.fetch_scalar('ticket_status', params=(self.ticket_id,))
+        if status == 'Resolved':
             self.reply_entry.insert("1.0", "This ticket is marked as 'Resolved' and can no longer be replied to.")
             self.reply_entry.configure(state="disabled")
             self.send_button.configure(state="disabled")
\ No newline at end of file
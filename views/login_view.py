@@ -2,7 +2,8 @@ import customtkinter as ctk
 from tkinter import messagebox
 import bcrypt
 import sqlite3
-from database import db_query, db_query_to_df, log_action
+from database import log_action
+import queries
 
 class LoginView(ctk.CTkFrame):
     def __init__(self, parent, controller):
@@ -65,10 +66,9 @@ class LoginView(ctk.CTkFrame):
             messagebox.showerror("Error", "Please enter username and password")
             return
         
-        user_df = db_query_to_df("SELECT id, password, role, full_name FROM users WHERE username = ?", params=(username,))
+        user = queries.fetch_one('user_login', params=(username,))
 
-        if not user_df.empty:
-            user = user_df.iloc[0]
+        if user is not None:
             stored_hash = user['password']
             
             if isinstance(stored_hash, str):
@@ -166,8 +166,8 @@ class RegisterView(ctk.CTkFrame):
 
         try:
             hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            db_query(
-                "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
+            queries.execute(
+                'user_insert',
                 (username, hashed_password, 'client', full_name)
             )
             log_action(username, "Registered new client account.")